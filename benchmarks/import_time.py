@@ -0,0 +1,64 @@
+"""
+Measures the cold import time of `caplot`, and guards it.
+
+Each run imports `caplot` in a fresh interpreter. The script fails if the median time exceeds `--limit`, or if any of
+the dependencies that must only be imported on demand gets imported along with `caplot`.
+
+Usage: python benchmarks/import_time.py [--runs 5] [--limit 1.6]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Dependencies that are only needed by certain code paths, and must not be imported by `import caplot`.
+Deferred = ('sqlalchemy', 'requests', 'ipywidgets', 'IPython', 'selenium', 'svglib', 'reportlab')
+
+Probe = f'''
+import json, sys, time
+start = time.perf_counter()
+import caplot
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'imported': [name for name in {Deferred!r} if name in sys.modules]}}))
+'''
+
+
+def Measure(runs):
+    """
+    Returns
+    -------
+    times: list of float
+        The import time of each run, in seconds.
+    imported: set of str
+        The deferred dependencies imported in any run.
+    """
+    times, imported = [], set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', Probe], check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        times.append(result['elapsed'])
+        imported.update(result['imported'])
+    return times, imported
+
+
+def Main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters to import caplot in.')
+    parser.add_argument('--limit', type=float, default=1.6, help='The most seconds the median import may take.')
+    args = parser.parse_args()
+    times, imported = Measure(args.runs)
+    median = statistics.median(times)
+    print(f'import caplot: median {median:.3f}s, min {min(times):.3f}s, max {max(times):.3f}s over {args.runs} runs')
+    failed = False
+    if imported:
+        print(f'FAIL: deferred dependencies imported eagerly: {", ".join(sorted(imported))}')
+        failed = True
+    if median > args.limit:
+        print(f'FAIL: median import time exceeds the limit of {args.limit:.3f}s')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(Main())
@@ -2,24 +2,34 @@ __version__ = '0.1.1'
 
 import pickle as _pickle
 
+from . import container as _container
 from .interactiveplot import InteractivePlot
 from .manhattan import Manhattan
 from .pca import PCA
+from .refgenome import ReferenceGenome
+from .webdrivers import WebDriverPool
 
 
-def read(filepath):
+def read(filepath, lazy=True):
     """
     Reads a plot from a `.caplot` file and returns the class.
 
+    Files written by older versions of CAPlot are pickles, which are read as such. Only read those from trusted
+    sources, since unpickling can run arbitrary code.
+
     Parameters
     ----------
     filepath: str
         Path-like object that points to the file.
+    lazy: bool
+        Whether the records are read on demand. See `InteractivePlot.FromContainer`. Default is `True`.
 
     Returns
     -------
     InteractivePlot
         An instance of a subclass of `InteractivePlot`.
     """
+    if _container.IsContainer(filepath):
+        return InteractivePlot.FromContainer(filepath, lazy)
     with open(filepath, 'rb') as stream:
         return _pickle.load(stream)
@@ -0,0 +1,173 @@
+import numpy as np
+
+
+def PixelBins(x, y, xRange, yRange, width, height):
+    """
+    Maps points to the pixels of a plot.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Horizontal coordinates of the points.
+    y: np.ndarray
+        Vertical coordinates of the points.
+    xRange: tuple
+        The horizontal range of the plot.
+    yRange: tuple
+        The vertical range of the plot.
+    width: int
+        Width of the plot, in pixels.
+    height: int
+        Height of the plot, in pixels.
+
+    Returns
+    -------
+    xBins: np.ndarray
+        Column of the pixel each point falls into, clipped to `[0, width)`.
+    yBins: np.ndarray
+        Row of the pixel each point falls into, clipped to `[0, height)`. Row 0 is at the bottom.
+    """
+    (xStart, xEnd), (yStart, yEnd) = xRange, yRange
+    xBins = np.floor((np.asarray(x, dtype=np.float64) - xStart) * (width / ((xEnd - xStart) or 1)))
+    yBins = np.floor((np.asarray(y, dtype=np.float64) - yStart) * (height / ((yEnd - yStart) or 1)))
+    xBins = np.clip(np.nan_to_num(xBins, nan=0), 0, width - 1).astype(np.int64)
+    yBins = np.clip(np.nan_to_num(yBins, nan=0), 0, height - 1).astype(np.int64)
+    return xBins, yBins
+
+
+def ThinnedRows(x, y, xRange, yRange, width, height, threshold=None):
+    """
+    Thins points down to one representative per occupied pixel, so that the plot looks the same while drawing far
+    fewer glyphs. Points with missing coordinates are dropped.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Horizontal coordinates of the points.
+    y: np.ndarray
+        Vertical coordinates of the points.
+    xRange: tuple
+        The horizontal range of the plot.
+    yRange: tuple
+        The vertical range of the plot.
+    width: int
+        Width of the plot, in pixels.
+    height: int
+        Height of the plot, in pixels.
+    threshold: float
+        Points with `y` at or above this value are all kept, as they are.
+
+    Returns
+    -------
+    np.ndarray: Positions of the points to keep, in their original order.
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    exact = valid & (y >= threshold) if threshold is not None else np.zeros(len(y), dtype=bool)
+    candidates = np.flatnonzero(valid & ~exact)
+    xBins, yBins = PixelBins(x[candidates], y[candidates], xRange, yRange, width, height)
+    _, first = np.unique(xBins * height + yBins, return_index=True)
+    return np.sort(np.concatenate([np.flatnonzero(exact), candidates[first]]))
+
+
+def DensityImage(x, y, xRange, yRange, width, height, codes=None, palette=('#808080',), alpha=1.0):
+    """
+    Aggregates points into an RGBA image, to be drawn with a single `image_rgba` glyph in place of one glyph per point.
+
+    The color of each pixel blends the colors of the points falling into it, weighted by their counts, and its opacity
+    grows with the logarithm of its count, so that dense areas stand out while lone points remain visible.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Horizontal coordinates of the points.
+    y: np.ndarray
+        Vertical coordinates of the points.
+    xRange: tuple
+        The horizontal range the image covers.
+    yRange: tuple
+        The vertical range the image covers.
+    width: int
+        Width of the image, in pixels.
+    height: int
+        Height of the image, in pixels.
+    codes: np.ndarray
+        For each point, the position of its color in `palette`, or -1 to leave the point out. Defaults to the first
+        color for all points.
+    palette: list of str
+        Colors in the `#rrggbb` format.
+    alpha: float
+        Opacity of the densest pixel.
+
+    Returns
+    -------
+    np.ndarray: An image of `height` rows and `width` columns of packed RGBA values, with row 0 at the bottom, as
+    expected by Bokeh.
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    codes = np.zeros(len(x), dtype=np.int64) if codes is None else np.asarray(codes, dtype=np.int64)
+    (xStart, xEnd), (yStart, yEnd) = xRange, yRange
+    inside = (codes >= 0) & (x >= xStart) & (x <= xEnd) & (y >= yStart) & (y <= yEnd)
+    xBins, yBins = PixelBins(x[inside], y[inside], xRange, yRange, width, height)
+    pixels, codes = yBins * width + xBins, codes[inside]
+    counts = np.bincount(pixels, minlength=width * height)
+    colors = np.array([[int(color[index:index + 2], 16) for index in (1, 3, 5)] for color in palette], dtype=np.float64)
+    image = np.zeros((width * height, 4), dtype=np.uint8)
+    occupied = counts > 0
+    for channel in range(3):
+        sums = np.bincount(pixels, weights=colors[codes, channel], minlength=width * height)
+        image[occupied, channel] = np.rint(sums[occupied] / counts[occupied])
+    if occupied.any():
+        opacity = 0.25 + 0.75 * np.log1p(counts[occupied]) / np.log1p(counts.max())
+        image[occupied, 3] = np.rint(255 * alpha * opacity)
+    return image.view(np.uint32).reshape(height, width)
+
+
+def PaddedRange(values, ratio=0.05):
+    """
+    Returns
+    -------
+    tuple: The range of `values` (ignoring missing ones), widened by `ratio` of its length on either side.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not (~np.isnan(values)).any():
+        return 0, 1
+    start, end = np.nanmin(values), np.nanmax(values)
+    padding = (end - start) * ratio or 0.5
+    return float(start - padding), float(end + padding)
+
+
+def ViewportRows(x, y, xRange, yRange, width, height, limit, threshold=None):
+    """
+    Selects the points within a viewport, for level of detail: all of them when there are at most `limit`, otherwise
+    one per pixel, as in `ThinnedRows`.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        Horizontal coordinates of the points.
+    y: np.ndarray
+        Vertical coordinates of the points.
+    xRange: tuple
+        The horizontal range of the viewport.
+    yRange: tuple
+        The vertical range of the viewport.
+    width: int
+        Width of the viewport, in pixels.
+    height: int
+        Height of the viewport, in pixels.
+    limit: int
+        The most points to select without thinning.
+    threshold: float
+        Passed to `ThinnedRows`.
+
+    Returns
+    -------
+    np.ndarray: Positions of the selected points, in their original order.
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    (xStart, xEnd), (yStart, yEnd) = xRange, yRange
+    inside = np.flatnonzero((x >= xStart) & (x <= xEnd) & (y >= yStart) & (y <= yEnd))
+    if len(inside) <= limit:
+        return inside
+    return inside[ThinnedRows(x[inside], y[inside], xRange, yRange, width, height, threshold)]
@@ -0,0 +1,426 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from pprint import pformat
+from warnings import warn
+
+
+class VEPClient:
+    """
+    The `VEPClient` class fetches annotations from the Ensembl VEP REST API (or any service with the same interface),
+    splitting the IDs into batches that are sent concurrently over a pool of connections. Throttled (429) and
+    unavailable (5xx) responses, as well as connection errors, are retried with exponential backoff, honouring the
+    `Retry-After` header when the service sends one.
+
+    Parameters
+    ----------
+    url: str
+        The endpoint IDs are posted to, e.g. `"https://rest.ensembl.org/vep/human/id"`.
+    batchSize: int
+        The most IDs posted at once. Ensembl accepts up to 200. Default is 200.
+    workers: int
+        The most batches in flight at once. Default is 4.
+    retries: int
+        How many times a batch is retried before giving up. Default is 5.
+    backoff: float
+        Seconds waited before the first retry, doubled for each subsequent one. Default is 1.
+    timeout: float
+        Seconds waited for each response. Default is 120.
+    """
+
+    RetriedStatuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, url, batchSize=200, workers=4, retries=5, backoff=1.0, timeout=120):
+        import requests
+        from requests.adapters import HTTPAdapter
+        assert batchSize > 0, 'The batch size must be positive.'
+        assert workers > 0, 'The number of workers must be positive.'
+        self.url = url
+        self.batchSize = batchSize
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._session.headers.update({'Content-Type': 'application/json', 'Accept': 'application/json'})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def Close(self):
+        """
+        The method closes the pooled connections.
+        """
+        self._session.close()
+
+    def Batches(self, ids):
+        """
+        Returns
+        -------
+        list of list of str: `ids` without duplicates, split into batches of at most `batchSize`.
+        """
+        ids = list(dict.fromkeys(ids))
+        return [ids[start:start + self.batchSize] for start in range(0, len(ids), self.batchSize)]
+
+    def Annotate(self, ids, callback=None, cancelled=None):
+        """
+        The method fetches the annotations of `ids`.
+
+        Parameters
+        ----------
+        ids: list of str
+            Variant IDs supported by the service, e.g. rsids.
+        callback: callable
+            An optional function called with each batch and its records, as soon as they are received. It may be
+            called from several threads at once.
+        cancelled: threading.Event
+            When set, batches that have not been sent yet are skipped.
+
+        Returns
+        -------
+        list of dict
+            The records returned for all batches, in the order of the batches.
+
+        Raises
+        ------
+        requests.HTTPError
+            If a batch still fails after all retries.
+        """
+        def Post(batch):
+            if cancelled is not None and cancelled.is_set():
+                return []
+            records = self._Post(batch)
+            if callback is not None:
+                callback(batch, records)
+            return records
+
+        batches = self.Batches(ids)
+        if len(batches) <= 1:
+            return [record for batch in batches for record in Post(batch)]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(batches))) as executor:
+            return [record for records in executor.map(Post, batches) for record in records]
+
+    def _Post(self, batch):
+        """
+        The method posts a single batch, retrying as described in the class.
+
+        Returns
+        -------
+        list of dict: The records returned for `batch`.
+        """
+        import requests
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._session.post(self.url, json={'ids': batch}, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+            if response.status_code not in self.RetriedStatuses or attempt == self.retries:
+                break
+            time.sleep(self._Delay(response, attempt))
+        response.raise_for_status()
+        return response.json()
+
+    def _Delay(self, response, attempt):
+        """
+        Returns
+        -------
+        float: Seconds to wait before retrying `response`.
+        """
+        try:
+            return max(float(response.headers['Retry-After']), 0)
+        except (KeyError, ValueError):
+            return self.backoff * 2 ** attempt
+
+
+class AnnotationCache:
+    """
+    The `AnnotationCache` class keeps flattened annotation records in an SQLite file, keyed by the variant ID, the
+    genome and the endpoint they were fetched from, so that they are only fetched once across sessions. IDs the
+    endpoint returned nothing for are remembered as well. The file can be copied to machines with no network access.
+
+    Parameters
+    ----------
+    directory: str
+        Directory of the cache file. Defaults to the `CAPLOT_CACHE_DIR` environment variable if set, otherwise to
+        `~/.cache/caplot`. It is created when missing.
+    ttl: float
+        Seconds after which records are fetched again. `None` keeps them forever. Default is 30 days.
+    maxEntries: int
+        The most records kept. The least recently used are evicted first. `None` keeps all. Default is 1000000.
+    """
+
+    EnvironmentVariable = 'CAPLOT_CACHE_DIR'
+    FileName = 'annotations.sqlite'
+
+    def __init__(self, directory=None, ttl=30 * 24 * 3600, maxEntries=1000000):
+        if directory is None:
+            directory = os.environ.get(self.EnvironmentVariable) or os.path.join('~', '.cache', 'caplot')
+        self.directory = os.path.expanduser(directory)
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        os.makedirs(self.directory, exist_ok=True)
+        with self._Connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS annotations (id TEXT, genome TEXT, endpoint TEXT, '
+                               'record TEXT, fetched REAL, accessed REAL, PRIMARY KEY (id, genome, endpoint))')
+            connection.execute('CREATE INDEX IF NOT EXISTS accessedIndex ON annotations (accessed)')
+
+    @property
+    def path(self):
+        """
+        str: Path to the cache file.
+        """
+        return os.path.join(self.directory, self.FileName)
+
+    @contextmanager
+    def _Connection(self):
+        """
+        Context manager holding a connection to the cache file, which is committed (or rolled back on errors) and
+        closed on exit.
+        """
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            with connection:
+                yield connection
+
+    def Get(self, ids, genome, endpoint):
+        """
+        The method looks up the records of `ids` that have not expired.
+
+        Parameters
+        ----------
+        ids: list of str
+            Variant IDs.
+        genome: str
+            Name of the genome reference set.
+        endpoint: str
+            The endpoint the records are fetched from, including any options.
+
+        Returns
+        -------
+        dict
+            Maps the IDs found in the cache to their record, or to `None` if the endpoint returned nothing for them.
+        """
+        now, found = time.time(), dict()
+        oldest = now - self.ttl if self.ttl is not None else float('-inf')
+        with self._Connection() as connection:
+            for start in range(0, len(ids), 500):  # Stay under the limit of SQLite variables.
+                batch = ids[start:start + 500]
+                placeholders = ', '.join('?' * len(batch))
+                rows = connection.execute(f'SELECT id, record FROM annotations WHERE genome = ? AND endpoint = ? AND '
+                                          f'fetched >= ? AND id IN ({placeholders})',
+                                          [genome, endpoint, oldest, *batch])
+                found.update((id, json.loads(record) if record is not None else None) for id, record in rows)
+                connection.execute(f'UPDATE annotations SET accessed = ? WHERE genome = ? AND endpoint = ? AND '
+                                   f'id IN ({placeholders})', [now, genome, endpoint, *batch])
+        return found
+
+    def Put(self, records, genome, endpoint):
+        """
+        The method stores records, then evicts those that are expired or in excess.
+
+        Parameters
+        ----------
+        records: dict
+            Maps IDs to their record, or to `None` if the endpoint returned nothing for them.
+        genome: str
+            Name of the genome reference set.
+        endpoint: str
+            The endpoint the records were fetched from, including any options.
+        """
+        now = time.time()
+        with self._Connection() as connection:
+            connection.executemany('INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?)',
+                                   [(id, genome, endpoint, json.dumps(record) if record is not None else None, now, now)
+                                    for id, record in records.items()])
+            if self.ttl is not None:
+                connection.execute('DELETE FROM annotations WHERE fetched < ?', [now - self.ttl])
+            if self.maxEntries is not None:
+                connection.execute('DELETE FROM annotations WHERE rowid IN (SELECT rowid FROM annotations '
+                                   'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', [self.maxEntries])
+
+    def Clear(self):
+        """
+        The method removes all records.
+        """
+        with self._Connection() as connection:
+            connection.execute('DELETE FROM annotations')
+
+    def __len__(self):
+        with self._Connection() as connection:
+            return connection.execute('SELECT COUNT(*) FROM annotations').fetchone()[0]
+
+
+def Flattened(record):
+    """
+    Returns
+    -------
+    dict: `record` with its nested lists and dictionaries pretty-printed into strings, to be shown in tooltips.
+    """
+    return {key: pformat(value) if isinstance(value, (list, dict)) else value for key, value in record.items()}
+
+
+def Annotations(ids, url, genome, batchSize=200, workers=4, cache=None, offline=False, callback=None, cancelled=None):
+    """
+    Fetches the flattened annotation records of variants, going to the network for those missing from the cache only.
+
+    Parameters
+    ----------
+    ids: list of str
+        Variant IDs supported by the service, e.g. rsids.
+    url: str
+        The endpoint IDs are posted to. See `VEPClient`.
+    genome: str
+        Name of the genome reference set, used as part of the cache key.
+    batchSize: int
+        See `VEPClient`.
+    workers: int
+        See `VEPClient`.
+    cache: AnnotationCache
+        An optional cache to read records from and store fetched records in.
+    offline: bool
+        When set, only the cache is used, and IDs missing from it are left without annotations.
+    callback: callable
+        An optional function called with IDs as soon as they are looked up, and the flattened records found for them.
+        It may be called from several threads at once.
+    cancelled: threading.Event
+        When set, IDs that have not been sent yet are left without annotations.
+
+    Returns
+    -------
+    list of dict
+        A flattened record for each annotated ID, in the order of `ids`.
+    """
+    ids = list(dict.fromkeys(ids))
+    records = cache.Get(ids, genome, url) if cache is not None else dict()
+    if callback is not None:
+        callback(list(records), [record for record in records.values() if record is not None])
+    missing = [id for id in ids if id not in records]
+    if missing and offline:
+        warn(f'{len(missing)} IDs are left without annotations, as they are not cached and the network is not used.')
+    elif missing:
+        fetched = dict()  # Only IDs that were actually sent, so that cancelled ones are not cached as unknown.
+
+        def Received(batch, batchRecords):
+            batchFetched = dict.fromkeys(batch)
+            for record in batchRecords:
+                if batchFetched.get(record.get('id')) is None:
+                    batchFetched[record.get('id')] = Flattened(record)
+            fetched.update(batchFetched)
+            if callback is not None:
+                callback(batch, [record for record in batchFetched.values() if record is not None])
+
+        try:
+            with VEPClient(url, batchSize, workers) as client:
+                client.Annotate(missing, Received, cancelled)
+        finally:  # Batches received before one failed are cached all the same.
+            if cache is not None and fetched:
+                cache.Put(fetched, genome, url)
+        records.update(fetched)
+    return [records[id] for id in ids if records.get(id) is not None]
+
+
+class AnnotationTask:
+    """
+    The `AnnotationTask` class runs `Annotations` in the background, making the records available as they arrive.
+
+    Parameters
+    ----------
+    ids: list of str
+        Variant IDs supported by the service, e.g. rsids.
+    onUpdate: callable
+        An optional function called with the task whenever new records arrive, and once it is over. It is called from
+        background threads.
+    **kwargs
+        The other arguments of `Annotations`.
+    """
+
+    def __init__(self, ids, onUpdate=None, **kwargs):
+        self.ids = list(dict.fromkeys(ids))
+        self.onUpdate = onUpdate
+        self._lock = threading.Lock()
+        self._looked = 0
+        self._records = dict()
+        self._cancelled = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.future = executor.submit(Annotations, self.ids, callback=self._Received, cancelled=self._cancelled,
+                                      **kwargs)
+        executor.shutdown(wait=False)
+        self.future.add_done_callback(lambda future: self._Updated())
+
+    def _Received(self, ids, records):
+        with self._lock:
+            self._looked += len(ids)
+            self._records.update((record.get('id'), record) for record in records)
+        self._Updated()
+
+    def _Updated(self):
+        if self.onUpdate is not None:
+            self.onUpdate(self)
+
+    @property
+    def records(self):
+        """
+        list of dict: The flattened records received so far, in the order of `ids`.
+        """
+        with self._lock:
+            return [self._records[id] for id in self.ids if id in self._records]
+
+    @property
+    def progress(self):
+        """
+        float: The fraction of `ids` that have been looked up, between 0 and 1.
+        """
+        return min(self._looked / len(self.ids), 1) if self.ids else 1
+
+    @property
+    def done(self):
+        """
+        bool: Whether the task is over, whether it succeeded, failed or got cancelled.
+        """
+        return self.future.done()
+
+    @property
+    def cancelled(self):
+        """
+        bool: Whether the task has been cancelled.
+        """
+        return self._cancelled.is_set()
+
+    def Cancel(self):
+        """
+        The method cancels the task. Batches already sent are still received (and cached), but others are not sent.
+        """
+        self._cancelled.set()
+
+    def Wait(self, timeout=None):
+        """
+        The method waits for the task to be over.
+
+        Parameters
+        ----------
+        timeout: float
+            The most seconds to wait. `None` waits as long as it takes.
+
+        Returns
+        -------
+        list of dict
+            The flattened records, as returned by `Annotations`.
+
+        Raises
+        ------
+        Exception
+            Whatever `Annotations` raised, e.g. `requests.HTTPError`.
+        """
+        return self.future.result(timeout)
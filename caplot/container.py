@@ -0,0 +1,163 @@
+import json
+import os
+
+FormatVersion = 1
+MetadataKey = b'caplot'
+IndexColumn = '__index__'
+MaskColumns = {'filter': '__filter__', 'highlight': '__highlight__'}
+Magic = b'ARROW1'
+
+
+def JSONDefault(value):
+    """
+    The `default` hook of `json.dumps` for configurations: numpy scalars and arrays, e.g. computed from a DataFrame,
+    are encoded as the Python values they hold.
+
+    Raises
+    ------
+    TypeError
+        If `value` is of any other type JSON can not encode.
+    """
+    import numpy as np
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f'Values of type {type(value).__name__} can not be encoded as JSON.')
+
+
+def IsContainer(path):
+    """
+    Returns
+    -------
+    bool: Whether `path` is a `.caplot` container, as opposed to a pickle written by older versions.
+    """
+    with open(path, 'rb') as stream:
+        return stream.read(len(Magic)) == Magic
+
+
+def Write(path, data, masks, config, compression='zstd'):
+    """
+    Writes a `.caplot` container: an Arrow IPC file holding the records column by column, the masks as extra columns,
+    and the configuration of the plot as JSON in the metadata of the schema.
+
+    The file is written next to `path` first, then moved in place, so that plots reading from `path` lazily keep
+    their (memory-mapped) data until then.
+
+    Parameters
+    ----------
+    path: str
+        Path to the container.
+    data: pd.DataFrame
+        The records of the plot. Its index is kept as a column. When `None`, only the masks are written, e.g. when the
+        configuration refers to the records elsewhere.
+    masks: dict
+        Maps `"filter"` and `"highlight"` to boolean arrays aligned to the records, or `None`.
+    config: dict
+        Anything JSON can encode, read back by `ReadConfig`.
+    compression: str
+        Either `"zstd"`, `"lz4"` or `"uncompressed"`. Uncompressed containers are larger, but their columns are used
+        straight from the memory-mapped file. Default is `"zstd"`.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    if data is None:
+        table, indexName = pa.table({MaskColumns[name]: pa.array(mask, type=pa.bool_())
+                                     for name, mask in masks.items() if mask is not None}), None
+    else:
+        assert data.index.nlevels == 1, 'Data with a multi-level index can not be saved.'
+        reserved = [column for column in data.columns if column == IndexColumn or column in MaskColumns.values()]
+        assert not reserved, f'Columns named {", ".join(reserved)} are reserved.'
+        table = pa.Table.from_pandas(data.rename_axis(IndexColumn).reset_index(), preserve_index=False)
+        for name, mask in masks.items():
+            if mask is not None:
+                table = table.append_column(MaskColumns[name], pa.array(mask, type=pa.bool_()))
+        indexName = data.index.name
+    config = {**config, 'version': FormatVersion, 'indexName': indexName}
+    metadata = {**(table.schema.metadata or dict()), MetadataKey: json.dumps(config, default=JSONDefault).encode()}
+    temporary = f'{path}.{os.getpid()}.tmp'
+    try:
+        feather.write_feather(table.replace_schema_metadata(metadata), temporary, compression=compression)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def _Schema(path):
+    import pyarrow as pa
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema
+
+
+def ReadConfig(path):
+    """
+    Reads the configuration of a `.caplot` container, without reading its records.
+
+    Returns
+    -------
+    dict: The configuration given to `Write`, along with the `version` of the format and the `indexName`.
+
+    Raises
+    ------
+    RuntimeError
+        If the container was written by a newer version of the format.
+    """
+    config = json.loads(_Schema(path).metadata[MetadataKey])
+    if config['version'] > FormatVersion:
+        raise RuntimeError(f'The file was written by a newer version of caplot (format {config["version"]}).')
+    return config
+
+
+def Fields(path):
+    """
+    Returns
+    -------
+    list of pa.Field: The columns of the records in a `.caplot` container, with their Arrow types.
+    """
+    return [field for field in _Schema(path) if field.name != IndexColumn and field.name not in MaskColumns.values()]
+
+
+def Columns(path):
+    """
+    Returns
+    -------
+    list of str: Names of the columns of the records in a `.caplot` container.
+    """
+    return [field.name for field in Fields(path)]
+
+
+def ReadData(path, columns=None):
+    """
+    Reads records from a `.caplot` container, through a memory map. Only the requested columns are read (and
+    decompressed).
+
+    Parameters
+    ----------
+    path: str
+        Path to the container.
+    columns: list of str
+        Names of the columns to read. Defaults to all.
+
+    Returns
+    -------
+    pd.DataFrame: The records, with their original index.
+    """
+    import pyarrow.feather as feather
+    columns = Columns(path) if columns is None else list(columns)
+    table = feather.read_table(path, columns=[IndexColumn, *columns], memory_map=True)
+    data = table.to_pandas().set_index(IndexColumn)
+    return data.rename_axis(json.loads(table.schema.metadata[MetadataKey]).get('indexName'))
+
+
+def ReadMasks(path):
+    """
+    Returns
+    -------
+    dict: Maps `"filter"` and `"highlight"` to the boolean arrays stored in a `.caplot` container, or `None`.
+    """
+    import pyarrow.feather as feather
+    stored = {name: column for name, column in MaskColumns.items() if column in _Schema(path).names}
+    table = feather.read_table(path, columns=list(stored.values()), memory_map=True) if stored else None
+    return {name: table[column].to_numpy().astype(bool) if name in stored else None
+            for name, column in MaskColumns.items()}
@@ -1,24 +1,26 @@
 import abc
 import json
 import os.path
-import pickle
 import re
-import urllib.parse
 from contextlib import contextmanager
 from warnings import warn
 
-import ipywidgets as widgets
+import numpy as np
 import pandas as pd
-from IPython.display import display
 from bokeh.core.validation import silence
 from bokeh.io import reset_output
 from bokeh.io.export import get_screenshot_as_png, export_svg
 from bokeh.models.plots import Plot
 from bokeh.plotting import output_file, show, save
-from pandasql import sqldf
-from sqlalchemy import create_engine
 from stringcase import titlecase
 
+from . import container
+from .patching import Graft
+from .queryengine import LoadPlan, QueryCache, QueryEngine
+from .sources import Columns, Fingerprint, IsDatabaseURL, ReadDatabase, ReadFile, SameContents
+from .rendering import CanvasTypes
+from .webdrivers import SharedPool
+
 
 class InteractivePlot(abc.ABC):
     """
@@ -51,26 +53,53 @@ class InteractivePlot(abc.ABC):
         Whether the non-highlighted data points must be colored grey.
     hovers: dict
         A mapping of arbitrary labels to certain columns in the data source.
+    lean: bool
+        When set, only the columns needed by the plot are loaded from files. DataFrames, which are in memory already,
+        are used as they are. Default is `False`.
+    chunkSize: int
+        When set, CSV/TSV files are streamed in chunks of this many rows, and `loadQuery` is applied to each chunk.
+        Database results are fetched in chunks of this many rows as well, and stored with compact dtypes.
     """
 
     SupportedExtensions = ('.png', '.jpeg', '.svg', '.pdf', '.html', '.caplot')
+    DetailLimit = 100000  # The most records in view that `Serve` sends at full resolution.
+    StaticRenderer = 'bokeh'  # Renders `.png`, `.jpeg`, `.svg` and `.pdf` files by default. See `SaveAs`.
+    ContainerCompression = 'zstd'  # Compression of the columns in `.caplot` files. See `container.Write`.
+    # Attributes that are tied to the records, or to the session, and are not kept as the configuration of `.caplot`.
+    _TransientAttributes = ('_data', '_columns', '_sourceLocator', '_origin', '_unpruned', '_dataVersion',
+                            '_filterMask', '_highlightMask', '_shown', '_queryEngine', '_queryCache', '_safeWarnings')
+    # Properties that only change the look of the points, which `_Restyle` applies to a displayed plot in place.
+    _StyleAttributes = ('minorAlpha', 'greyHighlight')
 
     def __init__(self, source=None, loadQuery=None, filter=None, invertFilter=None, filterTemplate=None, highlight=None,
-                 invertHighlight=None, highlightTemplate=None, minorAlpha=None, greyHighlight=False, hovers=None):
+                 invertHighlight=None, highlightTemplate=None, minorAlpha=None, greyHighlight=False, hovers=None,
+                 lean=False, chunkSize=None):
         self._data = None
+        self._columns = None
+        self._sourceLocator = None
+        self._origin = None
+        self._unpruned = False
+        self.lean = lean
+        self.chunkSize = chunkSize
+        self._queryEngine = None
+        self._queryCache = QueryCache()
+        self._dataVersion = 0
         self._filter = None
         self._invertFilter = None
         self._filterTemplate = None
-        self._filtered = None
+        self._filterMask = None
         self._highlight = None
         self._invertHighlight = None
         self._highlightTemplate = None
-        self._highlighted = None
+        self._highlightMask = None
         self._minorAlpha = 0.5
         self.greyHighlight = greyHighlight
         self._hovers = dict()
         self._safeWarnings = set()
+        self._shown = None
         # Initializations
+        if hovers is not None:  # Ahead of loading, as `lean` mode requires the columns of the hovers.
+            self.hovers = hovers
         if source is not None:
             self.source = source if loadQuery is None else (source, loadQuery)
             assert filter is None or invertFilter is None, 'You can define either "filter" or "invertFilter".'
@@ -87,28 +116,224 @@ class InteractivePlot(abc.ABC):
             self.filterTemplate = filterTemplate
         if highlightTemplate is not None:
             self.highlightTemplate = highlightTemplate
-        if hovers is not None:
-            self.hovers = hovers
         if minorAlpha is not None:
             self.minorAlpha = minorAlpha
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_queryEngine'] = None  # The database connection can not be pickled; it is rebuilt on demand.
+        state['_shown'] = None  # Bokeh documents are tied to the notebook they were shown in.
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Older pickles do not have these attributes.
+        self._queryEngine = None
+        self.__dict__.setdefault('_queryCache', QueryCache())
+        self.__dict__.setdefault('_dataVersion', 0)
+        self.__dict__.setdefault('_columns', None)
+        self.__dict__.setdefault('_sourceLocator', None)
+        self.__dict__.setdefault('_origin', None)
+        self.__dict__.setdefault('lean', False)
+        self.__dict__.setdefault('_unpruned', False)
+        self.__dict__.setdefault('chunkSize', None)
+        self.__dict__.setdefault('_shown', None)
+        self.__dict__.setdefault('_safeWarnings', set())
+        if '_filtered' in state or '_highlighted' in state:  # Older pickles keep the index of the selected records.
+            filtered, highlighted = self.__dict__.pop('_filtered', None), self.__dict__.pop('_highlighted', None)
+            self._filterMask = None if filtered is None else self._data.index.isin(filtered)
+            self._highlightMask = None if highlighted is None else self._data.index.isin(highlighted)
+
+    def _ContainerState(self, **encoded):
+        """
+        The method gathers the configuration of the plot, as stored in `.caplot` containers: all attributes but those
+        of `_TransientAttributes`. Numpy values are converted to the Python values they hold.
+
+        Parameters
+        ----------
+        encoded:
+            Attributes that subclasses encode themselves, e.g. objects JSON can not encode, replacing their values.
+
+        Returns
+        -------
+        dict: Maps attribute names to their values.
+
+        Raises
+        ------
+        RuntimeError
+            If an attribute can not be encoded as JSON.
+        """
+        state = dict()
+        for key, value in {**self.__dict__, **encoded}.items():
+            if key in self._TransientAttributes:
+                continue
+            try:
+                state[key] = json.loads(json.dumps(value, default=container.JSONDefault))
+            except (TypeError, ValueError) as error:
+                raise RuntimeError(f'The "{key}" attribute of the plot can not be saved: {error}') from error
+        return state
+
+    @classmethod
+    def _StateFromContainer(cls, state):
+        """
+        Subclasses decode the attributes encoded by their `_ContainerState` here.
+
+        Returns
+        -------
+        dict: `state`, as expected by `__setstate__`.
+        """
+        return state
+
+    @classmethod
+    def _Subclasses(cls):
+        classes = {cls.__name__: cls}
+        for subclass in cls.__subclasses__():
+            classes.update(subclass._Subclasses())
+        return classes
+
+    @classmethod
+    def FromContainer(cls, filepath, lazy=True):
+        """
+        Reads a plot from a `.caplot` container written by `SaveAs`.
+
+        Only the configuration of the plot and its filter and highlight masks are read right away when `lazy` is set.
+        The plot is then in `lean` mode, and reads the columns it needs from the container, through a memory map, as
+        for any other file.
+
+        Containers saved with `embedData=False` refer to the source of the plot instead. The plot reattaches to it in
+        `lean` mode, whatever `lazy` is. The stored masks are only reused if the source file still has the contents
+        it had when saving; otherwise (and for database sources, whose contents can not be fingerprinted) the source
+        is loaded again and the filter and highlight queries are run again.
+
+        Parameters
+        ----------
+        filepath: str
+            Path to the container.
+        lazy: bool
+            Whether the records are read on demand. Default is `True`.
+
+        Returns
+        -------
+        InteractivePlot
+            An instance of the subclass of `InteractivePlot` that was saved.
+
+        Raises
+        ------
+        RuntimeError
+            If the container holds an unknown type of plot, was written by a newer version of the format, or refers
+            to a source file that does not exist anymore.
+        """
+        config = container.ReadConfig(filepath)
+        classes = cls._Subclasses()
+        if config['class'] not in classes:
+            raise RuntimeError(f'Unknown type of plot "{config["class"]}".')
+        plotClass = classes[config['class']]
+        # Attributes added since the container was written take their defaults.
+        state = {**plotClass().__dict__, **plotClass._StateFromContainer(config['state'])}
+        masks = container.ReadMasks(filepath)
+        state.update(_filterMask=masks['filter'], _highlightMask=masks['highlight'], _unpruned=False, _dataVersion=1)
+        reference = config.get('reference')
+        if reference is not None:
+            source, loadQuery = reference['source'], reference['loadQuery']
+            if not IsDatabaseURL(source) and not os.path.isfile(source):
+                raise RuntimeError(f'The source of the plot, "{source}", can not be found.')
+            state.update(lean=True, _data=None, _columns=reference['columns'], _sourceLocator=(source, loadQuery),
+                         _origin=(source, loadQuery))
+        elif lazy:
+            columns = container.Columns(filepath)
+            state.update(lean=True, _data=None, _columns=columns, _sourceLocator=(filepath, None),
+                         _origin=(filepath, None))
+        else:
+            state.update(_data=container.ReadData(filepath), _columns=None, _sourceLocator=None, _origin=None)
+        plot = plotClass.__new__(plotClass)
+        plot.__setstate__(state)
+        if reference is not None and not SameContents(reference['fingerprint'], Fingerprint(source)):
+            if reference['fingerprint'] is not None:
+                warn(f'"{source}" has changed since the plot was saved; the filter and highlight queries run again.')
+            plot.source = (source, loadQuery)  # Loads the source again, and runs the queries on it.
+        return plot
+
     @staticmethod
     def Subset(sqlQuery, tables):
-        """Uses `sqldf` to execute a query on the internal DataFrame.
+        """Executes a query on the given tables, using a temporary `QueryEngine`.
+
+        Note that this registers all tables from scratch. Queries on the internal DataFrame should use the persistent
+        engine returned by `_QueryEngine` instead.
 
         Parameters
         ----------
         sqlQuery: str
             Desired query.
         tables: dict
-            Tables accessible in the query.
+            Tables accessible in the query. Their index is accessible as the `index` column.
 
         Returns
         -------
         df: pd.DataFrame
             The resulting dataframe.
         """
-        return sqldf(sqlQuery, tables)
+        engine = QueryEngine(tables)
+        try:
+            return engine.Query(sqlQuery)
+        finally:
+            engine.Close()
+
+    def _QueryEngine(self):
+        """
+        Returns
+        -------
+        QueryEngine: The engine holding the internal DataFrame as the `data` table. The table is registered on the
+        first call and reused until `source` changes.
+        """
+        if self._queryEngine is None:
+            self._EnsureColumns([])
+            self._queryEngine = QueryEngine({'data': self._data})
+        return self._queryEngine
+
+    def _ResetQueryEngine(self):
+        if self._queryEngine is not None:
+            self._queryEngine.Close()
+            self._queryEngine = None
+
+    def _Selected(self, query):
+        """
+        Returns
+        -------
+        pd.Index: The index of the records selected by `query`, served from the query cache when possible.
+        """
+        def Compute():
+            self._EnsureColumns(self._ReferencedColumns(query))
+            return self._QueryEngine().Index(query)
+
+        return self._queryCache.Get(query, self._dataVersion, Compute)
+
+    @property
+    def queryCacheSize(self):
+        """
+        int: Maximum number of filter and highlight results kept in the query cache. Defaults to 16.
+
+        Results are keyed by the normalized query text and the version of the data, which changes whenever `source`
+        is assigned. Setting this to 0 disables caching.
+        """
+        return self._queryCache.maxSize
+
+    @queryCacheSize.setter
+    def queryCacheSize(self, value):
+        self._queryCache.maxSize = value
+
+    @property
+    def queryCacheHits(self):
+        """
+        int: Number of filter and highlight assignments served from the query cache.
+        """
+        return self._queryCache.hits
+
+    @property
+    def queryCacheMisses(self):
+        """
+        int: Number of filter and highlight assignments that had to run their query.
+        """
+        return self._queryCache.misses
 
     @property
     def source(self):
@@ -117,40 +342,128 @@ class InteractivePlot(abc.ABC):
 
         You can assign a path to a file Pandas can read from, the URL for a SQL database, or a literal DataFrame. You
         can also pass a query as the second element (in a tuple) which will serve as the `loadQuery`, limiting the data
-        that is kept in memory.
+        that is kept in memory. For Parquet files, the selected columns and simple `WHERE` conditions of `loadQuery` are
+        applied while reading, so the rest of the file is never loaded.
+
+        In `lean` mode, only the columns returned by `_RequiredColumns` are loaded from files, on first access. Other
+        columns are read again from the file once a property refers to them. Database sources are always loaded in
+        full, and DataFrames are used as they are: holding a subset of their columns would not free any memory while
+        they are referred to, which they must be for the other columns to be read later.
         """
+        self._EnsureColumns(self._RequiredColumns())
         return self._data
 
     @source.setter
     def source(self, value):
         source, loadQuery = value if isinstance(value, tuple) else (value, None)
+        self._ResetQueryEngine()
+        self._queryCache.Clear()
+        self._dataVersion += 1
+        self._data, self._columns, self._sourceLocator, self._unpruned = None, None, None, False
+        self._origin = (source, loadQuery) if isinstance(source, str) else None
+        self._filterMask = self._highlightMask = None
         if isinstance(source, pd.DataFrame):
             self._data = source
         elif isinstance(source, str):
-            parsed = urllib.parse.urlparse(source)
-            # The following list is based on https://docs.sqlalchemy.org/en/14/dialects/#included-dialects.
-            supported_dialects = ('postgresql', 'postgres', 'mysql', 'mariadb', 'sqlite', 'oracle:thin', 'sqlserver')
-            if parsed.scheme.replace('jdbc:', '') in supported_dialects:
+            if IsDatabaseURL(source):
                 assert loadQuery is not None, 'You must specify `sqlQuery` when connecting to a database.'
-                engine = create_engine(source)
-                with engine.connect() as connection:
-                    self._data = pd.read_sql(loadQuery, connection)
+                self._data = ReadDatabase(source, loadQuery, self.chunkSize)
+            elif self.lean:
+                self._columns, self._sourceLocator = Columns(source, loadQuery), (source, loadQuery)
+                if self._columns is None:  # The query must be executed to tell what columns it returns.
+                    self._data = self._ReadFile(source, loadQuery)
+                    self._columns, self._unpruned = self._data.columns.tolist(), True
             else:
-                (remainder, extension), compression = os.path.splitext(source), None
-                if extension in ('.gz', '.bgz', '.bz2', '.zip', '.xz'):
-                    (remainder, extension), compression = os.path.splitext(remainder), extension
-                reading_methods = {
-                    '.csv': pd.read_csv,
-                    '.tsv': pd.read_table,
-                    '.parquet': pd.read_parquet,
-                }
-                assert extension in reading_methods, f'Unsupported extension "{extension}".'
-                self._data = reading_methods[extension](source)
-                if loadQuery is not None:
-                    self._data = self.Subset(loadQuery, {'data': self._data.reset_index()}).set_index('index')
+                self._data = self._ReadFile(source, loadQuery)
         else:
             msg = 'The source can be a DataFrame, a path to a file that Pandas can read, or the URL for a SQL database.'
             raise RuntimeError(msg)  # Custom exception needed?
+        # Masks are aligned to the records of the previous source, so the queries are applied again.
+        for name in ('filter', 'invertFilter', 'highlight', 'invertHighlight'):
+            if getattr(self, name) is not None:
+                setattr(self, name, getattr(self, name))
+
+    def _ReadFile(self, path, loadQuery=None, columns=None):
+        """
+        Reads the file behind `source`, streaming it in chunks if `chunkSize` is set. When streaming, the first read
+        applies `_ChunkReducer`, and later reads of extra columns (in `lean` mode) keep the rows already loaded.
+        """
+        if self.chunkSize is None:
+            return ReadFile(path, loadQuery, columns)
+        if self._data is None:
+            return ReadFile(path, loadQuery, columns, chunkSize=self.chunkSize, reduce=self._ChunkReducer())
+        return ReadFile(path, loadQuery, columns, chunkSize=self.chunkSize, index=self._data.index)
+
+    def _ChunkReducer(self):
+        """
+        Subclasses may override this method to only keep some of the rows while streaming a file, e.g. a running top.
+
+        Returns
+        -------
+        callable or None
+            Passed as `reduce` to `StreamFile`. By default, all rows surviving `loadQuery` are kept.
+        """
+        return None
+
+    @property
+    def columns(self):
+        """
+        list of str: Names of all columns available in the data, including those `lean` mode has not loaded yet.
+        """
+        if self._columns is not None:
+            return list(self._columns)
+        return None if self._data is None else self._data.columns.tolist()
+
+    def _RequiredColumns(self):
+        """
+        The method lists the columns the plot needs for rendering, based on its current properties. Subclasses extend
+        this list with their own columns.
+
+        Returns
+        -------
+        list of str
+            Names of the required columns, limited to those available in the data.
+        """
+        available = self.columns or []
+        return [column for column in dict.fromkeys(self.hovers.values()) if column in available]
+
+    def _ReferencedColumns(self, query):
+        """
+        Returns
+        -------
+        list of str: Names of the columns `query` refers to. Whatever `*` expands to is irrelevant, as only the index
+        of the result is used.
+        """
+        return LoadPlan.Parse(query, {column: None for column in self.columns or []}).referenced
+
+    def _EnsureColumns(self, columns):
+        """
+        In `lean` mode, the method loads the given columns (along with those required by the plot, on first access)
+        if they are not loaded yet. Otherwise, it does nothing.
+
+        Parameters
+        ----------
+        columns: list of str
+            Names of the needed columns.
+        """
+        if not self.lean or self._sourceLocator is None:
+            return
+        if self._data is None:
+            columns = [*self._RequiredColumns(), *columns] or self._columns[:1]
+        missing = [column for column in dict.fromkeys(columns) if column in self._columns and
+                   (self._data is None or column not in self._data.columns)]
+        if not missing:
+            return
+        path, loadQuery = self._sourceLocator
+        loaded = self._ReadFile(path, loadQuery, columns=missing)
+        if self._data is None:
+            self._data = loaded
+            return
+        if loaded.index.equals(self._data.index):
+            self._data = self._data.assign(**{column: loaded[column].to_numpy() for column in missing})
+        else:
+            self._data = self._data.join(loaded[missing])
+        self._ResetQueryEngine()  # The registered table lacks the new columns.
 
     @property
     def filter(self):
@@ -164,7 +477,9 @@ class InteractivePlot(abc.ABC):
     @filter.setter
     def filter(self, query):
         self._filter, self._invertFilter = query, None
-        self._filtered = self.Subset(query, {'data': self._data.reset_index()}).set_index('index').index
+        selected = self._Selected(query)
+        self._filterMask = self._data.index.isin(selected)
+        self._SelectionChanged()
 
     @property
     def invertFilter(self):
@@ -178,8 +493,9 @@ class InteractivePlot(abc.ABC):
     @invertFilter.setter
     def invertFilter(self, query):
         self._filter, self._invertFilter = None, query
-        self._filtered = self._data.drop(
-            self.Subset(query, {'data': self._data.reset_index()}).set_index('index').index).index
+        selected = self._Selected(query)
+        self._filterMask = ~self._data.index.isin(selected)
+        self._SelectionChanged()
     
     @property
     def filterTemplate(self):
@@ -201,7 +517,9 @@ class InteractivePlot(abc.ABC):
     @highlight.setter
     def highlight(self, query):
         self._highlight, self._invertHighlight = query, None
-        self._highlighted = self.Subset(query, {'data': self._data.reset_index()}).set_index('index').index
+        selected = self._Selected(query)
+        self._highlightMask = self._data.index.isin(selected)
+        self._SelectionChanged()
 
     @property
     def invertHighlight(self):
@@ -215,8 +533,9 @@ class InteractivePlot(abc.ABC):
     @invertHighlight.setter
     def invertHighlight(self, query):
         self._highlight, self._invertHighlight = None, query
-        self._highlighted = self._data.drop(
-            self.Subset(query, {'data': self._data.reset_index()}).set_index('index').index).index
+        selected = self._Selected(query)
+        self._highlightMask = ~self._data.index.isin(selected)
+        self._SelectionChanged()
 
     @property
     def highlightTemplate(self):
@@ -226,6 +545,13 @@ class InteractivePlot(abc.ABC):
     def highlightTemplate(self, value):
         self._highlightTemplate = value
 
+    def _SelectionChanged(self):
+        """
+        The method is called whenever the filtered or highlighted records change. Subclasses can override it to drop
+        whatever depends on them.
+        """
+        pass
+
     @property
     def minorAlpha(self):
         return self._minorAlpha
@@ -235,15 +561,70 @@ class InteractivePlot(abc.ABC):
         assert 0 <= value <= 1, 'The alpha must be in the [0,1] range.'
         self._minorAlpha = value
 
-    def _ProcessedData(self):
+    def _ProcessedData(self, columns=None):
         """
+        The method selects the filtered records through the precomputed masks, copying only the requested columns.
+        Subclasses should keep any column they derive in a separate table aligned to the result.
+
+        Parameters
+        ----------
+        columns: list of str
+            Names of the columns needed. Defaults to all loaded columns.
+
         Returns
         -------
-        pd.DataFrame: Filtered data, with an extra column, `__alpha__`, which is used to highlight certain records.
+        pd.DataFrame: The requested columns of the filtered data, with an extra boolean column, `__highlighted__`.
         """
-        df = (self._data.loc[self._filtered] if self._filtered is not None else self._data).copy()
-        df['__highlighted__'] = df.index.isin(self._highlighted) if self._highlighted is not None else True
-        return df
+        required = self._RequiredColumns()
+        self._EnsureColumns([*required, *(columns or [])])
+        if self._unpruned:  # In `lean` mode, columns loaded along with `loadQuery` are pruned on the first rendering.
+            self._data = self._data[[column for column in required if column in self._data.columns]]
+            self._unpruned = False
+            self._ResetQueryEngine()
+        columns = list(self._data.columns) if columns is None else \
+            [column for column in dict.fromkeys(columns) if column in self._data.columns]
+        df = self._data.loc[self._filterMask, columns] if self._filterMask is not None else self._data[columns]
+        highlighted = np.ones(len(self._data), dtype=bool) if self._highlightMask is None else self._highlightMask
+        return df.assign(__highlighted__=highlighted[self._filterMask] if self._filterMask is not None else highlighted)
+
+    @staticmethod
+    def _SourceData(tables, columns, rows=None):
+        """
+        The method gathers the given columns of several tables, aligned to one another, into the data of a
+        `ColumnDataSource`. Only these columns get serialized into the output, so callers should limit them to those
+        used by the glyphs and the hovers.
+
+        Numeric columns are converted to contiguous numpy arrays, which Bokeh sends in its binary encoding rather than
+        as JSON lists. Missing values of nullable numeric columns become `NaN`.
+
+        Parameters
+        ----------
+        tables: list of pd.DataFrame
+            Tables with the same number of rows, e.g. the processed data and a side table of derived columns.
+        columns: list of str
+            Names of the columns to gather. The first table holding a column provides it; missing ones are skipped.
+        rows: np.ndarray
+            Optional positions of the rows to keep.
+
+        Returns
+        -------
+        dict: Maps column names to arrays of values.
+        """
+        data = dict()
+        for column in dict.fromkeys(columns):
+            table = next((table for table in tables if column in table.columns), None)
+            if table is None:
+                continue
+            series = table[column]
+            if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+                values = series.to_numpy()
+            elif pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                values = series.to_numpy(dtype=object)
+            values = values if rows is None else values[rows]
+            data[column] = np.ascontiguousarray(values) if values.dtype != object else values
+        return data
 
     @property
     def hovers(self):
@@ -261,6 +642,7 @@ class InteractivePlot(abc.ABC):
         self._hovers = mapping if isinstance(mapping, dict) else json.loads(mapping)
 
     def _WidgetsFor(self, queryTemplate):
+        import ipywidgets as widgets
         mapping = dict()
         for variableDescriptor in re.findall(r'\{[^\{\}]*\}', queryTemplate):
             label, widget, *args = re.split(': ?', variableDescriptor[1:-1])
@@ -286,7 +668,9 @@ class InteractivePlot(abc.ABC):
             elif widget in ('singleChoice', 'multipleChoice'):
                 options, default = args
                 options, default = json.loads(options), json.loads(default)
-                options = options if isinstance(options, list) else self.source[options].unique().tolist()
+                if not isinstance(options, list):
+                    self._EnsureColumns([options])
+                    options = self._data[options].unique().tolist()
                 widget = widgets.Dropdown(options=options, value=default) \
                     if widget == 'SingleChoice' else widgets.SelectMultiple(options=options, value=[default])
             mapping[label] = widget
@@ -357,37 +741,229 @@ class InteractivePlot(abc.ABC):
         """
         plot = self.Generate()
         with self._SafeWarningsSilenced():
-            show(plot)
+            handle = show(plot, notebook_handle=True)  # Only notebooks return a handle.
+        self._shown = (plot, handle) if handle is not None else None
+
+    def _UpdateShown(self, changed):
+        """
+        The method brings the plot last displayed through `Show` in a notebook up to date with the properties named in
+        `changed`, without displaying it again. When only properties of `_StyleAttributes` changed, the glyphs and
+        color mappers of the plot are restyled in place (see `_Restyle`), leaving the data alone. Otherwise, the plot
+        is generated again and grafted onto the displayed one (see `Graft`), so that only the sources whose records
+        changed are sent again.
+
+        Parameters
+        ----------
+        changed: set of str
+            Names of the properties assigned since the plot was displayed.
+
+        Returns
+        -------
+        bool: Whether the displayed plot is up to date. Otherwise, e.g. when the layout of the plot changed, it must be
+        displayed again.
+        """
+        if self._shown is None:
+            return False
+        plot, handle = self._shown
+        if not changed:
+            return True
+        if not (changed <= set(self._StyleAttributes) and self._Restyle(plot)) and not Graft(plot, self.Generate()):
+            return False
+        from bokeh.io import push_notebook
+        push_notebook(handle=handle)
+        return True
+
+    def _Restyle(self, plot):
+        """
+        The method applies `minorAlpha` and `greyHighlight` to the points of a plot made by `Generate`, in place.
+        Points that are not highlighted are drawn by glyphs tagged `"minor"`, and take the colors of those tagged
+        `"major"` in the same subplot unless grey. Subclasses extend it with the style properties of their own.
+
+        Parameters
+        ----------
+        plot: bokeh.models.LayoutDOM
+            The plot to restyle.
+
+        Returns
+        -------
+        bool: Whether the plot was restyled. Plots whose records are drawn as density images (tagged `"density"`)
+        have their style baked in, and are left untouched.
+        """
+        glyphs = [[renderer.glyph for renderer in subplot.renderers if hasattr(renderer, 'glyph')]
+                  for subplot in plot.select({'type': Plot})]
+        if any('density' in glyph.tags for subplotGlyphs in glyphs for glyph in subplotGlyphs):
+            return False
+        for subplotGlyphs in glyphs:
+            major = next((glyph for glyph in subplotGlyphs if 'major' in glyph.tags), None)
+            for glyph in subplotGlyphs:
+                if 'minor' in glyph.tags:
+                    glyph.fill_alpha = glyph.line_alpha = glyph.hatch_alpha = self.minorAlpha
+                    if self.greyHighlight or major is not None:
+                        glyph.fill_color = glyph.hatch_color = 'grey' if self.greyHighlight else major.fill_color
+        return True
+
+    def Serve(self, port=5006, notebookURL=None):
+        """
+        The method displays the chart through a local Bokeh server, instead of a static page. Whenever the plot is
+        panned or zoomed, the records in view are sent again: all of them when there are at most `DetailLimit`,
+        otherwise one per pixel. Large data can then be explored at full resolution, one region at a time.
+
+        Parameters
+        ----------
+        port: int
+            The port the server listens on. Default is 5006.
+        notebookURL: str
+            When set, the chart is displayed in the Jupyter notebook running at this URL (e.g. `"localhost:8888"`),
+            and the method returns immediately. Otherwise, a browser tab is opened and the method blocks until
+            interrupted.
+        """
+        if notebookURL is not None:
+            with self._SafeWarningsSilenced():
+                show(self._ServedDocument, notebook_url=notebookURL, port=port)
+            return
+        from bokeh.application import Application
+        from bokeh.application.handlers.function import FunctionHandler
+        from bokeh.server.server import Server
+        server = Server({'/': Application(FunctionHandler(self._ServedDocument))}, port=port)
+        server.start()
+        server.io_loop.add_callback(server.show, '/')
+        try:
+            server.io_loop.start()
+        except KeyboardInterrupt:
+            server.stop()
+
+    def _ServedDocument(self, document):
+        """
+        The method fills a document of the Bokeh server, and keeps the records of each plot in line with its ranges.
+
+        Parameters
+        ----------
+        document: bokeh.document.Document
+            A new document, for each browser session.
+        """
+        from bokeh.events import RangesUpdate
+        with self._SafeWarningsSilenced():
+            layout, refreshers = self._GenerateServed()
+        for plot, refresh in refreshers:
+            plot.on_event(RangesUpdate, lambda event, refresh=refresh: refresh((event.x0, event.x1),
+                                                                               (event.y0, event.y1)))
+        document.add_root(layout)
 
-    def _SaveAs(self, prefix, extension):
+    def _GenerateServed(self):
         """
-        The method is a utility function for exporting the plot to a file with a certain file extension format.
+        The method generates the plot to serve, with the records to be sent through `Serve` left out.
 
-        The method uses Bokeh's builtin functions for static outputs, and Pickle, for `.caplot` which encapsulates the
-        data as well.
+        Subclasses supporting level of detail must override this method.
+
+        Returns
+        -------
+        layout: bokeh.models.LayoutDOM
+            Generated plot.
+        refreshers: list of tuple
+            Pairs of a plot and a function of its horizontal and vertical ranges, which sends the records in view.
+            The function is called once for the initial ranges before the plot is returned.
+        """
+        return self.Generate(), []
+
+    def _SaveReference(self, filepath):
+        """
+        The method writes a `.caplot` container that refers to the source of the plot, rather than holding its data.
+        It stores the file or database URL along with `loadQuery`, a fingerprint of the file, the columns, and the
+        filter and highlight masks.
+
+        Raises
+        ------
+        RuntimeError
+            If the source of the plot is a DataFrame, which can only be embedded.
+        """
+        if self._origin is None:
+            raise RuntimeError('Only plots whose source is a file or a database can be saved without their data.')
+        source, loadQuery = self._origin
+        masks = {'filter': self._filterMask, 'highlight': self._highlightMask}
+        reference = {'source': source if IsDatabaseURL(source) else os.path.abspath(source), 'loadQuery': loadQuery,
+                     'fingerprint': Fingerprint(source), 'columns': self.columns}
+        config = {'class': type(self).__name__, 'state': self._ContainerState(), 'reference': reference}
+        container.Write(filepath, None, masks, config, self.ContainerCompression)
+
+    def _Render(self, canvasType):
+        """
+        Subclasses draw the plot for static outputs here, without Bokeh, when the native renderer is chosen.
+
+        Parameters
+        ----------
+        canvasType: type
+            A subclass of `rendering.Canvas`, to be instantiated with the size of the plot.
+
+        Returns
+        -------
+        rendering.Canvas: The canvas, with the plot drawn on it.
+        """
+        raise RuntimeError(f'The native renderer does not support {type(self).__name__} plots.')
+
+    def _SaveAs(self, prefix, extensions, embedData=True, webdrivers=None, renderer='bokeh'):
+        """
+        The method is a utility function for exporting the plot to files with certain file extension formats.
+
+        The method uses Bokeh's builtin functions for static outputs. The plot is generated once per output backend:
+        `.png`, `.jpeg` and `.html` files share the canvas plot, and `.svg` and `.pdf` files share the SVG plot. The
+        JPEG image is converted from the PNG screenshot, and the PDF from the SVG file. `.caplot` containers hold the
+        data as well, in columns, along with the configuration of the plot. See `FromContainer`.
 
         Parameters
         ----------
-        plot: list or Plot
-            Bokeh-generated plot or grid-plot.
         prefix: str
-            Full path to the desired output file, minus its extension.
-        extension: str
-            The file extension format.
-        """
-        filepath = prefix + extension
-        if extension == '.caplot':
-            with open(filepath, 'wb') as stream:
-                pickle.dump(self, stream)
-        elif extension in ('.png', '.jpeg'):
+            Full path to the desired output files, minus their extension.
+        extensions: list of str
+            The file extension formats.
+        embedData: bool
+            Whether `.caplot` containers hold the data, or refer to the source instead. See `SaveAs`.
+        webdrivers: WebDriverPool
+            The browsers to render images with. Defaults to `webdrivers.SharedPool()`.
+        renderer: str
+            Either `"bokeh"` or `"native"`, which draws static outputs through `_Render`, once per type of canvas.
+        """
+        webdrivers = webdrivers if webdrivers is not None else SharedPool()
+        if renderer == 'native':
+            canvases = dict()
+            for extension in ('.png', '.jpeg', '.svg', '.pdf'):
+                if extension in extensions:
+                    canvasType = CanvasTypes[extension]
+                    if canvasType not in canvases:
+                        canvases[canvasType] = self._Render(canvasType)
+                    canvases[canvasType].Save(prefix + extension)
+            extensions = [extension for extension in extensions if extension not in CanvasTypes]
+        if '.caplot' in extensions and not embedData:
+            self._SaveReference(prefix + '.caplot')
+        elif '.caplot' in extensions:
+            self._EnsureColumns(self.columns or [])
+            data = self._data if self._data is not None else pd.DataFrame()
+            if data.columns.tolist() != (self.columns or []):  # Columns loaded on demand are kept in their order.
+                data = data[self.columns]
+            masks = {'filter': self._filterMask, 'highlight': self._highlightMask}
+            config = {'class': type(self).__name__, 'state': self._ContainerState()}
+            container.Write(prefix + '.caplot', data, masks, config, self.ContainerCompression)
+        images = [extension for extension in ('.png', '.jpeg') if extension in extensions]
+        if images or '.html' in extensions:
             plot = self.Generate(hideBokehLogo=True)
-            im = get_screenshot_as_png(plot)
-            im = im.convert('RGB')
-            im.save(filepath)
-        elif extension in ('.svg', '.pdf'):
+            if images:
+                with webdrivers.Driver() as driver:
+                    image = get_screenshot_as_png(plot, driver=driver).convert('RGB')
+                for extension in images:
+                    image.save(prefix + extension)
+            if '.html' in extensions:
+                filepath = prefix + '.html'
+                reset_output()
+                output_file(filepath)
+                save(plot, filepath)
+                reset_output()
+                warn('To avoid further issues, output states have been reset. Please invoke output_notebook() again if you are working in a notebook.')
+        if '.svg' in extensions or '.pdf' in extensions:
             plot = self.Generate(hideBokehLogo=True, outputBackend='svg')
-            export_svg(plot, filename=filepath)
-            if extension == '.pdf':
+            # Without an SVG output, the SVG is written in place of the PDF, then converted.
+            filepath = prefix + ('.svg' if '.svg' in extensions else '.pdf')
+            with webdrivers.Driver() as driver:
+                export_svg(plot, filename=filepath, webdriver=driver)
+            if '.pdf' in extensions:
                 try:
                     from svglib.svglib import svg2rlg
                     from reportlab.graphics import renderPDF
@@ -395,16 +971,9 @@ class InteractivePlot(abc.ABC):
                     raise RuntimeError('You need to install "svglib" and "reportlab" for PDF exports.')
                 else:
                     drawing = svg2rlg(filepath)
-                    renderPDF.drawToFile(drawing, filepath)
-        elif extension == '.html':
-            plot = self.Generate()
-            reset_output()
-            output_file(filepath)
-            save(plot, filepath)
-            reset_output()
-            warn('To avoid further issues, output states have been reset. Please invoke output_notebook() again if you are working in a notebook.')
+                    renderPDF.drawToFile(drawing, prefix + '.pdf')
 
-    def SaveAs(self, filepath):
+    def SaveAs(self, filepath, embedData=True, webdrivers=None, renderer=None):
         """
         The method stores the plot with the latest changes as the specified file. The method of exporting is inferred
         based on the file extension format of `filepath`. If `filepath` doesn't end in an extension, it is assumed that
@@ -414,20 +983,35 @@ class InteractivePlot(abc.ABC):
         ----------
         filepath: str
             Relative or absolute path for exporting. Supported file extension formats are `pdf`, `html`, `png`, `jpeg`.
+        embedData: bool
+            Whether `.caplot` containers hold a copy of the data. When unset, they refer to the source file or database
+            instead, which is read again when the plot is. Default is `True`.
+        webdrivers: WebDriverPool
+            The headless browsers that render images, which are kept running across exports. Defaults to the pool
+            shared by all plots, see `webdrivers.SharedPool`. Give a larger pool to export from several threads.
+        renderer: str
+            Either `"bokeh"`, which renders `.png`, `.jpeg`, `.svg` and `.pdf` files through a headless browser, or
+            `"native"`, which draws them with Pillow, plain SVG and reportlab (for PDF), without a browser. Defaults to
+            `StaticRenderer`.
 
         Raises
         ------
         AssertionError
             If the target file extension format is not supported.
+        RuntimeError
+            If `embedData` is unset while the source of the plot is a DataFrame.
         """
         prefix, extension = os.path.splitext(filepath)
-        assert extension in self.SupportedExtensions, 'Unsupported file extension format.'
-        for extension in ([extension] if extension else self.SupportedExtensions):
-            with self._SafeWarningsSilenced():
-                self._SaveAs(prefix, extension)
+        assert not extension or extension in self.SupportedExtensions, 'Unsupported file extension format.'
+        renderer = renderer or self.StaticRenderer
+        assert renderer in ('bokeh', 'native'), 'Acceptable renderers are "bokeh" and "native".'
+        with self._SafeWarningsSilenced():
+            self._SaveAs(prefix, [extension] if extension else self.SupportedExtensions, embedData, webdrivers,
+                         renderer)
 
     @staticmethod
     def _GenerateGrid(mapping, keepCasing=False):
+        import ipywidgets as widgets
         grid = widgets.GridspecLayout(len(mapping), 2)
         for index, (label, widget) in enumerate(mapping.items()):
             grid[index, 0], grid[index, 1] = widgets.Label(label if keepCasing else titlecase(label)), widget
@@ -438,6 +1022,8 @@ class InteractivePlot(abc.ABC):
         The method is intended to be used in notebooks. It will list all widgets defined for the plot, along with a
         button that when triggered, will attempt to assign the widgets' values to the instance and then plot the result.
         """
+        import ipywidgets as widgets
+        from IPython.display import display
         # Interactive Plot Widgets
         filterWidgets = self._WidgetsFor(self.filterTemplate) if self.filterTemplate else \
             {'filterQuery': widgets.Text(value=self.filter, placeholder='SQL Query')}
@@ -447,18 +1033,32 @@ class InteractivePlot(abc.ABC):
         highlightForm = self._GenerateGrid(highlightWidgets)
         hoverWidgets = {'hovers': widgets.Text(value=json.dumps(self.hovers), placeholder='JSON Object')}
         hoverForm = self._GenerateGrid(hoverWidgets)
+        # Style Widgets
+        styleWidgets = {'minorAlpha': widgets.FloatSlider(value=self.minorAlpha, min=0, max=1, step=0.05),
+                        'greyHighlight': widgets.Checkbox(value=self.greyHighlight)}
+        styleForm = self._GenerateGrid(styleWidgets)
         # Subclass Widgets
         subclassWidgets = self.Widgets()
         subclassForm = self._GenerateGrid(subclassWidgets)
         # Defining the Output Slot and the "Show" Button
         output = widgets.Output()
         button = widgets.Button(description='Show')
+        displayed = None  # The plot the form displayed last, which is updated in place while its layout holds.
 
         # The Callback Function Triggered When the Button is Clicked
         def callback(button):
+            nonlocal displayed
             button.description = '...'  # To indicate that the process is being performed.
             button.disabled = True
-            output.clear_output()
+            changed = set()  # Only the properties whose values differ are assigned, and the plot updated for.
+
+            def Assign(attr, value):
+                before = getattr(self, attr)
+                if value != before:
+                    setattr(self, attr, value)
+                    if getattr(self, attr) != before:  # Setters may normalize values, e.g. parse JSON.
+                        changed.add(attr)
+
             with output:
                 # Specifying the Filtering Query
                 if self.filterTemplate is not None:
@@ -467,7 +1067,7 @@ class InteractivePlot(abc.ABC):
                 else:
                     filterQuery = filterWidgets['filterQuery'].value
                 if filterQuery:
-                    self.filter = filterQuery
+                    Assign('filter', filterQuery)
                 # Specifying the Highlighting Query
                 if self.highlightTemplate is not None:
                     values = {label: widget.value for label, widget in highlightWidgets.items()}
@@ -475,21 +1075,24 @@ class InteractivePlot(abc.ABC):
                 else:
                     highlightQuery = highlightWidgets['highlightQuery'].value
                 if highlightQuery:
-                    self.highlight = highlightQuery
+                    Assign('highlight', highlightQuery)
                 # Specifying the Hover Setting
                 hoverMapping = hoverWidgets['hovers'].value
                 if hoverMapping:
-                    self.hovers = hoverMapping
-                # Assigning the Properties in the Subclass
-                for attr, widget in subclassWidgets.items():
+                    Assign('hovers', json.loads(hoverMapping))
+                # Assigning the Style and the Properties in the Subclass
+                for attr, widget in {**styleWidgets, **subclassWidgets}.items():
                     if widget.value not in (None, ''):  # Can't rule out all falsy values. Might limit this further.
-                        setattr(self, attr, widget.value)
-                self.Show()
+                        Assign(attr, widget.value)
+                if displayed is None or displayed is not self._shown or not self._UpdateShown(changed):
+                    output.clear_output()
+                    self.Show()
+                    displayed = self._shown
             button.disabled = False
             button.description = 'Show'
 
         # Binding the Callback Function to the Button
         button.on_click(callback)
         # Displaying All Components
-        ui = widgets.VBox([filterForm, highlightForm, hoverForm, subclassForm, button, output])
+        ui = widgets.VBox([filterForm, highlightForm, hoverForm, styleForm, subclassForm, button, output])
         display(ui)
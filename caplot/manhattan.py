@@ -1,23 +1,26 @@
-import importlib.resources as resources
-from pprint import pformat
+import json
+from warnings import warn
 
-import ipywidgets as widgets
 import numpy as np
 import pandas as pd
-import requests
-import yaml
 from bokeh import palettes
 from bokeh.models import (
     CategoricalColorMapper, ColumnDataSource, HoverTool,
 )
 from bokeh.plotting import figure
-from munch import munchify
 from stringcase import titlecase
 
+from .aggregation import DensityImage, ThinnedRows, ViewportRows
+from .annotation import AnnotationCache, AnnotationTask
 from .interactiveplot import InteractivePlot
+from .refgenome import Genome, Genomes, ReferenceGenome, Register
+from .rendering import Frame
 
-with resources.open_binary('caplot', 'refgen.yaml') as stream:
-    refGenome = munchify(yaml.full_load(stream))
+
+def __getattr__(name):
+    if name == 'refGenome':  # Kept for code using the module attribute.
+        return {genome: Genome(genome) for genome in Genomes()}
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 class Manhattan(InteractivePlot):
@@ -49,8 +52,9 @@ class Manhattan(InteractivePlot):
         Whether the non-highlighted data points must be colored grey.
     hovers: dict
         A mapping of arbitrary labels to certain columns in the data source.
-    genome: str
-        The name of a genome reference set. Current supported values are `"GRCh37"` and `"GRCh38"`. Defaults to `"GRCh37"`.
+    genome: str or ReferenceGenome
+        The name of a registered genome reference set, e.g. `"GRCh37"` (the default) or `"GRCh38"`, or a custom
+        `ReferenceGenome`, which then gets registered.
     contig: str
         Name of a column present in the data.
     position:
@@ -74,33 +78,74 @@ class Manhattan(InteractivePlot):
         Passed directly to Bokeh to specify the size of all points. Default is 5.
     yRange: tuple
         Specifies the range of the vertical axis. Defaults to 0 and 1.05 x the maximum value.
+    lean: bool
+        When set, only the columns needed by the plot are loaded from files. DataFrames, which are in memory already,
+        are used as they are. Default is `False`.
+    chunkSize: int
+        When set, CSV/TSV files are streamed in chunks of this many rows, and `loadQuery` is applied to each chunk.
+        Database results are fetched in chunks of this many rows as well, and stored with compact dtypes.
+    streamTop: bool
+        When set along with `chunkSize` and `top`, only the `top` most significant records are kept while streaming,
+        so the full table is never held in memory. Note that filtering then applies to these records only.
+    thinThreshold: float
+        When set, records with a -log10(p-value) at or above this value are all drawn, while the others are thinned
+        down to one record per pixel of the plot. This keeps plots of millions of records light, without changing how
+        they look. Default is `None`, i.e. all records are drawn.
+    rasterize: bool
+        When set, the records that are not highlighted are aggregated into a single image, blending the colors of
+        their contigs, while highlighted records are still drawn as points with hovers. The size of the plot then no
+        longer depends on the number of records. Default is `False`.
     """
 
     Palettes = 'Category10', 'Category20', 'Category20b', 'Category20c', 'Accent', 'GnBu', 'PRGn', 'Paired'
     VEPURL = 'https://rest.ensembl.org/vep/human/id'
-    VEPLimit = 200
+    VEPLimit = 200  # Number of most significant records to annotate.
+    VEPBatchSize = 200  # Number of IDs sent to `VEPURL` at once.
+    VEPWorkers = 4  # Number of batches sent concurrently.
+    VEPCache = True  # Whether annotations are kept on disk across sessions, see `AnnotationCache`.
+    VEPCacheDirectory = None  # Defaults to `CAPLOT_CACHE_DIR` if set, otherwise to `~/.cache/caplot`.
+    VEPCacheTTL = 30 * 24 * 3600  # Seconds after which cached annotations are fetched again.
+    VEPCacheSize = 1000000  # The most annotations kept on disk.
+    VEPOffline = False  # When set, only cached annotations are used.
+    VEPBackground = True  # Whether annotations are fetched in the background, see `annotationTask`.
     GAP_RATIO = 0.01
+    _TransientAttributes = (*InteractivePlot._TransientAttributes, '_annotationTask', '_annotationProgress',
+                            '_coordinates', '_topRows')
+    _StyleAttributes = (*InteractivePlot._StyleAttributes, 'coloringPalette', 'numColors')
 
     def __init__(self, source=None, loadQuery=None, filter=None, invertFilter=None, filterTemplate=None, highlight=None,
                  invertHighlight=None, highlightTemplate=None, minorAlpha=None, greyHighlight=None, hovers=None,
                  genome='GRCh37', contig=None, position=None, pvalue=None, mlog10=False, top=None, width=800,
-                 height=600, coloringPalette='Category10', numColors=2, pointSize=5, yRange=None):
-        super(Manhattan, self).__init__(source, loadQuery, filter, invertFilter, filterTemplate, highlight,
-                                        invertHighlight, highlightTemplate, minorAlpha, greyHighlight, hovers)
+                 height=600, coloringPalette='Category10', numColors=2, pointSize=5, yRange=None, lean=False,
+                 chunkSize=None, streamTop=False, thinThreshold=None,
+                 rasterize=False):
+        # Declared ahead of loading, as `lean` mode and streaming consult them through `_RequiredColumns` and
+        # `_ChunkReducer`. The columns are validated once the data is loaded.
         self._genome = None
-        self._contig = None
-        self._position = None
-        self._pvalue = None
+        self._referenceGenome = None
+        self._contig = contig
+        self._position = position
+        self._pvalue = pvalue
+        self._rsidColumn = None
+        self._annotationTask = None
+        self._annotationProgress = None
         self.mlog10 = mlog10
         self.top = top
+        self.streamTop = streamTop
+        super(Manhattan, self).__init__(source, loadQuery, filter, invertFilter, filterTemplate, highlight,
+                                        invertHighlight, highlightTemplate, minorAlpha, greyHighlight, hovers, lean,
+                                        chunkSize)
         self.width = width
         self.height = height
         self._coloringPalette = None
         self.numColors = numColors
-        self._rsidColumn = None
         self.pointSize = pointSize
         self.yRange = yRange
+        self.thinThreshold = thinThreshold
+        self.rasterize = rasterize
         self._annotationData = None
+        self._coordinates = None
+        self._topRows = None
         # Initializations
         if genome is not None:
             self.genome = genome
@@ -113,24 +158,71 @@ class Manhattan(InteractivePlot):
         if coloringPalette is not None:
             self.coloringPalette = coloringPalette
 
+    def __getstate__(self):
+        state = super(Manhattan, self).__getstate__()
+        state['_annotationTask'] = state['_annotationProgress'] = None  # Threads and widgets can not be pickled.
+        return state
+
+    def __setstate__(self, state):
+        super(Manhattan, self).__setstate__(state)
+        self.__dict__.setdefault('_annotationTask', None)
+        self.__dict__.setdefault('_annotationProgress', None)
+        genome = self.__dict__.get('_referenceGenome')
+        if genome is None or genome.name != self._genome:  # Older pickles only have the name of the genome.
+            self._referenceGenome = Genome(self._genome) if self._genome is not None else None
+        # Older pickles do not have these attributes.
+        self.__dict__.setdefault('_coordinates', None)
+        self.__dict__.setdefault('_topRows', None)
+        self.__dict__.setdefault('thinThreshold', None)
+        self.__dict__.setdefault('rasterize', False)
+
+    def _ContainerState(self, **encoded):
+        genome, annotations = self._referenceGenome, self._annotationData
+        if genome is not None:
+            encoded['_referenceGenome'] = {'name': genome.name, 'contigs': genome.contigs,
+                                           'lengths': genome.contigLengths.tolist()}
+        if annotations is not None:
+            encoded['_annotationData'] = json.loads(annotations.to_json(orient='split'))
+        return super(Manhattan, self)._ContainerState(**encoded)
+
+    @classmethod
+    def _StateFromContainer(cls, state):
+        state = super(Manhattan, cls)._StateFromContainer(state)
+        if state.get('_referenceGenome') is not None:
+            genome = state['_referenceGenome']
+            state['_referenceGenome'] = ReferenceGenome(genome['name'], genome['contigs'], genome['lengths'])
+        if state.get('_annotationData') is not None:
+            state['_annotationData'] = pd.DataFrame(**state['_annotationData'])
+        return state
+
     @property
     def genome(self):
         """
-        str: The name of a genome reference set. Current supported values are `"GRCh37"` and `"GRCh38"`.
+        str: The name of a genome reference set, e.g. `"GRCh37"` or `"GRCh38"`. See `caplot.refgenome.Genomes()`.
+
+        A `ReferenceGenome` can be assigned as well, e.g. `ReferenceGenome.FromFai('GRCm39.fa.fai')`. It is registered
+        (replacing any other genome with the same name) and kept along with the plot.
+
+        The builtin genomes list X, Y and the mitochondrial genome after the autosomes, whose offsets are unchanged. As
+        the x-axis spans the whole genome, it extends past chromosome 22 further than before these contigs were added,
+        even for data on autosomes only.
         """
         return self._genome
 
     @genome.setter
     def genome(self, value):
-        assert value in refGenome.keys(), f'Acceptable "genome" values are {", ".join(refGenome.keys())}.'
-        self._genome = value
+        if isinstance(value, ReferenceGenome):
+            self._referenceGenome = Register(value, replace=True)
+        else:
+            self._referenceGenome = Genome(value)
+        self._genome = self._referenceGenome.name
 
     @property
     def refGenome(self):
         """
-        dict: Reference data for the specified `genome`.
+        ReferenceGenome: Reference data for the specified `genome`.
         """
-        return refGenome[self.genome]
+        return self._referenceGenome
 
     @property
     def contig(self):
@@ -141,8 +233,8 @@ class Manhattan(InteractivePlot):
 
     @contig.setter
     def contig(self, value):
-        if self.source is not None:
-            assert value in self.source.columns, f'Could not find a column named "{value}" in data.'
+        if self.columns is not None:
+            assert value in self.columns, f'Could not find a column named "{value}" in data.'
         self._contig = value
 
     @property
@@ -154,8 +246,8 @@ class Manhattan(InteractivePlot):
 
     @position.setter
     def position(self, value):
-        if self.source is not None:
-            assert value in self.source.columns, f'Could not find a column named "{value}" in data.'
+        if self.columns is not None:
+            assert value in self.columns, f'Could not find a column named "{value}" in data.'
         self._position = value
 
     @property
@@ -167,8 +259,8 @@ class Manhattan(InteractivePlot):
 
     @pvalue.setter
     def pvalue(self, value):
-        if self.source is not None:
-            assert value in self.source.columns, f'Could not find a column named "{value}" in data.'
+        if self.columns is not None:
+            assert value in self.columns, f'Could not find a column named "{value}" in data.'
         self._pvalue = value
         
     @property
@@ -183,47 +275,256 @@ class Manhattan(InteractivePlot):
         """
         str: Name of a column.
 
-        When set, it will contact "ensembl.org" and store annotations for the top 200 values. This process can last up to a few minutes.
+        When set, it will contact `VEPURL` and store annotations for the top `VEPLimit` values. The IDs are sent in
+        batches of `VEPBatchSize`, `VEPWorkers` at a time, and throttled requests are retried (see `VEPClient`).
+        Annotations are cached on disk (see `VEPCache`), so that only new IDs are sent, unless `VEPOffline` is set.
+
+        Unless `VEPBackground` is unset, the assignment returns immediately and annotations are fetched in the
+        background, see `annotationTask`.
         """
         return self._rsidColumn
 
     @rsidColumn.setter
     def rsidColumn(self, value):
-        if self.source is not None:
-            assert value in self.source.columns, f'Could not find a column named "{value}" in data.'
+        if self.columns is not None:
+            assert value in self.columns, f'Could not find a column named "{value}" in data.'
         self._rsidColumn = value
         # Get the filtered and highlighted data
-        data = self._ProcessedData()
+        data = self._ProcessedData([self.pvalue, self._rsidColumn])
         # data = data[data['__alpha__'] == 1]
         # Take the top `VEPLimit` most significant variants
-        data = data.sort_values(by=self.pvalue)
-        data = data.tail(self.VEPLimit) if self.mlog10 else data.head(self.VEPLimit)
-        uniqueIDs = data[self._rsidColumn].unique().tolist()
-        # VEP API call
-        response = requests.post(self.VEPURL, json={'ids': uniqueIDs})
-        if not response.ok:
-            response.raise_for_status()
+        data = data.iloc[self._MostSignificant(data[self.pvalue], self.VEPLimit)]
+        uniqueIDs = data[self._rsidColumn].dropna().astype('str').unique().tolist()
+        # VEP API calls, for the IDs missing from the cache
+        if self._annotationTask is not None:
+            self._annotationTask.Cancel()
+        # Until the new task is assigned, its updates are told apart from those of cancelled ones by not being
+        # cancelled, see `_AnnotationUpdated`.
+        self._annotationTask, self._annotationData = None, None
+        cache = AnnotationCache(self.VEPCacheDirectory, self.VEPCacheTTL, self.VEPCacheSize) if self.VEPCache else None
+        self._annotationProgress = self._ProgressWidget() if self.VEPBackground else None
+        loop = self._NotebookLoop()
+        self._annotationTask = AnnotationTask(uniqueIDs, lambda task: self._AnnotationUpdated(task, loop),
+                                              url=self.VEPURL, genome=self.genome, batchSize=self.VEPBatchSize,
+                                              workers=self.VEPWorkers, cache=cache, offline=self.VEPOffline)
+        if not self.VEPBackground:
+            self._annotationTask.Wait()
+
+    @property
+    def annotationTask(self):
+        """
+        AnnotationTask: The task fetching annotations since `rsidColumn` was last assigned, if any.
+
+        Until it is over, `Generate` uses the annotations received so far. Plots displayed in a notebook through
+        `Show` get their tooltips updated once it is over. Use `annotationTask.Wait()` to wait for it, or
+        `annotationTask.Cancel()` to cancel it. It is also cancelled when the filtered or highlighted records change.
+        """
+        return self._annotationTask
+
+    def _SelectionChanged(self):
+        if self._annotationTask is not None and not self._annotationTask.done:
+            self._annotationTask.Cancel()
+
+    @staticmethod
+    def _ProgressWidget():
+        """
+        Returns
+        -------
+        widgets.FloatProgress or None: A progress bar displayed in the notebook, unless running outside of one.
+        """
+        from IPython import get_ipython
+        if not hasattr(get_ipython(), 'kernel'):
+            return None
+        import ipywidgets as widgets
+        from IPython.display import display
+        progress = widgets.FloatProgress(value=0, min=0, max=1, description='Annotating')
+        display(progress)
+        return progress
+
+    @staticmethod
+    def _NotebookLoop():
+        """
+        Returns
+        -------
+        tornado.ioloop.IOLoop or None: The event loop of the notebook kernel, which runs on the main thread, unless
+        running outside of a notebook.
+        """
+        from IPython import get_ipython
+        return getattr(getattr(get_ipython(), 'kernel', None), 'io_loop', None)
+
+    def _AnnotationUpdated(self, task, loop):
+        """
+        The method is called by `annotationTask` from background threads whenever new annotations arrive, and once it
+        is over. The progress bar and the plot displayed in the notebook are then updated from `loop`, on the main
+        thread, see `_AnnotationShown`.
+        """
+        if task is not self._annotationTask and (self._annotationTask is not None or task.cancelled):
+            return  # A task that has been replaced.
         # Convert VEP data into pandas dataframe
-        df = pd.DataFrame(response.json())
-        for column in df.columns:
-            if pd.api.types.is_object_dtype(df[column].dtype):
-                example = df[column].loc[~df[column].isnull()].iloc[0]
-                if isinstance(example, list) or isinstance(example, dict):
-                    df[column] = df[column].apply(lambda element: pformat(element))
+        records = task.records
+        df = pd.DataFrame(records) if records else pd.DataFrame(columns=['id'])
         df.columns = [f'__anon__{column}__' for column in df.columns]
         self._annotationData = df
+        # Whether it is over is told now, as the callbacks of earlier updates may run after it is.
+        if loop is not None:
+            loop.add_callback(self._AnnotationShown, task, task.done)
+        else:  # Nothing is displayed outside of a notebook.
+            self._AnnotationShown(task, task.done)
+
+    def _AnnotationShown(self, task, done):
+        """
+        The method updates the progress bar and the displayed plot with the annotations of `task`, and warns when it
+        failed in the background. `done` tells whether the update is the last one.
+        """
+        if task is not self._annotationTask and (self._annotationTask is not None or task.cancelled):
+            return
+        if self._annotationProgress is not None:
+            self._annotationProgress.value = task.progress
+            if done:
+                failed = task.future.exception() is not None
+                self._annotationProgress.bar_style = 'danger' if failed else 'warning' if task.cancelled else 'success'
+                self._annotationProgress.description = \
+                    'Failed' if failed else 'Cancelled' if task.cancelled else 'Annotated'
+        if done:
+            error = task.future.exception()
+            if error is not None and self.VEPBackground:  # Otherwise, it is raised by the `rsidColumn` assignment.
+                warn(f'The annotations could not be fetched from "{self.VEPURL}": {error!r}')
+            self._PushAnnotations()
+
+    def _AnnotationTooltips(self):
+        """
+        Returns
+        -------
+        list of tuple: Tooltips for the annotation columns.
+        """
+        if not self.rsidColumn or self._annotationData is None:
+            return []
+        return [(titlecase(columnName[8:-2]), f'@{{{columnName}}}') for columnName in self._annotationData.columns]
+
+    def _AnnotationColumns(self, ids):
+        """
+        Parameters
+        ----------
+        ids: np.ndarray
+            Values of the `rsidColumn` of some records.
+
+        Returns
+        -------
+        pd.DataFrame: The annotations of the records, in their order.
+        """
+        annotations = self._annotationData.drop_duplicates('__anon__id__').set_index('__anon__id__', drop=False)
+        return annotations.reindex(ids)
+
+    def _PushAnnotations(self):
+        """
+        The method updates the tooltips of the plot last displayed through `Show` in a notebook with the latest
+        annotations.
+        """
+        if self._shown is None or self._annotationData is None:
+            return
+        from bokeh.io import push_notebook
+        plot, handle = self._shown
+        renderers = [renderer for renderer in plot.renderers
+                     if self.rsidColumn in getattr(renderer.data_source, 'data', dict())]
+        for renderer in renderers:
+            annotations = self._AnnotationColumns(np.asarray(renderer.data_source.data[self.rsidColumn]).astype('str'))
+            renderer.data_source.data = {**renderer.data_source.data,
+                                         **self._SourceData([annotations], annotations.columns)}
+        tooltips = [(label, f'@{{{columnName}}}') for label, columnName in self.hovers.items()]
+        tooltips.extend(self._AnnotationTooltips())
+        hoverTools = plot.select(type=HoverTool)
+        if hoverTools:
+            for hoverTool in hoverTools:
+                hoverTool.tooltips = tooltips
+        elif tooltips:
+            plot.add_tools(HoverTool(tooltips=tooltips, renderers=renderers))
+        push_notebook(handle=handle)
+
+    def _Restyle(self, plot):
+        basePalette = self._BasePalette()
+        if not super(Manhattan, self)._Restyle(plot):
+            return False
+        for colorMapper in plot.select({'type': CategoricalColorMapper}):
+            colorMapper.palette = [basePalette[index % self.numColors] for index in range(len(colorMapper.factors))]
+        return True
 
     @coloringPalette.setter
     def coloringPalette(self, value):
         assert value in self.Palettes, f'Acceptable color palettes values are {", ".join(self.Palettes)}.'
         self._coloringPalette = value
 
+    def _Coordinates(self):
+        """
+        The method encodes the contig of every loaded record against the contigs of the reference genome, and places
+        the record on the concatenated genome through a gather of the contig offsets. The result is cached
+        until `source`, `contig`, `position` or `genome` changes.
+
+        Records on contigs the reference genome does not have (or with no contig) are reported with a warning.
+
+        Returns
+        -------
+        codes: np.ndarray
+            For each record, the position of its contig in `refGenome.contigs`, or -1 if the contig is unknown.
+        locations: np.ndarray
+            For each record, its location on the concatenated genome, or `NaN` if the contig is unknown.
+        """
+        key = (self._dataVersion, self.contig, self.position, self.refGenome)
+        if self._coordinates is not None and self._coordinates[0] == key:
+            return self._coordinates[1]
+        codes, unknown = self.refGenome.Codes(self._data[self.contig])
+        if unknown or (codes < 0).any():
+            unknown = ', '.join(f'"{contig}"' for contig in unknown[:10]) + (', ...' if len(unknown) > 10 else '')
+            warn(f'{(codes < 0).sum()} records are left out, as their contig is missing or unknown to "{self.genome}"'
+                 + (f': {unknown}.' if unknown else '.'))
+        offsets = self.refGenome.offsets.astype(np.float64)
+        positions = self._data[self.position].to_numpy(dtype=np.float64, na_value=np.nan)
+        locations = np.where(codes >= 0, offsets[codes] + positions, np.nan)
+        self._coordinates = key, (codes, locations)
+        return codes, locations
+
+    def _MostSignificant(self, pvalues, n):
+        """
+        The method selects the `n` most significant records, i.e. those with the smallest `pvalue` (or the largest, if
+        `mlog10` is set), through a partial selection in linear time rather than a full sort. Missing values are never
+        selected.
+
+        Parameters
+        ----------
+        pvalues: pd.Series
+            The values of the `pvalue` column.
+        n: int
+            Number of records to select.
+
+        Returns
+        -------
+        np.ndarray: Positions of the selected records in `pvalues`, in their original order.
+        """
+        values = pvalues.to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = np.flatnonzero(~np.isnan(values))
+        if n >= len(valid):
+            return valid
+        scores = -values[valid] if self.mlog10 else values[valid]
+        return valid[np.sort(np.argpartition(scores, n - 1)[:n])] if n > 0 else valid[:0]
+
+    def _ChunkReducer(self):
+        if not self.streamTop or self.top is None or self.pvalue is None:
+            return None
+        top, pvalue = self.top, self.pvalue
+        if self.mlog10:
+            return lambda df: df.nlargest(top, pvalue)
+        return lambda df: df.nsmallest(top, pvalue)
+
+    def _RequiredColumns(self):
+        columns = [self.contig, self.position, self.pvalue, self.rsidColumn]
+        return list(dict.fromkeys([*super(Manhattan, self)._RequiredColumns(), *filter(None, columns)]))
+
     def Widgets(self):
-        if self.source is not None:
+        import ipywidgets as widgets
+        if self.columns is not None:
             localWidgets = {
-                'contig': widgets.Dropdown(options=self.source.columns, value=self.contig),
-                'position': widgets.Dropdown(options=self.source.columns, value=self.position),
-                'pvalue': widgets.Dropdown(options=self.source.columns, value=self.pvalue),
+                'contig': widgets.Dropdown(options=self.columns, value=self.contig),
+                'position': widgets.Dropdown(options=self.columns, value=self.position),
+                'pvalue': widgets.Dropdown(options=self.columns, value=self.pvalue),
             }
         else:
             localWidgets = {
@@ -232,58 +533,186 @@ class Manhattan(InteractivePlot):
                 'pvalue': widgets.Text(placeholder='Column Name'),
             }
         return {
-            'genome': widgets.Dropdown(options=refGenome.keys(), value=self.genome),
+            'genome': widgets.Dropdown(options=Genomes(), value=self.genome),
             **localWidgets,
-            'coloringPalette': widgets.Dropdown(options=self.Palettes, value='Category10'),
-            'numColors': widgets.IntSlider(value=2, min=1, max=22, step=1),
+            'coloringPalette': widgets.Dropdown(options=self.Palettes, value=self.coloringPalette),
+            'numColors': widgets.IntSlider(value=self.numColors, min=1, max=22, step=1),
         }
 
     def Generate(self, outputBackend='canvas', hideBokehLogo=True):
-        data = self._ProcessedData()
-        if self.top is not None:
-            data = data.sort_values(by=self.pvalue)
-            data = data.tail(self.top) if self.mlog10 else data.head(self.top)
-        if self.mlog10:
-            yColumnName = self.pvalue
-        else:
-            data['__pvalue__'] = -np.log10(data[self.pvalue])
+        return self._Generate(outputBackend, hideBokehLogo)[0]
+
+    def _GenerateServed(self):
+        plot, (tables, sourceColumns, locations, yValues, layers) = self._Generate(served=True)
+
+        def Refresh(xRange, yRange):
+            for renderer, rows in layers:
+                inView = ViewportRows(locations[rows], yValues[rows], xRange, yRange, self.width, self.height,
+                                      self.DetailLimit, self.thinThreshold)
+                renderer.data_source.data = self._SourceData(tables, sourceColumns, rows[inView])
+
+        Refresh((plot.x_range.start, plot.x_range.end), (plot.y_range.start, plot.y_range.end))
+        return plot, [(plot, Refresh)]
+
+    def _Generate(self, outputBackend='canvas', hideBokehLogo=True, served=False):
+        """
+        The method generates the plot, as `Generate` does.
+
+        Parameters
+        ----------
+        outputBackend: str
+            Specifies the target output backend for Bokeh.
+        hideBokehLogo: bool
+            When set, Bokeh's logo will be removed from the toolbar.
+        served: bool
+            When set, the point glyphs are left empty, for `Serve` to fill.
+
+        Returns
+        -------
+        plot: Plot
+            Generated plot.
+        detail: tuple
+            The tables and columns the sources are made of, the coordinates of the records, and pairs of each point
+            glyph with the positions of the records it draws.
+        """
+        columns = [self.contig, self.position, self.pvalue, *self.hovers.values()]
+        if self.rsidColumn:
+            columns.append(self.rsidColumn)
+        data, contigCodes, locations = self._Selection(columns)
+        # Derived columns are kept in a side table aligned to `data`, instead of being written into it.
+        derived = pd.DataFrame(index=data.index)
+        yColumnName, yValues = self.pvalue, data[self.pvalue].to_numpy(dtype=np.float64, na_value=np.nan)
+        if not self.mlog10:
+            derived['__pvalue__'] = yValues = -np.log10(yValues)
             yColumnName = '__pvalue__'
-        data[self.contig] = data[self.contig].astype(str)
-        data['__location__'] = data[self.contig].replace(self.refGenome['cumulativeLengths']) + data[self.position]
-        try:
-            palette = getattr(palettes, self.coloringPalette)
-            palette = next(value for key, value in palette.items() if key > self.numColors)
-        except StopIteration:
-            raise RuntimeError(f'The chosen color palette does not have {self.numColors} distinct colors.')
-        else:
-            palette = [palette[index % self.numColors] for index, label in enumerate(self.refGenome['contigOrder'])]
-            colorMapper = CategoricalColorMapper(palette=palette, factors=self.refGenome['contigOrder'])
-            color = {'field': self.contig, 'transform': colorMapper}
+        derived['__contig__'] = np.asarray(self.refGenome.contigs, dtype=object)[contigCodes]
+        derived['__location__'] = locations
+        basePalette = self._BasePalette()
+        palette = [basePalette[index % self.numColors] for index, label in enumerate(self.refGenome.contigs)]
+        colorMapper = CategoricalColorMapper(palette=palette, factors=self.refGenome.contigs)
+        color = {'field': '__contig__', 'transform': colorMapper}
         tooltips = []
         if self.hovers:
             tooltips.extend((label, f'@{{{columnName}}}') for label, columnName in self.hovers.items())
+        tables, sourceColumns = [data, derived], ['__location__', yColumnName, '__contig__', *self.hovers.values()]
         if self.rsidColumn:
-            data = data.merge(right=self._annotationData, left_on=self.rsidColumn, right_on='__anon__id__', how='left')
-            tooltips.extend((titlecase(columnName[8:-2]), f'@{{{columnName}}}') for columnName in self._annotationData.columns)
-        # Calculate xRange to add gaps on either side
-        lastContig = self.refGenome.contigOrder[-1]
-        xLen = self.refGenome.cumulativeLengths[lastContig] + self.refGenome.lengths[lastContig]
-        xGap = int(xLen * self.GAP_RATIO)
-        xRange = (0-xGap, xLen+xGap)
-        defaultYRange = (0, 1.05 * data[yColumnName].max())
-        plot = figure(width=self.width, height=self.height, x_range=xRange, y_range=self.yRange or defaultYRange,
+            # Kept in the sources, so that annotations arriving later can be matched to the points.
+            sourceColumns = list(dict.fromkeys([*sourceColumns, self.rsidColumn]))
+        if self.rsidColumn and self._annotationData is not None:
+            tables.append(self._AnnotationColumns(data[self.rsidColumn].astype('str').to_numpy()))
+            sourceColumns.extend(self._annotationData.columns)
+            tooltips.extend(self._AnnotationTooltips())
+        xRange, yRange = self._Ranges(yValues)
+        plot = figure(width=self.width, height=self.height, x_range=xRange, y_range=yRange,
                       x_axis_label='Chromosome', y_axis_label='-log10(p-value)')
         plot.output_backend = outputBackend
         plot.toolbar.logo = None
+        renderers, layers = [], []
         for highlighted in (False, True):
-            source = ColumnDataSource(data[data['__highlighted__'] == highlighted])
-            plot.circle(source=source, x='__location__', y=yColumnName, size=self.pointSize, line_color=None,
-                        color='grey' if self.greyHighlight and not highlighted else color,
-                        alpha=1 if highlighted else self.minorAlpha)
+            rows = np.flatnonzero(data['__highlighted__'].to_numpy() == highlighted)
+            if self.rasterize and not highlighted:
+                cell = max(1, round(self.pointSize / 2))
+                codes, imagePalette = contigCodes[rows] % self.numColors, basePalette
+                if self.greyHighlight:
+                    codes, imagePalette = np.zeros(len(rows), dtype=np.int64), ['#808080']
+                image = DensityImage(locations[rows], yValues[rows], xRange, yRange, self.width // cell,
+                                     self.height // cell, codes, imagePalette, self.minorAlpha)
+                plot.image_rgba(image=[image], x=xRange[0], y=yRange[0], dw=xRange[1] - xRange[0],
+                                dh=yRange[1] - yRange[0], tags=['density'])
+                continue
+            drawn = rows[:0] if served else rows
+            if self.thinThreshold is not None and not served:
+                # Each highlight group is thinned on its own, so neither hides the other.
+                drawn = rows[ThinnedRows(locations[rows], yValues[rows], xRange, yRange, self.width, self.height,
+                                         self.thinThreshold)]
+            source = ColumnDataSource(self._SourceData(tables, sourceColumns, drawn))
+            renderers.append(plot.circle(source=source, x='__location__', y=yColumnName, size=self.pointSize,
+                                         line_color=None,
+                                         color='grey' if self.greyHighlight and not highlighted else color,
+                                         alpha=1 if highlighted else self.minorAlpha,
+                                         tags=['major' if highlighted else 'minor']))
+            layers.append((renderers[-1], rows))
         if tooltips:
-            plot.add_tools(HoverTool(tooltips=tooltips))
-        plot.xaxis.ticker = [value for key, value in self.refGenome['tickPosition'].items()]
-        plot.xaxis.major_label_overrides = {value: key for key, value in self.refGenome['tickPosition'].items()}
+            plot.add_tools(HoverTool(tooltips=tooltips, renderers=renderers))
+        plot.xaxis.ticker = self.refGenome.ticks.tolist()
+        plot.xaxis.major_label_overrides = dict(zip(self.refGenome.ticks.tolist(), self.refGenome.contigs))
         plot.xgrid.visible = False
         plot.ygrid.visible = False
-        return plot
+        return plot, (tables, sourceColumns, locations, yValues, layers)
+
+    def _Selection(self, columns):
+        """
+        The method selects the records to draw: those kept by the filter, on contigs of the reference genome, and
+        among the `top` most significant if set.
+
+        Parameters
+        ----------
+        columns: list of str
+            Names of the columns needed, as for `_ProcessedData`.
+
+        Returns
+        -------
+        data: pd.DataFrame
+            The selected records.
+        contigCodes: np.ndarray
+            For each record, the position of its contig in `refGenome.contigs`.
+        locations: np.ndarray
+            For each record, its location on the concatenated genome.
+        """
+        data = self._ProcessedData(columns)
+        contigCodes, locations = self._Coordinates()
+        if self._filterMask is not None:
+            contigCodes, locations = contigCodes[self._filterMask], locations[self._filterMask]
+        keep = np.flatnonzero(contigCodes >= 0)  # Records on unknown contigs have been reported by `_Coordinates`.
+        if self.top is not None:
+            key = (self._dataVersion, self.filter, self.invertFilter, self.contig, self.position, self.refGenome,
+                   self.pvalue, self.mlog10, self.top)
+            if self._topRows is None or self._topRows[0] != key:
+                self._topRows = key, keep[self._MostSignificant(data[self.pvalue].iloc[keep], self.top)]
+            keep = self._topRows[1]
+        return data.iloc[keep], contigCodes[keep], locations[keep]
+
+    def _BasePalette(self):
+        """
+        Returns
+        -------
+        list of str: The `numColors` colors the contigs alternate between.
+
+        Raises
+        ------
+        RuntimeError
+            If `coloringPalette` does not have `numColors` distinct colors.
+        """
+        try:
+            palette = getattr(palettes, self.coloringPalette)
+            palette = next(value for key, value in palette.items() if key > self.numColors)
+        except StopIteration:
+            raise RuntimeError(f'The chosen color palette does not have {self.numColors} distinct colors.')
+        return list(palette[:self.numColors])
+
+    def _Ranges(self, yValues):
+        """
+        Returns
+        -------
+        tuple: The horizontal range, spanning the reference genome with gaps on either side, and the vertical range.
+        """
+        xLen = self.refGenome.totalLength
+        xGap = int(xLen * self.GAP_RATIO)
+        return (0 - xGap, xLen + xGap), self.yRange or (0, 1.05 * np.nanmax(yValues))
+
+    def _Render(self, canvasType):
+        data, contigCodes, locations = self._Selection([self.contig, self.position, self.pvalue])
+        yValues = data[self.pvalue].to_numpy(dtype=np.float64, na_value=np.nan)
+        yValues = yValues if self.mlog10 else -np.log10(yValues)
+        xRange, yRange = self._Ranges(yValues)
+        canvas = canvasType(self.width, self.height)
+        frame = Frame(canvas, 0, 0, self.width, self.height, xRange, yRange)
+        basePalette, highlighted = self._BasePalette(), data['__highlighted__'].to_numpy()
+        for flag in (False, True):
+            rows = np.flatnonzero(highlighted == flag)
+            codes, palette = contigCodes[rows] % self.numColors, basePalette
+            if self.greyHighlight and not flag:
+                codes, palette = 0, ['#808080']
+            frame.Points(locations[rows], yValues[rows], codes, palette, self.pointSize, 1 if flag else self.minorAlpha)
+        frame.Axes('Chromosome', '-log10(p-value)', self.refGenome.ticks, self.refGenome.contigs)
+        return canvas
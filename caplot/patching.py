@@ -0,0 +1,141 @@
+import dataclasses
+
+import numpy as np
+from bokeh.core.property.descriptors import UnsetValueError
+from bokeh.model import Model
+from bokeh.models import ColumnarDataSource
+
+
+class _Mismatch(Exception):
+    pass
+
+
+def Graft(displayed, generated):
+    """
+    Brings a plot displayed earlier up to date with a newly generated one of the same layout, by copying the properties
+    of each model onto its counterpart: the data of the sources, the glyphs and their views, color mappers, ranges,
+    axes, tools, etc. The displayed models are kept, so that only the properties that differ produce document events,
+    hence are sent to the browser by `push_notebook`. Columns of the sources are compared value by value, and only
+    the sources whose data changed are sent again.
+
+    Parameters
+    ----------
+    displayed: bokeh.model.Model
+        The plot displayed earlier.
+    generated: bokeh.model.Model
+        The plot generated again, which is not displayed.
+
+    Returns
+    -------
+    bool: Whether the plots have the same layout, and `displayed` has been updated. Otherwise, it is left untouched,
+    and `generated` must be displayed instead.
+    """
+    try:
+        _Pair(displayed, generated, dict(), apply=False)  # Nothing is changed unless all models have a counterpart.
+    except _Mismatch:
+        return False
+    _Pair(displayed, generated, dict(), apply=True)
+    return True
+
+
+def _Pair(old, new, paired, apply):
+    """
+    Pairs `new` with `old`, along with the models they refer to, copying their properties when `apply` is set.
+    `paired` maps the IDs of the new models to the old ones, as models may be referred to several times.
+    """
+    if id(new) in paired:
+        if paired[id(new)] is not old:
+            raise _Mismatch()
+        return
+    if type(old) is not type(new):
+        raise _Mismatch()
+    paired[id(new)] = old
+    for name in sorted(new.properties()):
+        descriptor = new.lookup(name)
+        if descriptor.property.readonly or not descriptor.property.serialized:
+            continue
+        try:
+            value, current = getattr(new, name), getattr(old, name)
+        except UnsetValueError:
+            continue
+        if name == 'data' and isinstance(new, ColumnarDataSource):
+            if apply and not _SameData(current, value):
+                setattr(old, name, dict(value))
+            continue
+        if isinstance(value, float) and isinstance(current, float) and np.isnan(value) and np.isnan(current):
+            continue  # NaN does not equal itself, which Bokeh would record as a change.
+        value = _Translated(current, value, paired, apply)
+        if apply:
+            setattr(old, name, value)  # Bokeh only records an event when the value differs.
+
+
+def _Translated(current, value, paired, apply):
+    """
+    Returns
+    -------
+    The property value `value`, referring to the old models paired with the new ones it holds.
+    """
+    if isinstance(value, Model):
+        if not isinstance(current, Model):
+            raise _Mismatch()
+        _Pair(current, value, paired, apply)
+        return current
+    if isinstance(value, (list, tuple)):
+        if not isinstance(current, (list, tuple)) or len(current) != len(value):
+            return _Plain(value)
+        return _Rebuilt(value, (_Translated(old, new, paired, apply) for old, new in zip(current, value)))
+    if isinstance(value, dict):
+        current = current if isinstance(current, dict) else dict()
+        return {key: _Translated(current.get(key), new, paired, apply) for key, new in value.items()}
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):  # e.g. `field("x", transform=mapper)`.
+        if type(current) is not type(value):
+            return _Plain(value)
+        return dataclasses.replace(value, **{
+            field.name: _Translated(getattr(current, field.name), getattr(value, field.name), paired, apply)
+            for field in dataclasses.fields(value)})
+    return value
+
+
+def _Plain(value):
+    """
+    Returns
+    -------
+    `value`, if it refers to no model. New models can not be sent to the displayed document.
+    """
+    if isinstance(value, Model):
+        raise _Mismatch()
+    if isinstance(value, (list, tuple)):
+        return _Rebuilt(value, (_Plain(item) for item in value))
+    if isinstance(value, dict):
+        return {key: _Plain(item) for key, item in value.items()}
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        for field in dataclasses.fields(value):
+            _Plain(getattr(value, field.name))
+    return value
+
+
+def _Rebuilt(value, items):
+    # Bokeh wraps the lists and dicts of property values, which are not assigned to other properties as such.
+    return tuple(items) if isinstance(value, tuple) else list(items)
+
+
+def _SameData(current, data):
+    """
+    Returns
+    -------
+    bool: Whether two `ColumnDataSource.data` mappings hold the same columns, with the same values.
+    """
+    return current.keys() == data.keys() and all(_SameColumn(current[key], data[key]) for key in data)
+
+
+def _SameColumn(current, values):
+    try:
+        current, values = np.asarray(current), np.asarray(values)
+    except ValueError:  # Ragged columns, e.g. lists of images of several sizes.
+        return False
+    if current.shape != values.shape or current.dtype != values.dtype:
+        return False
+    try:
+        return bool(np.array_equal(current, values, equal_nan=current.dtype.kind in 'fc'))
+    except TypeError:
+        return False
@@ -1,19 +1,23 @@
 import itertools
 import json
 
-import ipywidgets as widgets
+import numpy as np
 import pandas as pd
 from bokeh import palettes
 from bokeh.core.validation.warnings import MISSING_RENDERERS
 from bokeh.layouts import gridplot, row
 from bokeh.models import (
     CategoricalColorMapper,
+    CDSView,
     ColumnDataSource,
     HoverTool,
-    LinearColorMapper, ColorBar)
+    IndexFilter,
+    LinearColorMapper, ColorBar, ColorMapper)
 from bokeh.plotting import figure
 
+from .aggregation import DensityImage, PaddedRange, ViewportRows
 from .interactiveplot import InteractivePlot
+from .rendering import Frame, Legend, Margins, NiceTicks, TickLabel
 
 
 class PCA(InteractivePlot):
@@ -63,28 +67,45 @@ class PCA(InteractivePlot):
         Height of each subplot. Default is 400 pixels.
     pointSize: int or float
         Passed directly to Bokeh to specify the size of all points. Default is 5.
+    lean: bool
+        When set, only the columns needed by the plot are loaded from files. DataFrames, which are in memory already,
+        are used as they are. Default is `False`.
+    chunkSize: int
+        When set, CSV/TSV files are streamed in chunks of this many rows, and `loadQuery` is applied to each chunk.
+        Database results are fetched in chunks of this many rows as well, and stored with compact dtypes.
+    rasterize: bool
+        When set, the records that are not highlighted are aggregated into a single image per subplot, blending the
+        colors of their categories (or averaging their values, for continuous coloring), while highlighted records are
+        still drawn as points with hovers. The size of the plot then no longer depends on the number of records.
+        Default is `False`.
     """
 
     CategoricalPalettes = 'Category10', 'Category20', 'Category20b', 'Category20c', 'Accent', 'GnBu', 'PRGn', 'Paired'
     ContinuousPalettes = 'Greys256', 'Inferno256', 'Magma256', 'Plasma256', 'Viridis256', 'Cividis256', 'Turbo256'
+    _StyleAttributes = (*InteractivePlot._StyleAttributes, 'coloringPalette')
 
     def __init__(self, source=None, loadQuery=None, filter=None, invertFilter=None, filterTemplate=None, highlight=None,
                  invertHighlight=None, highlightTemplate=None, minorAlpha=None, greyHighlight=None, hovers=None,
                  subplots=None, coloringColumn=None, coloringStyle='Categorical', coloringPalette='Category10',
-                 numCols=2, subplotWidth=400, subplotHeight=400, pointSize=5):
-        super(PCA, self).__init__(source, loadQuery, filter, invertFilter, filterTemplate, highlight,
-                                  invertHighlight, highlightTemplate, minorAlpha, greyHighlight, hovers)
+                 numCols=2, subplotWidth=400, subplotHeight=400, pointSize=5, lean=False, chunkSize=None,
+                 rasterize=False):
+        # Declared ahead of loading, as `lean` mode consults them through `_RequiredColumns`. The columns are validated
+        # once the data is loaded.
         self._subplots = None
-        self._coloringColumn = None
+        if subplots is not None:
+            self.subplots = subplots
+        self._coloringColumn = coloringColumn
+        self.numCols = numCols
+        super(PCA, self).__init__(source, loadQuery, filter, invertFilter, filterTemplate, highlight,
+                                  invertHighlight, highlightTemplate, minorAlpha, greyHighlight, hovers, lean,
+                                  chunkSize)
         self._coloringPalette = None
         self._coloringStyle = None
-        self.numCols = numCols
         self.subplotWidth = subplotWidth
         self.subplotHeight = subplotHeight
         self.pointSize = pointSize
+        self.rasterize = rasterize
         # Initializations
-        if subplots is not None:
-            self.subplots = subplots
         if coloringColumn is not None:
             self.coloringColumn = coloringColumn
             if coloringStyle is not None:
@@ -92,6 +113,10 @@ class PCA(InteractivePlot):
             if coloringPalette is not None:
                 self.coloringPalette = coloringPalette
 
+    def __setstate__(self, state):
+        super(PCA, self).__setstate__(state)
+        self.__dict__.setdefault('rasterize', False)  # Older pickles do not have this attribute.
+
     @property
     def subplots(self):
         """
@@ -116,6 +141,12 @@ class PCA(InteractivePlot):
             raise RuntimeError('Specified "subplots" is invalid. This attribute can be a list of strings, or a list of pairs of strings.')
         return [subplots[start:start + self.numCols] for start in range(0, len(subplots), self.numCols)]
 
+    def _RequiredColumns(self):
+        columns = [column for gridRow in self._SubplotsOrganized() for pair in gridRow for column in pair]
+        if self.coloringColumn:
+            columns.append(self.coloringColumn)
+        return list(dict.fromkeys([*super(PCA, self)._RequiredColumns(), *columns]))
+
     @property
     def coloringColumn(self):
         """
@@ -125,8 +156,8 @@ class PCA(InteractivePlot):
 
     @coloringColumn.setter
     def coloringColumn(self, value):
-        if self.source is not None:
-            assert value in self.source.columns, f'Could not find a column named "{value}" in data.'
+        if self.columns is not None:
+            assert value in self.columns, f'Could not find a column named "{value}" in data.'
         self._coloringColumn = value
 
     @property
@@ -155,20 +186,87 @@ class PCA(InteractivePlot):
         self._coloringPalette = value
 
     def Widgets(self):
+        import ipywidgets as widgets
         return {
             'subplots': widgets.Text(value=json.dumps(self.subplots), placeholder='JSON Array (or an array of arrays)'),
-            'coloringColumn': widgets.Dropdown(options=self.source.columns, value=self.coloringColumn) if self.source is not None else widgets.Text(value=self.coloringColumn),
+            'coloringColumn': widgets.Dropdown(options=self.columns, value=self.coloringColumn) if self.columns is not None else widgets.Text(value=self.coloringColumn),
             'coloringStyle': widgets.Dropdown(options=['Categorical', 'Continuous'], value=self.coloringStyle),
             'coloringPalette': widgets.Dropdown(options=[*self.CategoricalPalettes, *self.ContinuousPalettes], value=self.coloringPalette),
-            'numCols': widgets.IntSlider(value=3, min=1, max=8),
+            'numCols': widgets.IntSlider(value=self.numCols, min=1, max=8),
         }
     
     def Generate(self, outputBackend='canvas', hideBokehLogo=True):
-        data = self._ProcessedData()
-        color, colorBar = self._ColorMapping(data)
+        return self._Generate(outputBackend, hideBokehLogo)[0]
+
+    def _Restyle(self, plot):
+        # Only the palette of the shared mapper changes; its factors or bounds follow the data, which is left alone.
+        color = self._ColorMapping(self._ProcessedData([self.coloringColumn]))[0] if self.coloringColumn else None
+        colorMappers, transforms = list(plot.select({'type': ColorMapper})), [color['transform']] if color else []
+        if [type(colorMapper) for colorMapper in colorMappers] != [type(transform) for transform in transforms]:
+            return False
+        if not super(PCA, self)._Restyle(plot):
+            return False
+        for colorMapper, transform in zip(colorMappers, transforms):
+            colorMapper.palette = transform.palette
+        return True
+
+    def _GenerateServed(self):
+        return self._Generate(served=True)
+
+    def _Generate(self, outputBackend='canvas', hideBokehLogo=True, served=False):
+        """
+        The method generates the plot, as `Generate` does.
+
+        Parameters
+        ----------
+        outputBackend: str
+            Specifies the target output backend for Bokeh.
+        hideBokehLogo: bool
+            When set, Bokeh's logo will be removed from the toolbar.
+        served: bool
+            When set, each subplot gets a source of its own, holding the records in view only. See `Serve`.
+
+        Returns
+        -------
+        grid: bokeh.models.LayoutDOM
+            Generated plot.
+        refreshers: list of tuple
+            Pairs of a subplot and the function sending the records in view, when `served` is set.
+        """
+        data = self._ProcessedData(self._RequiredColumns())
+        color, colorBar, derived = self._ColorMapping(data)
+        sourceColumns = [column for gridRow in self._SubplotsOrganized() for pair in gridRow for column in pair]
+        sourceColumns.extend(self._hovers.values())
+        if color is not None:
+            sourceColumns.append(color['field'])
+        highlighted = data['__highlighted__'].to_numpy()
+        # Records that are not highlighted are drawn as an image on each subplot when rasterizing.
+        groups = {flag: np.flatnonzero(highlighted == flag) for flag in ((True,) if self.rasterize else (False, True))}
+        background = None
+        if self.rasterize:
+            background = data.loc[~highlighted], *self._DensityColors(data.loc[~highlighted], color)
+        if not served:
+            # A single source serves all subplots, which also links selections across them. The highlighting split
+            # is done through views, each holding the positions of its records.
+            rows = groups[True] if self.rasterize else None
+            source = ColumnDataSource(self._SourceData([data, derived], sourceColumns, rows))
+            views = {flag: self._View(source, np.arange(len(rows)) if self.rasterize else positions)
+                     for flag, positions in groups.items()}
+        grid, refreshers = [], []
+        for gridRow in self._SubplotsOrganized():
+            grid.append([])
+            for x, y in gridRow:
+                ranges = (PaddedRange(data[x]), PaddedRange(data[y])) if self.rasterize or served else None
+                if served:
+                    source = ColumnDataSource(self._SourceData([data, derived], sourceColumns, np.arange(0)))
+                    views = {flag: self._View(source, np.arange(0)) for flag in groups}
+                grid[-1].append(self._Draw(source, views, x, y, color or 'blue', outputBackend, ranges, background))
+                if served:
+                    refresh = self._Refresher(source, views, [data, derived], sourceColumns, data[x], data[y], groups)
+                    refresh(*ranges)
+                    refreshers.append((grid[-1][-1], refresh))
         extraKwargs = {'toolbar_options': {'logo': None}} if hideBokehLogo else {}
-        grid = gridplot([[self._Draw(data, x, y, color or 'blue', outputBackend) for x, y in gridRow]
-                         for gridRow in self._SubplotsOrganized()], **extraKwargs)
+        grid = gridplot(grid, **extraKwargs)
         if colorBar is not None:
             self._safeWarnings.add(MISSING_RENDERERS)  # We are doing an empty dummy plot for the color-bar.
             dummy = figure(height=200, width=100, toolbar_location=None, min_border=0, outline_line_color=None)
@@ -177,7 +275,47 @@ class PCA(InteractivePlot):
             grid = row(children=[grid, dummy])
         else:
             self._safeWarnings.discard(MISSING_RENDERERS)
-        return grid
+        return grid, refreshers
+
+    def _Refresher(self, source, views, tables, sourceColumns, xValues, yValues, groups):
+        """
+        The method makes the function that fills the source of a served subplot with the records in view.
+
+        Parameters
+        ----------
+        source: ColumnDataSource
+            The source of the subplot.
+        views: dict
+            Maps whether records are highlighted to a view of `source` limited to them.
+        tables: list of pd.DataFrame
+            The tables the source is made of, as in `_SourceData`.
+        sourceColumns: list of str
+            The columns of the source.
+        xValues: pd.Series
+            Values shown on the horizontal axis.
+        yValues: pd.Series
+            Values shown on the vertical axis.
+        groups: dict
+            Maps whether records are highlighted to their positions, for those drawn as points.
+
+        Returns
+        -------
+        callable: A function of the horizontal and vertical ranges in view.
+        """
+        xValues = xValues.to_numpy(dtype=np.float64, na_value=np.nan)
+        yValues = yValues.to_numpy(dtype=np.float64, na_value=np.nan)
+
+        def Refresh(xRange, yRange):
+            selected = {flag: rows[ViewportRows(xValues[rows], yValues[rows], xRange, yRange, self.subplotWidth,
+                                                self.subplotHeight, self.DetailLimit)]
+                        for flag, rows in groups.items()}
+            source.data = self._SourceData(tables, sourceColumns, np.concatenate(list(selected.values())))
+            start = 0
+            for flag, rows in selected.items():
+                self._SetViewRows(views[flag], np.arange(start, start + len(rows)))
+                start += len(rows)
+
+        return Refresh
 
     def _ColorMapping(self, data):
         """
@@ -194,9 +332,12 @@ class PCA(InteractivePlot):
             Passed directly to Bokeh when plotting.
         colorBar: ColorBar
             Must be drawn manually on a subplot.
+        derived: pd.DataFrame
+            A side table aligned to `data`, holding the columns derived for coloring.
         """
+        derived = pd.DataFrame(index=data.index)
         if not self.coloringColumn:
-            return None, None
+            return None, None, derived
         coloringColumn = self.coloringColumn
         targetColumn = data[self.coloringColumn]
         coloringStyle = self.coloringStyle or ('Categorical' if targetColumn.nunique() <= 10 else 'Continuous')
@@ -211,7 +352,7 @@ class PCA(InteractivePlot):
                 palette = palette[:targetColumn.nunique()]
                 if pd.api.types.is_numeric_dtype(targetColumn.dtype):
                     targetColumn = targetColumn.astype('str')
-                    data['__category__'] = targetColumn
+                    derived['__category__'] = targetColumn.to_numpy()
                     coloringColumn = '__category__'
                 mapper = CategoricalColorMapper(palette=palette, factors=targetColumn.unique().tolist())
         else:
@@ -219,16 +360,124 @@ class PCA(InteractivePlot):
             mapper = LinearColorMapper(palette=self.coloringPalette, low=targetColumn.min(), high=targetColumn.max())
         color = {'field': coloringColumn, 'transform': mapper}
         colorBar = ColorBar(color_mapper=mapper, label_standoff=12)  # Common between all subplots.
-        return color, colorBar
+        return color, colorBar, derived
 
-    def _Draw(self, data, xColumnName, yColumnName, color, outputBackend):
+    def _DensityColors(self, data, color):
         """
-        The method draws a single PCA plot, pitting `x` against `y`.
+        The method assigns each record a color of a palette, following the mapper from `_ColorMapping`, to blend them
+        into density images.
 
         Parameters
         ----------
         data: pd.DataFrame
             Processed data to draw the plot from.
+        color: dict or None
+            As returned by `_ColorMapping`.
+
+        Returns
+        -------
+        codes: np.ndarray
+            For each record, the position of its color in `palette`, or -1 if it has none.
+        palette: list of str
+            Colors in the `#rrggbb` format.
+        """
+        if self.greyHighlight:
+            return np.zeros(len(data), dtype=np.int64), ['#808080']
+        return self._ColorCodes(data, color)
+
+    def _ColorCodes(self, data, color):
+        """
+        The method assigns each record a color of a palette, following the mapper from `_ColorMapping`, regardless of
+        `greyHighlight`.
+
+        Returns
+        -------
+        codes: np.ndarray
+            For each record, the position of its color in `palette`, or -1 if it has none.
+        palette: list of str
+            Colors in the `#rrggbb` format.
+        """
+        if color is None:
+            return np.zeros(len(data), dtype=np.int64), ['#0000ff']
+        mapper = color['transform']
+        if isinstance(mapper, CategoricalColorMapper):
+            values = data[self.coloringColumn]
+            if color['field'] == '__category__':
+                values = values.astype('str')
+            return pd.Index(mapper.factors).get_indexer(values), list(mapper.palette)
+        palette = getattr(palettes, mapper.palette) if isinstance(mapper.palette, str) else list(mapper.palette)
+        values = data[color['field']].to_numpy(dtype=np.float64, na_value=np.nan)
+        scaled = (values - mapper.low) / ((mapper.high - mapper.low) or 1) * len(palette)
+        codes = np.where(np.isnan(scaled), -1, np.clip(np.nan_to_num(scaled), 0, len(palette) - 1)).astype(np.int64)
+        return codes, list(palette)
+
+    def _Render(self, canvasType):
+        data = self._ProcessedData(self._RequiredColumns())
+        color, colorBar, derived = self._ColorMapping(data)
+        codes, palette = self._ColorCodes(data, color)
+        # Records without a color are drawn grey, as Bokeh does for missing values.
+        codes, palette = np.where(codes < 0, len(palette), codes), [*palette, '#808080']
+        highlighted = data['__highlighted__'].to_numpy()
+        gridRows = self._SubplotsOrganized()
+        numCols = max((len(gridRow) for gridRow in gridRows), default=1)
+        legendWidth = 100 if colorBar is not None else 0
+        canvas = canvasType(numCols * self.subplotWidth + legendWidth, max(1, len(gridRows)) * self.subplotHeight)
+        for rowIndex, gridRow in enumerate(gridRows):
+            for columnIndex, (x, y) in enumerate(gridRow):
+                xValues = data[x].to_numpy(dtype=np.float64, na_value=np.nan)
+                yValues = data[y].to_numpy(dtype=np.float64, na_value=np.nan)
+                frame = Frame(canvas, columnIndex * self.subplotWidth, rowIndex * self.subplotHeight,
+                              self.subplotWidth, self.subplotHeight, PaddedRange(xValues), PaddedRange(yValues))
+                for flag in (False, True):
+                    rows = np.flatnonzero(highlighted == flag)
+                    if self.greyHighlight and not flag:
+                        frame.Points(xValues[rows], yValues[rows], 0, ['#808080'], self.pointSize, self.minorAlpha)
+                    else:
+                        frame.Points(xValues[rows], yValues[rows], codes[rows], palette, self.pointSize,
+                                     1 if flag else self.minorAlpha)
+                frame.Axes(x, y)
+        if colorBar is not None:
+            mapper = color['transform']
+            if isinstance(mapper, CategoricalColorMapper):
+                legend = list(mapper.palette)
+                labels = [((index + 0.5) / len(legend), str(factor)) for index, factor in enumerate(mapper.factors)]
+            else:
+                legend = palette[:-1]
+                span = (mapper.high - mapper.low) or 1
+                labels = [((tick - mapper.low) / span, TickLabel(tick)) for tick in NiceTicks(mapper.low, mapper.high)]
+            Legend(canvas, numCols * self.subplotWidth + 10, Margins[1], 150, legend, labels)
+        return canvas
+
+    @staticmethod
+    def _View(source, rows):
+        """
+        Returns
+        -------
+        CDSView: A view of `source`, limited to the given row positions.
+        """
+        indexFilter = IndexFilter(indices=rows.astype(np.int32))
+        if 'filter' in CDSView.properties():
+            return CDSView(filter=indexFilter)
+        return CDSView(source=source, filters=[indexFilter])  # Bokeh 2 ties views to their source.
+
+    @staticmethod
+    def _SetViewRows(view, rows):
+        """
+        The method changes the row positions a view made by `_View` is limited to.
+        """
+        indexFilter = view.filter if 'filter' in CDSView.properties() else view.filters[0]
+        indexFilter.indices = rows.astype(np.int32)
+
+    def _Draw(self, source, views, xColumnName, yColumnName, color, outputBackend, ranges=None, background=None):
+        """
+        The method draws a single PCA plot, pitting `x` against `y`.
+
+        Parameters
+        ----------
+        source: ColumnDataSource
+            The source shared by all subplots, or that of the subplot when served.
+        views: dict
+            Maps whether records are highlighted to a view of `source` limited to them.
         xColumnName: str
             Name of a column shown on the horizontal axis.
         yColumnName: str
@@ -237,19 +486,35 @@ class PCA(InteractivePlot):
             Passed directly to Bokeh when plotting.
         outputBackend: str
             Specifies the target output backend for Bokeh.
+        ranges: tuple
+            When set, fixed horizontal and vertical ranges, instead of ranges following the data.
+        background: tuple
+            When set, the records that are not highlighted, along with their color codes and palette (see
+            `_DensityColors`), to draw as a density image instead of points. Requires `ranges`.
 
         Returns
         -------
         bokeh.models.plots.Plot
             Drawn subplot.
         """
-        subplot = figure(width=self.subplotWidth, height=self.subplotHeight, x_axis_label=xColumnName, y_axis_label=yColumnName)
+        extraKwargs = {'x_range': ranges[0], 'y_range': ranges[1]} if ranges is not None else dict()
+        subplot = figure(width=self.subplotWidth, height=self.subplotHeight, x_axis_label=xColumnName, y_axis_label=yColumnName, **extraKwargs)
         subplot.output_backend = outputBackend
-        for highlighted in (False, True):
-            source = ColumnDataSource(data[data['__highlighted__'] == highlighted])
-            subplot.circle(source=source, x=xColumnName, y=yColumnName, size=self.pointSize, line_color=None,
-                           color='grey' if self.greyHighlight and not highlighted else color,
-                           alpha=1 if highlighted else self.minorAlpha)
+        if background is not None:
+            (xRange, yRange), (data, codes, palette) = ranges, background
+            cell = max(1, round(self.pointSize / 2))
+            image = DensityImage(data[xColumnName].to_numpy(dtype=np.float64, na_value=np.nan),
+                                 data[yColumnName].to_numpy(dtype=np.float64, na_value=np.nan), xRange, yRange,
+                                 self.subplotWidth // cell, self.subplotHeight // cell, codes, palette, self.minorAlpha)
+            subplot.image_rgba(image=[image], x=xRange[0], y=yRange[0], dw=xRange[1] - xRange[0],
+                               dh=yRange[1] - yRange[0], tags=['density'])
+        renderers = []
+        for highlighted, view in views.items():
+            renderers.append(subplot.circle(source=source, view=view, x=xColumnName, y=yColumnName, size=self.pointSize, line_color=None,
+                                            color='grey' if self.greyHighlight and not highlighted else color,
+                                            alpha=1 if highlighted else self.minorAlpha,
+                                            tags=['major' if highlighted else 'minor']))
         if self._hovers:
-            subplot.add_tools(HoverTool(tooltips=[(key, f'@{{{value}}}') for key, value in self._hovers.items()]))
+            subplot.add_tools(HoverTool(tooltips=[(key, f'@{{{value}}}') for key, value in self._hovers.items()],
+                                        renderers=renderers))
         return subplot
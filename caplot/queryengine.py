@@ -0,0 +1,459 @@
+import re
+import sqlite3
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class QueryEngine:
+    """
+    `QueryEngine` keeps an in-memory SQLite database alive for the lifetime of a data source, so that the tables
+    are registered once and every later query runs against the same database.
+
+    This replaces calling `sqldf` for each query, which copies all tables into a fresh database on every call. The
+    index of each registered DataFrame is stored as a column named `index`, matching what `reset_index` produces.
+
+    Parameters
+    ----------
+    tables: dict
+        An optional mapping of table names to DataFrames, registered on initialization.
+    """
+
+    IndexColumn = 'index'
+
+    def __init__(self, tables=None):
+        # Queries may be issued from widget callbacks or worker threads, hence `check_same_thread`.
+        self._connection = sqlite3.connect(':memory:', check_same_thread=False)
+        self._tables = set()
+        for name, df in (tables or dict()).items():
+            self.Register(name, df)
+
+    def Register(self, name, df):
+        """
+        Copies a DataFrame into the database, replacing any table registered under the same name.
+
+        Parameters
+        ----------
+        name: str
+            Name under which the table is accessible in queries.
+        df: pd.DataFrame
+            The data. Its index is kept as a column named `index`.
+        """
+        df.to_sql(name, self._connection, if_exists='replace', index=True, index_label=self.IndexColumn)
+        self._tables.add(name)
+
+    @property
+    def tables(self):
+        """
+        set of str: Names of the registered tables.
+        """
+        return set(self._tables)
+
+    def Query(self, sqlQuery):
+        """
+        Executes a query on the registered tables.
+
+        Parameters
+        ----------
+        sqlQuery: str
+            Desired query.
+
+        Returns
+        -------
+        df: pd.DataFrame
+            The resulting dataframe.
+        """
+        return pd.read_sql_query(sqlQuery, self._connection)
+
+    def Index(self, sqlQuery):
+        """
+        Executes a query and only fetches the `index` column of the result.
+
+        Parameters
+        ----------
+        sqlQuery: str
+            Desired query. Its result must contain the `index` column, e.g. `SELECT * FROM data WHERE ...`.
+
+        Returns
+        -------
+        index: pd.Index
+            The index of the records selected by the query.
+        """
+        # The line breaks keep a trailing `--` comment in `sqlQuery` from swallowing the closing parenthesis.
+        query = f'SELECT "{self.IndexColumn}" FROM (\n{sqlQuery.strip().rstrip(";")}\n)'
+        return pd.Index(self.Query(query)[self.IndexColumn], name=None)
+
+    def Close(self):
+        """
+        Releases the database. The engine can not be used afterwards.
+        """
+        self._connection.close()
+        self._tables.clear()
+
+
+class QueryCache:
+    """
+    A bounded LRU cache mapping queries to the index of the records they select.
+
+    Entries are keyed by the normalized query text together with a data version, so that results computed on an
+    earlier data source are never returned for a newer one.
+
+    Parameters
+    ----------
+    maxSize: int
+        Maximum number of results kept. Setting it to 0 disables caching.
+    """
+
+    def __init__(self, maxSize=16):
+        self._entries = OrderedDict()
+        self._maxSize = None
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxSize(self):
+        """
+        int: Maximum number of results kept. The least recently used entries are evicted first.
+        """
+        return self._maxSize
+
+    @maxSize.setter
+    def maxSize(self, value):
+        assert value >= 0, 'The cache size can not be negative.'
+        self._maxSize = value
+        self._Evict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def Normalized(sqlQuery):
+        """
+        Collapses whitespace and comments between tokens, and drops trailing semicolons, so that trivially different
+        spellings share an entry. Quoted literals and identifiers are kept as they are. Queries `LoadPlan` can not
+        tokenize are kept as they are too.
+        """
+        tokens = LoadPlan._Tokenized(sqlQuery)
+        if tokens is None:
+            return sqlQuery
+        while tokens and tokens[-1] == ('symbol', ';'):
+            tokens.pop()
+        return ' '.join(text for kind, text in tokens)
+
+    def Get(self, sqlQuery, version, compute):
+        """
+        Returns the cached result for the query, calling `compute` on a miss.
+
+        Parameters
+        ----------
+        sqlQuery: str
+            The query, as typed by the user.
+        version: int
+            Version of the data the query runs on.
+        compute: callable
+            Called with no arguments to produce the result when it is not cached.
+
+        Returns
+        -------
+        pd.Index
+            The index of the records selected by the query.
+        """
+        key = (version, self.Normalized(sqlQuery))
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        result = compute()
+        if self._maxSize:
+            self._entries[key] = result
+            self._Evict()
+        return result
+
+    def Clear(self):
+        """
+        Drops all entries. The hit and miss counters are kept.
+        """
+        self._entries.clear()
+
+    def _Evict(self):
+        while len(self._entries) > self._maxSize:
+            self._entries.popitem(last=False)
+
+
+class LoadPlan:
+    """
+    `LoadPlan` describes how much of a `loadQuery` can be handed to a file reader, so that unwanted columns and rows
+    are never decoded.
+
+    Use `Parse` to build a plan. Queries of the form `SELECT <columns or *> FROM data [WHERE <condition> AND ...]`,
+    where each condition compares a column with a literal (`=`, `!=`, `<>`, `<`, `<=`, `>`, `>=`, `IN` and `NOT IN`),
+    are translated completely. As in SQL, records whose column is missing (or NaN) never satisfy a condition on it;
+    `!=` and `NOT IN` are paired with a condition that drops them, since the reader would keep them. For any other
+    query, the plan only lists the columns the query may refer to, and the query itself must still be executed on the
+    data that is read.
+
+    Attributes
+    ----------
+    columns: list of str or None
+        The columns selected by the query, or `None` for all of them. Only set when the query is fully translated.
+    filters: list of tuple or None
+        Conditions in the `(column, operator, value)` form accepted by `pd.read_parquet`, or `None` if the query could
+        not be translated. An empty list means no condition.
+    index: bool
+        Whether the query selects the `index` column, e.g. through `*`, in which case the records keep their original
+        index. Otherwise, they are numbered from 0, as `QueryEngine` would return them. Only set when the query is
+        fully translated.
+    referenced: list of str
+        The columns the query refers to by name.
+    wildcard: bool
+        Whether the query also uses `*`, in which case it may refer to any column that is present.
+    """
+
+    _Token = re.compile(r"""
+        (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+        |(?P<identifier>"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])
+        |(?P<string>'(?:[^']|'')*')
+        |(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+        |(?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+        |(?P<operator><=|>=|<>|!=|==|=|<|>)
+        |(?P<symbol>[-+(),;.*/%|&~])
+        """, re.VERBOSE | re.DOTALL)
+    _Operators = {'=': '==', '==': '==', '!=': '!=', '<>': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+    _Flipped = {'==': '==', '!=': '!=', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+    def __init__(self, columns=None, filters=None, referenced=None, wildcard=True, index=True):
+        self.columns = columns
+        self.filters = filters
+        self.index = index
+        self.referenced = referenced or []
+        self.wildcard = wildcard
+
+    @classmethod
+    def _Tokenized(cls, sqlQuery):
+        tokens, position = [], 0
+        while position < len(sqlQuery):
+            match = cls._Token.match(sqlQuery, position)
+            if match is None:
+                return None
+            position = match.end()
+            if match.lastgroup != 'space':
+                tokens.append((match.lastgroup, match.group()))
+        return tokens
+
+    @classmethod
+    def Parse(cls, sqlQuery, schema):
+        """
+        Builds a plan for `sqlQuery` against a table with the given schema.
+
+        Parameters
+        ----------
+        sqlQuery: str
+            A query on the `data` table.
+        schema: dict
+            Maps each column name to its kind: `"numeric"`, `"string"`, `"boolean"`, or `None` if unknown. Conditions
+            are only translated when the literal matches the kind of the column.
+
+        Returns
+        -------
+        LoadPlan
+        """
+        tokens = cls._Tokenized(sqlQuery)
+        if tokens is None:  # The query may refer to any column.
+            return cls(referenced=list(schema))
+        lookup = dict()
+        for column in schema:
+            lookup.setdefault(column.lower(), []).append(column)
+        referenced = []
+        for kind, text in tokens:
+            if kind in ('word', 'identifier'):
+                for column in lookup.get(cls._Unquoted(kind, text).lower(), []):
+                    if column not in referenced:
+                        referenced.append(column)
+            elif kind == 'string':  # SQLite accepts single quoted identifiers in some places.
+                for column in lookup.get(text[1:-1].replace("''", "'").lower(), []):
+                    if column not in referenced:
+                        referenced.append(column)
+        plan = cls(referenced=referenced, wildcard=('symbol', '*') in tokens)
+        try:
+            plan.columns, plan.filters, plan.index = _Translator(tokens, schema, lookup).Translate()
+        except _Untranslatable:
+            plan.columns, plan.filters, plan.index = None, None, True
+        return plan
+
+    @staticmethod
+    def _Unquoted(kind, text):
+        if kind != 'identifier':
+            return text
+        if text[0] == '[':
+            return text[1:-1]
+        return text[1:-1].replace(text[0] * 2, text[0])
+
+
+class _Untranslatable(Exception):
+    pass
+
+
+class _Translator:
+    """
+    A recursive descent parser for the subset of SQL that `LoadPlan` translates. Raises `_Untranslatable` on anything
+    else.
+    """
+
+    Keywords = {'select', 'from', 'where', 'and', 'or', 'not', 'in', 'is', 'null', 'like', 'between', 'distinct',
+                'order', 'group', 'by', 'limit', 'having', 'as', 'join', 'on', 'union', 'case', 'when', 'true', 'false'}
+
+    def __init__(self, tokens, schema, lookup):
+        self.tokens = tokens[:-1] if tokens[-1:] == [('symbol', ';')] else tokens
+        self.schema = schema
+        self.lookup = lookup
+        self.position = 0
+
+    def Peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def Next(self):
+        token = self.Peek()
+        self.position += 1
+        return token
+
+    def Expect(self, *words):
+        kind, text = self.Next()
+        if kind != 'word' or text.lower() not in words:
+            raise _Untranslatable()
+        return text.lower()
+
+    def AtWord(self, word):
+        kind, text = self.Peek()
+        return kind == 'word' and text.lower() == word
+
+    def Column(self, token):
+        """
+        Resolves a token to a column name, or returns `None` if the token is not a column.
+        """
+        kind, text = token
+        if kind == 'word' and text.lower() in self.Keywords:
+            return None
+        if kind not in ('word', 'identifier'):
+            return None
+        candidates = self.lookup.get(LoadPlan._Unquoted(kind, text).lower(), [])
+        if len(candidates) > 1:
+            raise _Untranslatable()  # SQLite would not be able to tell these columns apart either.
+        return candidates[0] if candidates else None
+
+    def Literal(self):
+        kind, text = self.Next()
+        sign = 1
+        if kind == 'symbol' and text in '-+':
+            sign = -1 if text == '-' else 1
+            kind, text = self.Next()
+            if kind != 'number':
+                raise _Untranslatable()
+        if kind == 'number':
+            value = float(text) if any(character in text for character in '.eE') else int(text)
+            return 'numeric', sign * value
+        if kind == 'string':
+            return 'string', text[1:-1].replace("''", "'")
+        if kind == 'identifier' and text[0] == '"' and self.Column((kind, text)) is None:
+            return 'string', text[1:-1].replace('""', '"')  # SQLite falls back to a string literal.
+        if kind == 'word' and text.lower() in ('true', 'false'):
+            return 'numeric', int(text.lower() == 'true')
+        raise _Untranslatable()
+
+    def Value(self, column, literal):
+        """
+        Checks the literal against the kind of the column, and converts it to what the reader expects.
+        """
+        columnKind, (literalKind, value) = self.schema.get(column), literal
+        if columnKind == 'boolean' and literalKind == 'numeric' and value in (0, 1):
+            return bool(value)
+        if columnKind != literalKind:
+            raise _Untranslatable()
+        return value
+
+    def NotNull(self, column):
+        """
+        Returns
+        -------
+        tuple: A condition that only drops the records whose column is missing, or NaN.
+        """
+        kind = self.schema.get(column)
+        if kind == 'numeric':
+            return column, '>=', float('-inf')
+        if kind == 'string':
+            return column, '>=', ''
+        return column, 'in', [False, True]
+
+    def Conditions(self):
+        """
+        Returns
+        -------
+        list of tuple: The filters for the next condition. SQL drops missing values on `!=` and `NOT IN`, which the
+        reader keeps, hence the extra condition.
+        """
+        condition = self.Condition()
+        return [condition, self.NotNull(condition[0])] if condition[1] in ('!=', 'not in') else [condition]
+
+    def Condition(self):
+        left = self.Column(self.Peek())
+        if left is not None:
+            self.Next()
+            negated = self.AtWord('not')
+            if negated:
+                self.Next()
+            if self.AtWord('in'):
+                self.Next()
+                if self.Next() != ('symbol', '('):
+                    raise _Untranslatable()
+                values = [self.Value(left, self.Literal())]
+                while self.Peek() == ('symbol', ','):
+                    self.Next()
+                    values.append(self.Value(left, self.Literal()))
+                if self.Next() != ('symbol', ')'):
+                    raise _Untranslatable()
+                return left, 'not in' if negated else 'in', values
+            kind, text = self.Next()
+            if negated or kind != 'operator':
+                raise _Untranslatable()
+            return left, LoadPlan._Operators[text], self.Value(left, self.Literal())
+        literal = self.Literal()
+        kind, text = self.Next()
+        right = self.Column(self.Next())
+        if kind != 'operator' or right is None:
+            raise _Untranslatable()
+        return right, LoadPlan._Flipped[LoadPlan._Operators[text]], self.Value(right, literal)
+
+    def Translate(self):
+        self.Expect('select')
+        columns, index = [], False
+        if self.Peek() == ('symbol', '*'):
+            self.Next()
+            columns, index = None, True
+        else:
+            while True:
+                token = self.Next()
+                column = self.Column(token)
+                if column is None:
+                    if LoadPlan._Unquoted(*token).lower() != 'index':
+                        raise _Untranslatable()
+                    index = True
+                elif column not in columns:
+                    columns.append(column)
+                if self.Peek() != ('symbol', ','):
+                    break
+                self.Next()
+        self.Expect('from')
+        kind, text = self.Next()
+        if kind not in ('word', 'identifier') or LoadPlan._Unquoted(kind, text).lower() != 'data':
+            raise _Untranslatable()
+        filters = []
+        if self.AtWord('where'):
+            self.Next()
+            filters.extend(self.Conditions())
+            while self.AtWord('and'):
+                self.Next()
+                filters.extend(self.Conditions())
+        if self.Peek() != (None, None):
+            raise _Untranslatable()
+        return columns, filters, index
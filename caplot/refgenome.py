@@ -0,0 +1,232 @@
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Contig lengths of the builtin assemblies, in plotting order.
+_Builtins = {
+    'GRCh37': (
+        ('1', 249250621), ('2', 243199373), ('3', 198022430), ('4', 191154276), ('5', 180915260),
+        ('6', 171115067), ('7', 159138663), ('8', 146364022), ('9', 141213431), ('10', 135534747),
+        ('11', 135006516), ('12', 133851895), ('13', 115169878), ('14', 107349540), ('15', 102531392),
+        ('16', 90354753), ('17', 81195210), ('18', 78077248), ('19', 59128983), ('20', 63025520),
+        ('21', 48129895), ('22', 51304566), ('X', 155270560), ('Y', 59373566), ('MT', 16569),
+    ),
+    'GRCh38': (
+        ('chr1', 248956422), ('chr2', 242193529), ('chr3', 198295559), ('chr4', 190214555), ('chr5', 181538259),
+        ('chr6', 170805979), ('chr7', 159345973), ('chr8', 145138636), ('chr9', 138394717), ('chr10', 133797422),
+        ('chr11', 135086622), ('chr12', 133275309), ('chr13', 114364328), ('chr14', 107043718),
+        ('chr15', 101991189), ('chr16', 90338345), ('chr17', 83257441), ('chr18', 80373285), ('chr19', 58617616),
+        ('chr20', 64444167), ('chr21', 46709983), ('chr22', 50818468), ('chrX', 156040895), ('chrY', 57227415),
+        ('chrM', 16569),
+    ),
+}
+# Contigs kept from `.fai` indexes by default: numbered chromosomes, sex chromosomes and the mitochondrial genome.
+PrimaryContigs = r'^(chr)?([0-9]+|[XYZW]|MT?)$'
+
+_registry = dict()
+_registryLock = threading.Lock()
+
+
+class ReferenceGenome:
+    """
+    The `ReferenceGenome` class holds the contigs of an assembly, in the order they are plotted in, along with their
+    lengths and offsets on the concatenated genome as numpy arrays.
+
+    Contig names are matched leniently: the `chr` prefix is optional, and `M` and `MT` are interchangeable.
+
+    For code written against the former reference data, the `contigOrder` list and the `cumulativeLengths`, `lengths`
+    and `tickPosition` dictionaries are available as attributes and items.
+
+    Parameters
+    ----------
+    name: str
+        Name of the assembly, e.g. `"GRCm39"`.
+    contigs: list of str
+        Names of the contigs, in plotting order.
+    lengths: list of int
+        Lengths of the contigs.
+    """
+
+    def __init__(self, name, contigs, lengths):
+        contigs, lengths = [str(contig) for contig in contigs], np.asarray(lengths, dtype=np.int64)
+        assert len(contigs) == len(lengths), 'Each contig must have a length.'
+        assert len(contigs) > 0, 'A reference genome needs at least one contig.'
+        assert len(set(contigs)) == len(contigs), 'Contig names must be unique.'
+        assert (lengths > 0).all(), 'Contig lengths must be positive.'
+        self.name = name
+        self.contigs = contigs
+        self.contigLengths = lengths
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        self.ticks = self.offsets + lengths // 2
+        self.totalLength = int(lengths.sum())
+        self._lookup = {self._Normalized(contig): index for index, contig in enumerate(contigs)}
+
+    def __repr__(self):
+        return f'ReferenceGenome({self.name!r}, {len(self.contigs)} contigs, {self.totalLength} bp)'
+
+    @staticmethod
+    def _Normalized(contig):
+        contig = str(contig)
+        contig = contig[3:] if contig[:3].lower() == 'chr' else contig
+        return 'MT' if contig.upper() in ('M', 'MT') else contig.upper()
+
+    @classmethod
+    def FromLengths(cls, name, lengths):
+        """
+        Makes a reference genome from the lengths of its contigs.
+
+        Parameters
+        ----------
+        name: str
+            Name of the assembly.
+        lengths: dict or pd.DataFrame or str
+            Either a mapping of contig names to their lengths, in plotting order, a DataFrame whose first two columns
+            hold contig names and lengths, or the path to a headerless tab-separated file of such columns.
+
+        Returns
+        -------
+        ReferenceGenome
+        """
+        if isinstance(lengths, str):
+            lengths = pd.read_table(lengths, header=None, usecols=[0, 1], dtype={0: str}, comment='#')
+        if isinstance(lengths, pd.DataFrame):
+            return cls(name, lengths.iloc[:, 0].astype(str).tolist(), lengths.iloc[:, 1].to_numpy())
+        return cls(name, list(lengths.keys()), list(lengths.values()))
+
+    @classmethod
+    def FromFai(cls, path, name=None, contigs=PrimaryContigs):
+        """
+        Makes a reference genome from the `.fai` index of a FASTA file, e.g. as made by `samtools faidx`.
+
+        Parameters
+        ----------
+        path: str
+            Path to the `.fai` file.
+        name: str
+            Name of the assembly. Defaults to the name of the file, without its extensions.
+        contigs: str or list of str
+            Either a regular expression the names of the contigs to keep must match, or the names of the contigs to
+            keep, in plotting order. Defaults to numbered chromosomes, sex chromosomes and the mitochondrial genome,
+            which leaves out unplaced scaffolds. When the expression matches no contig, all of them are kept.
+
+        Returns
+        -------
+        ReferenceGenome
+        """
+        index = pd.read_table(path, header=None, usecols=[0, 1], names=['contig', 'length'], dtype={'contig': str})
+        if name is None:
+            name = re.sub(r'(\.(fai|fa|fasta|fna|gz))+$', '', path.replace('\\', '/').rsplit('/', 1)[-1])
+        if isinstance(contigs, str):
+            kept = index.loc[index['contig'].str.match(contigs)]
+            index = kept if len(kept) else index
+        else:
+            index = index.set_index('contig').loc[[str(contig) for contig in contigs]].reset_index()
+        return cls(name, index['contig'].tolist(), index['length'].to_numpy())
+
+    def Codes(self, contigs):
+        """
+        Encodes contig names against `contigs`.
+
+        Parameters
+        ----------
+        contigs: pd.Series or np.ndarray
+            Contig names, e.g. the contig column of the data.
+
+        Returns
+        -------
+        codes: np.ndarray
+            For each element, the position of its contig in `contigs`, or -1 if it is unknown or missing.
+        unknown: list of str
+            The unknown contig names.
+        """
+        codes, uniques = pd.factorize(pd.Series(contigs))
+        # Missing contigs are factorized as -1, which picks the trailing -1 of the lookup.
+        uniqueCodes = np.array([self._lookup.get(self._Normalized(contig), -1) for contig in uniques] + [-1],
+                               dtype=np.int64)
+        unknown = [str(contig) for contig, code in zip(uniques, uniqueCodes) if code < 0]
+        return uniqueCodes[codes], unknown
+
+    @property
+    def contigOrder(self):
+        """
+        list of str: Names of the contigs, in plotting order.
+        """
+        return list(self.contigs)
+
+    @property
+    def cumulativeLengths(self):
+        """
+        dict: Maps contig names to their offset on the concatenated genome.
+        """
+        return dict(zip(self.contigs, self.offsets.tolist()))
+
+    @property
+    def lengths(self):
+        """
+        dict: Maps contig names to their length.
+        """
+        return dict(zip(self.contigs, self.contigLengths.tolist()))
+
+    @property
+    def tickPosition(self):
+        """
+        dict: Maps contig names to the position of their middle on the concatenated genome.
+        """
+        return dict(zip(self.contigs, self.ticks.tolist()))
+
+    def __getitem__(self, key):
+        assert key in ('contigOrder', 'cumulativeLengths', 'lengths', 'tickPosition'), f'Unknown key "{key}".'
+        return getattr(self, key)
+
+
+def Register(genome, replace=False):
+    """
+    Makes a reference genome available by its name, e.g. to `Manhattan.genome`.
+
+    Parameters
+    ----------
+    genome: ReferenceGenome
+        The reference genome.
+    replace: bool
+        Whether a reference genome registered under the same name may be replaced. Default is `False`.
+
+    Returns
+    -------
+    ReferenceGenome: `genome`.
+    """
+    with _registryLock:
+        _EnsureBuiltins()
+        assert replace or genome.name not in _registry, f'A reference genome named "{genome.name}" already exists.'
+        _registry[genome.name] = genome
+    return genome
+
+
+def Genome(name):
+    """
+    Returns
+    -------
+    ReferenceGenome: The reference genome registered under `name`.
+    """
+    with _registryLock:
+        _EnsureBuiltins()
+        assert name in _registry, f'Acceptable "genome" values are {", ".join(_registry)}.'
+        return _registry[name]
+
+
+def Genomes():
+    """
+    Returns
+    -------
+    list of str: Names of the registered reference genomes.
+    """
+    with _registryLock:
+        _EnsureBuiltins()
+        return list(_registry)
+
+
+def _EnsureBuiltins():
+    if not _registry:
+        for name, contigs in _Builtins.items():
+            _registry[name] = ReferenceGenome(name, *zip(*contigs))
@@ -0,0 +1,435 @@
+import math
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+Font = 'Helvetica'
+AxisColor = '#444444'
+# Space around frames for their axes, in pixels: left, top, right, bottom.
+Margins = (60, 10, 10, 45)
+
+
+def RGB(color):
+    """
+    Returns
+    -------
+    tuple of int: The red, green and blue components of a `#rrggbb` color.
+    """
+    return tuple(int(color[index:index + 2], 16) for index in (1, 3, 5))
+
+
+def NiceTicks(start, end, count=5):
+    """
+    Returns
+    -------
+    np.ndarray: About `count` evenly spaced values within `[start, end]`, at multiples of 1, 2 or 5 times a power of
+    ten.
+    """
+    span = end - start
+    if not np.isfinite(span) or span <= 0:
+        return np.array([start], dtype=np.float64)
+    raw = span / count
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(multiple * magnitude for multiple in (1, 2, 5, 10) if multiple * magnitude >= raw)
+    ticks = np.arange(math.ceil(start / step), math.floor(end / step) + 1) * step
+    return np.round(ticks, max(0, -math.floor(math.log10(step))) + 1)
+
+
+def TickLabel(value):
+    return f'{value:g}'
+
+
+class Canvas:
+    """
+    The `Canvas` class is the interface of the native renderers, which draw static plots without a browser. All
+    coordinates are in pixels, from the top left corner.
+
+    Parameters
+    ----------
+    width: int
+        Width of the canvas, in pixels.
+    height: int
+        Height of the canvas, in pixels.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def Circles(self, x, y, diameter, color, alpha):
+        """
+        Draws filled circles of a single color.
+
+        Parameters
+        ----------
+        x: np.ndarray
+            Horizontal positions of their centers.
+        y: np.ndarray
+            Vertical positions of their centers.
+        diameter: float
+            Diameter of the circles.
+        color: str
+            Color in the `#rrggbb` format.
+        alpha: float
+            Opacity of each circle.
+        """
+        raise NotImplementedError
+
+    def Line(self, x0, y0, x1, y1, color=AxisColor, width=1):
+        raise NotImplementedError
+
+    def Rectangle(self, x, y, width, height, fill):
+        raise NotImplementedError
+
+    def Text(self, x, y, text, size=11, anchor='middle', baseline='middle', vertical=False, color=AxisColor):
+        """
+        Draws a line of text.
+
+        Parameters
+        ----------
+        anchor: str
+            Either `"start"`, `"middle"` or `"end"`: which part of the text lies at `x`.
+        baseline: str
+            Either `"top"`, `"middle"` or `"bottom"`: which part of the text lies at `y`.
+        vertical: bool
+            When set, the text reads upwards, and `anchor` and `baseline` apply to the rotated text.
+        """
+        raise NotImplementedError
+
+    def Save(self, path):
+        raise NotImplementedError
+
+
+class RasterCanvas(Canvas):
+    """
+    A canvas drawing into an image, for `.png` and `.jpeg` files. Circles are stamped into a pixel buffer through
+    numpy, and overlapping circles of a color blend as if drawn one by one. Lines, rectangles and text are drawn over
+    the circles by Pillow, when saving.
+    """
+
+    Padding = 16  # Pixels around the image, so that circles up to twice as wide can be stamped without clipping.
+
+    def __init__(self, width, height):
+        super(RasterCanvas, self).__init__(width, height)
+        self._stride = width + 2 * self.Padding
+        self._pixels = np.full((self._stride * (height + 2 * self.Padding), 3), 255, dtype=np.float64)
+        self._operations = []
+        self._fonts = dict()
+
+    def Circles(self, x, y, diameter, color, alpha):
+        radius = min(diameter / 2, self.Padding)
+        extent = int(math.ceil(radius))
+        offsets = np.array([dy * self._stride + dx for dx in range(-extent, extent + 1)
+                            for dy in range(-extent, extent + 1) if dx * dx + dy * dy <= radius * radius] or [0])
+        cx = np.clip(np.rint(x).astype(np.int64), -extent, self.width + extent - 1) + self.Padding
+        cy = np.clip(np.rint(y).astype(np.int64), -extent, self.height + extent - 1) + self.Padding
+        pixels = ((cy * self._stride + cx)[:, None] + offsets).ravel()
+        if len(pixels) == 0:
+            return
+        # Pixels are counted within the span the circles cover, rather than over the whole canvas.
+        first = pixels.min()
+        counts = np.bincount(pixels - first)
+        covered = np.flatnonzero(counts)
+        # Each of `n` circles over a pixel lets `1 - alpha` of what is beneath through.
+        coverage = 1 - (1 - alpha) ** counts[covered, None]
+        covered += first
+        self._pixels[covered] = self._pixels[covered] * (1 - coverage) + np.array(RGB(color)) * coverage
+
+    def Line(self, x0, y0, x1, y1, color=AxisColor, width=1):
+        self._operations.append(lambda image, draw: draw.line([(x0, y0), (x1, y1)], fill=color, width=width))
+
+    def Rectangle(self, x, y, width, height, fill):
+        self._operations.append(lambda image, draw: draw.rectangle([x, y, x + width - 1, y + height - 1], fill=fill))
+
+    def _Font(self, size):
+        from PIL import ImageFont
+        if size not in self._fonts:
+            try:
+                self._fonts[size] = ImageFont.load_default(size=size)
+            except TypeError:  # Pillow before 10.1 only has a bitmap font, of a fixed size.
+                self._fonts[size] = ImageFont.load_default()
+        return self._fonts[size]
+
+    def Text(self, x, y, text, size=11, anchor='middle', baseline='middle', vertical=False, color=AxisColor):
+        def Draw(image, draw):
+            from PIL import Image, ImageDraw
+            font = self._Font(size)
+            try:
+                left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+            except ValueError:  # Pillow before 9.2 only measures TrueType fonts that way.
+                (left, top), (right, bottom) = (0, 0), font.getsize(text)
+            width, height = right - left, bottom - top
+            mask = Image.new('L', (width, height), 0)
+            ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+            position = {'start': 0, 'middle': width / 2, 'end': width}[anchor]
+            line = {'top': 0, 'middle': height / 2, 'bottom': height}[baseline]
+            if vertical:
+                mask, position = mask.rotate(90, expand=True), (x - line, y - (width - position))
+            else:
+                position = (x - position, y - line)
+            image.paste(color, (int(round(position[0])), int(round(position[1]))), mask)
+
+        self._operations.append(Draw)
+
+    def Save(self, path):
+        from PIL import Image, ImageDraw
+        pixels = self._pixels.reshape(self.height + 2 * self.Padding, self._stride, 3)
+        pixels = pixels[self.Padding:self.Padding + self.height, self.Padding:self.Padding + self.width]
+        image = Image.fromarray(np.rint(pixels).astype(np.uint8))
+        draw = ImageDraw.Draw(image)
+        for operation in self._operations:
+            operation(image, draw)
+        image.save(path, compress_level=1)  # Fast compression, as PNG files of plots compress well anyway.
+
+
+class SvgCanvas(Canvas):
+    """
+    A canvas writing SVG markup, for `.svg` files. Circles of a color are grouped, so that their style is written
+    once.
+    """
+
+    def __init__(self, width, height):
+        super(SvgCanvas, self).__init__(width, height)
+        self._parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                       f'viewBox="0 0 {width} {height}" font-family="{Font}, Arial, sans-serif">\n',
+                       f'<rect width="{width}" height="{height}" fill="#ffffff"/>\n']
+
+    def Circles(self, x, y, diameter, color, alpha):
+        self._parts.append(f'<g fill="{color}" fill-opacity="{alpha:g}">\n')
+        circle = f'<circle cx="%.2f" cy="%.2f" r="{diameter / 2:g}"/>\n'
+        self._parts.extend(circle % center for center in zip(x.tolist(), y.tolist()))
+        self._parts.append('</g>\n')
+
+    def Line(self, x0, y0, x1, y1, color=AxisColor, width=1):
+        self._parts.append(f'<line x1="{x0:g}" y1="{y0:g}" x2="{x1:g}" y2="{y1:g}" stroke="{color}" '
+                           f'stroke-width="{width:g}"/>\n')
+
+    def Rectangle(self, x, y, width, height, fill):
+        self._parts.append(f'<rect x="{x:g}" y="{y:g}" width="{width:g}" height="{height:g}" fill="{fill}"/>\n')
+
+    def Text(self, x, y, text, size=11, anchor='middle', baseline='middle', vertical=False, color=AxisColor):
+        shift = {'top': '0.8em', 'middle': '0.35em', 'bottom': '0'}[baseline]
+        rotation = f' transform="rotate(-90 {x:g} {y:g})"' if vertical else ''
+        self._parts.append(f'<text x="{x:g}" y="{y:g}" dy="{shift}" font-size="{size}" fill="{color}" '
+                           f'text-anchor="{anchor}"{rotation}>{escape(text)}</text>\n')
+
+    def Save(self, path):
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.writelines(self._parts)
+            stream.write('</svg>\n')
+
+
+class PdfCanvas(Canvas):
+    """
+    A canvas drawing through reportlab, for `.pdf` files. Drawing operations are recorded, and replayed on a new
+    reportlab canvas by `Save`.
+    """
+
+    def __init__(self, width, height):
+        super(PdfCanvas, self).__init__(width, height)
+        self._operations = []
+
+    def Circles(self, x, y, diameter, color, alpha):
+        x, y = x.tolist(), (self.height - y).tolist()
+
+        def Draw(canvas):
+            canvas.setFillColorRGB(*(component / 255 for component in RGB(color)))
+            canvas.setFillAlpha(alpha)
+            path = canvas.beginPath()
+            for center in zip(x, y):
+                path.circle(*center, diameter / 2)
+            canvas.drawPath(path, stroke=0, fill=1)
+            canvas.setFillAlpha(1)
+
+        self._operations.append(Draw)
+
+    def Line(self, x0, y0, x1, y1, color=AxisColor, width=1):
+        def Draw(canvas):
+            canvas.setStrokeColorRGB(*(component / 255 for component in RGB(color)))
+            canvas.setLineWidth(width)
+            canvas.line(x0, self.height - y0, x1, self.height - y1)
+
+        self._operations.append(Draw)
+
+    def Rectangle(self, x, y, width, height, fill):
+        def Draw(canvas):
+            canvas.setFillColorRGB(*(component / 255 for component in RGB(fill)))
+            canvas.rect(x, self.height - y - height, width, height, stroke=0, fill=1)
+
+        self._operations.append(Draw)
+
+    def Text(self, x, y, text, size=11, anchor='middle', baseline='middle', vertical=False, color=AxisColor):
+        def Draw(canvas):
+            width = canvas.stringWidth(text, Font, size)
+            canvas.saveState()
+            canvas.translate(x, self.height - y)
+            if vertical:
+                canvas.rotate(90)
+            canvas.setFont(Font, size)
+            canvas.setFillColorRGB(*(component / 255 for component in RGB(color)))
+            shift = {'start': 0, 'middle': width / 2, 'end': width}[anchor]
+            canvas.drawString(-shift, -{'top': 0.8, 'middle': 0.35, 'bottom': 0}[baseline] * size, text)
+            canvas.restoreState()
+
+        self._operations.append(Draw)
+
+    def Save(self, path):
+        try:
+            from reportlab.pdfgen.canvas import Canvas as ReportlabCanvas
+        except ImportError:
+            raise RuntimeError('You need to install "reportlab" for PDF exports.')
+        canvas = ReportlabCanvas(path, pagesize=(self.width, self.height))
+        for operation in self._operations:
+            operation(canvas)
+        canvas.showPage()
+        canvas.save()
+
+
+CanvasTypes = {'.png': RasterCanvas, '.jpeg': RasterCanvas, '.svg': SvgCanvas, '.pdf': PdfCanvas}
+
+
+class Frame:
+    """
+    The `Frame` class maps a plotting area of a canvas to data ranges, and draws points and axes in it.
+
+    Parameters
+    ----------
+    canvas: Canvas
+        The canvas to draw on.
+    left: int
+        Horizontal position of the area on the canvas, axes included.
+    top: int
+        Vertical position of the area on the canvas, axes included.
+    width: int
+        Width of the area, axes included, as for the width of a Bokeh figure.
+    height: int
+        Height of the area, axes included.
+    xRange: tuple
+        The horizontal range of the data shown.
+    yRange: tuple
+        The vertical range of the data shown.
+    """
+
+    def __init__(self, canvas, left, top, width, height, xRange, yRange):
+        self.canvas = canvas
+        self.left, self.top = left + Margins[0], top + Margins[1]
+        self.width, self.height = width - Margins[0] - Margins[2], height - Margins[1] - Margins[3]
+        self.xRange, self.yRange = xRange, yRange
+
+    def Pixels(self, x, y):
+        """
+        Returns
+        -------
+        tuple of np.ndarray: The positions of the given data points on the canvas.
+        """
+        (xStart, xEnd), (yStart, yEnd) = self.xRange, self.yRange
+        px = self.left + (np.asarray(x, dtype=np.float64) - xStart) * (self.width / ((xEnd - xStart) or 1))
+        py = (self.top + self.height
+              - (np.asarray(y, dtype=np.float64) - yStart) * (self.height / ((yEnd - yStart) or 1)))
+        return px, py
+
+    def Points(self, x, y, codes, palette, diameter, alpha):
+        """
+        Draws points, one batch of circles per color. Points outside the ranges, with missing coordinates, or with
+        a negative code are left out, and points of a color falling on the same half pixel are drawn once.
+
+        Parameters
+        ----------
+        x: np.ndarray
+            Horizontal coordinates of the points.
+        y: np.ndarray
+            Vertical coordinates of the points.
+        codes: np.ndarray
+            For each point, the position of its color in `palette`.
+        palette: list of str
+            Colors in the `#rrggbb` format.
+        diameter: float
+            Diameter of the points, in pixels.
+        alpha: float
+            Opacity of the points.
+        """
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        codes = np.broadcast_to(np.asarray(codes, dtype=np.int64), x.shape)
+        (xStart, xEnd), (yStart, yEnd) = self.xRange, self.yRange
+        kept = np.flatnonzero((codes >= 0) & (x >= xStart) & (x <= xEnd) & (y >= yStart) & (y <= yEnd))
+        px, py = self.Pixels(x[kept], y[kept])
+        rows = 2 * self.canvas.height + 1
+        cells = np.rint(px * 2).astype(np.int64) * rows + np.rint(py * 2).astype(np.int64)
+        marker = np.empty((2 * self.canvas.width + 1) * rows, dtype=np.int64)
+        # A stable sort of small integers is a radix sort, in linear time.
+        order = np.argsort(codes[kept].astype(np.int16), kind='stable')
+        bounds = np.searchsorted(codes[kept][order], np.arange(len(palette) + 1))
+        for code, color in enumerate(palette):
+            members = order[bounds[code]:bounds[code + 1]]
+            if len(members) == 0:
+                continue
+            # Whichever point of the color is written last to a cell represents it.
+            positions = np.arange(len(members))
+            marker[cells[members]] = positions
+            drawn = members[marker[cells[members]] == positions]
+            self.canvas.Circles(px[drawn], py[drawn], diameter, color, alpha)
+
+    def Axes(self, xLabel, yLabel, xTicks=None, xTickLabels=None):
+        """
+        Draws the axes on the left and bottom sides of the frame, with their ticks and labels.
+
+        Parameters
+        ----------
+        xLabel: str
+            Label of the horizontal axis.
+        yLabel: str
+            Label of the vertical axis.
+        xTicks: np.ndarray
+            Positions of the ticks of the horizontal axis. Defaults to evenly spaced values.
+        xTickLabels: list of str
+            Labels of `xTicks`. Defaults to their values.
+        """
+        canvas, bottom, right = self.canvas, self.top + self.height, self.left + self.width
+        canvas.Line(self.left, bottom, right, bottom)
+        canvas.Line(self.left, self.top, self.left, bottom)
+        if xTicks is None:
+            xTicks = NiceTicks(*self.xRange)
+        xTickLabels = [TickLabel(tick) for tick in xTicks] if xTickLabels is None else xTickLabels
+        xStart, xEnd = self.xRange
+        for tick, label in zip(xTicks, xTickLabels):
+            if xStart <= tick <= xEnd:
+                px = self.Pixels([tick], [self.yRange[0]])[0][0]
+                canvas.Line(px, bottom, px, bottom + 6)
+                canvas.Text(px, bottom + 8, label, anchor='middle', baseline='top')
+        yStart, yEnd = self.yRange
+        for tick in NiceTicks(*self.yRange):
+            if yStart <= tick <= yEnd:
+                py = self.Pixels([self.xRange[0]], [tick])[1][0]
+                canvas.Line(self.left - 6, py, self.left, py)
+                canvas.Text(self.left - 8, py, TickLabel(tick), anchor='end', baseline='middle')
+        canvas.Text(self.left + self.width / 2, bottom + 28, xLabel, size=13, anchor='middle', baseline='top')
+        canvas.Text(self.left - 45, self.top + self.height / 2, yLabel, size=13, anchor='middle', baseline='bottom',
+                    vertical=True)
+
+
+def Legend(canvas, left, top, height, palette, labels):
+    """
+    Draws a legend of the colors of a plot: a swatch per color, or a gradient when there are more colors than labels.
+
+    Parameters
+    ----------
+    canvas: Canvas
+        The canvas to draw on.
+    left: int
+        Horizontal position of the legend.
+    top: int
+        Vertical position of the legend.
+    height: int
+        Height of the legend.
+    palette: list of str
+        Colors in the `#rrggbb` format, from bottom to top.
+    labels: list of tuple
+        Pairs of a position along the legend, from 0 at the bottom to 1 at the top, and its label.
+    """
+    step = height / len(palette)
+    for index, color in enumerate(palette):
+        canvas.Rectangle(left, top + height - (index + 1) * step, 20, math.ceil(step), color)
+    for position, label in labels:
+        py = top + height - position * height
+        canvas.Line(left + 20, py, left + 24, py)
+        canvas.Text(left + 26, py, label, anchor='start', baseline='middle')
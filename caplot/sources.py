@@ -0,0 +1,419 @@
+import hashlib
+import os.path
+import threading
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+from . import container
+from .queryengine import LoadPlan, QueryEngine
+
+ReadingMethods = {
+    '.csv': pd.read_csv,
+    '.tsv': pd.read_table,
+    '.parquet': pd.read_parquet,
+    '.caplot': container.ReadData,
+}
+# Formats whose readers take a `columns` argument, and read nothing else.
+Columnar = ('.parquet', '.caplot')
+Compressions = ('.gz', '.bgz', '.bz2', '.zip', '.xz')
+# The following list is based on https://docs.sqlalchemy.org/en/14/dialects/#included-dialects.
+SupportedDialects = ('postgresql', 'postgres', 'mysql', 'mariadb', 'sqlite', 'oracle:thin', 'sqlserver')
+
+_engines = dict()
+_enginesLock = threading.Lock()
+
+
+def SplitExtension(path):
+    """
+    Parameters
+    ----------
+    path: str
+        Path to a file.
+
+    Returns
+    -------
+    extension: str
+        The file extension format, e.g. `.tsv` for `variants.tsv.gz`.
+    compression: str or None
+        The compression extension, e.g. `.gz` for `variants.tsv.gz`.
+    """
+    (remainder, extension), compression = os.path.splitext(path), None
+    if extension in Compressions:
+        (remainder, extension), compression = os.path.splitext(remainder), extension
+    return extension, compression
+
+
+def Schema(path):
+    """
+    Reads the column names of a file, without reading its records.
+
+    Parameters
+    ----------
+    path: str
+        Path to a file Pandas can read from.
+
+    Returns
+    -------
+    schema: dict
+        Maps each column name to its kind, as expected by `LoadPlan.Parse`. Kinds are only known for Parquet files
+        and `.caplot` containers.
+
+    Raises
+    ------
+    ImportError
+        If the file is a Parquet file or a `.caplot` container and `pyarrow` is not installed.
+    """
+    extension, compression = SplitExtension(path)
+    if extension == '.caplot':
+        return _Kinds(container.Fields(path))
+    if extension != '.parquet':
+        return {column: None for column in ReadingMethods[extension](path, nrows=0).columns}
+    import pyarrow.parquet as pq
+    schema = pq.read_schema(path)
+    indexColumns = {column for column in (schema.pandas_metadata or dict()).get('index_columns', [])
+                    if isinstance(column, str)}
+    return _Kinds(field for field in schema if field.name not in indexColumns)
+
+
+def _Kinds(fields):
+    import pyarrow as pa
+    kinds = dict()
+    for field in fields:
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            kinds[field.name] = 'numeric'
+        elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            kinds[field.name] = 'string'
+        elif pa.types.is_boolean(field.type):
+            kinds[field.name] = 'boolean'
+        else:
+            kinds[field.name] = None
+    return kinds
+
+
+def Columns(path, loadQuery=None):
+    """
+    Tells which columns `ReadFile` would return, without reading any records.
+
+    Parameters
+    ----------
+    path: str
+        Path to a file Pandas can read from.
+    loadQuery: str
+        An optional SQL query on the `data` table.
+
+    Returns
+    -------
+    list of str or None
+        Names of the columns, or `None` if they can not be told without executing `loadQuery`.
+    """
+    try:
+        schema = Schema(path)
+    except ImportError:
+        return None
+    if loadQuery is None:
+        return list(schema)
+    plan = LoadPlan.Parse(loadQuery, schema)
+    if plan.filters is None:
+        return None
+    return plan.columns if plan.columns is not None else list(schema)
+
+
+def Fingerprint(path, sampleSize=1 << 20):
+    """
+    Identifies the contents of a file cheaply, by its size and a hash of its first and last `sampleSize` bytes, so that
+    multi-gigabyte files are not read in full. The modification time is kept for reference only, as copies of a file
+    do not keep it.
+
+    Parameters
+    ----------
+    path: str
+        Path to a file.
+    sampleSize: int
+        Number of bytes hashed at either end of the file. Default is 1 MiB.
+
+    Returns
+    -------
+    dict or None
+        The `size`, `mtime` and `hash` of the file, or `None` if `path` is not a file, e.g. the URL for a database.
+    """
+    if not os.path.isfile(path):
+        return None
+    stat, digest = os.stat(path), hashlib.sha256()
+    with open(path, 'rb') as stream:
+        digest.update(stream.read(sampleSize))
+        if stat.st_size > sampleSize:
+            stream.seek(max(sampleSize, stat.st_size - sampleSize))
+            digest.update(stream.read(sampleSize))
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': digest.hexdigest()}
+
+
+def SameContents(fingerprint, other):
+    """
+    Returns
+    -------
+    bool: Whether two results of `Fingerprint` identify the same contents, regardless of modification times.
+    """
+    if fingerprint is None or other is None:
+        return False
+    return fingerprint['size'] == other['size'] and fingerprint['hash'] == other['hash']
+
+
+def ReadFile(path, loadQuery=None, columns=None, chunkSize=None, reduce=None, index=None):
+    """
+    Reads a file into a DataFrame, applying `loadQuery` as early as possible.
+
+    For Parquet files, the selected columns and simple `WHERE` conditions of `loadQuery` are passed to the reader, so
+    that unwanted columns and row groups are never decoded. When the query can not be translated, only the columns it
+    refers to are read (for CSV/TSV files as well), and the query is executed on them.
+
+    Parameters
+    ----------
+    path: str
+        Path to a file Pandas can read from.
+    loadQuery: str
+        An optional SQL query on the `data` table.
+    columns: list of str
+        An optional subset of the columns resulting from `loadQuery` to return. Others are not read when possible.
+    chunkSize: int
+        When set, CSV/TSV files are streamed in chunks of this many rows. See `StreamFile`.
+    reduce: callable
+        Only used when streaming. See `StreamFile`.
+    index: pd.Index
+        Only used when streaming. See `StreamFile`.
+
+    Returns
+    -------
+    pd.DataFrame
+        The loaded data.
+
+    Raises
+    ------
+    AssertionError
+        If the file extension format is not supported.
+    """
+    extension, compression = SplitExtension(path)
+    assert extension in ReadingMethods, f'Unsupported extension "{extension}".'
+    if chunkSize is not None and extension not in Columnar:
+        return StreamFile(path, loadQuery, columns, chunkSize, reduce, index)
+    read = ReadingMethods[extension]
+    projection = 'columns' if extension in Columnar else 'usecols'
+    if loadQuery is None:
+        return read(path) if columns is None else read(path, **{projection: list(columns)})
+    try:
+        plan = LoadPlan.Parse(loadQuery, Schema(path))
+    except ImportError:
+        plan = LoadPlan()
+    if extension == '.parquet' and plan.filters is not None:
+        return _ReadParquet(path, plan, plan.columns if columns is None else list(columns))
+    if columns is not None:
+        # Whatever `*` expands to, the query only needs the columns it names, besides those requested.
+        data = read(path, **{projection: list(dict.fromkeys([*columns, *plan.referenced]))})
+    elif plan.wildcard:
+        data = read(path)
+    else:
+        data = read(path, **{projection: plan.referenced})
+    engine = QueryEngine({'data': data})
+    try:
+        data = engine.Query(loadQuery)
+    finally:
+        engine.Close()
+    data = data.set_index(QueryEngine.IndexColumn) if QueryEngine.IndexColumn in data.columns else data
+    return data if columns is None else data[list(columns)]
+
+
+def _ReadParquet(path, plan, columns):
+    """
+    Reads a Parquet file through a fully translated `LoadPlan`. The records keep the index `QueryEngine` would give
+    them: their original index when the query selects it, which the reader does not keep for filtered records unless
+    it is stored in the file. Their positions are then found by evaluating the filters on their columns alone.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    data = pd.read_parquet(path, engine='pyarrow', columns=columns, filters=plan.filters or None)
+    if not plan.index:
+        return data.reset_index(drop=True)
+    indexColumns = (pq.read_schema(path).pandas_metadata or dict()).get('index_columns', [])
+    if plan.filters and not (indexColumns and all(isinstance(column, str) for column in indexColumns)):
+        table = pq.read_table(path, columns=list(dict.fromkeys(column for column, _, _ in plan.filters)))
+        table = table.append_column('__position__', pa.array(np.arange(table.num_rows, dtype=np.int64)))
+        positions = ds.dataset(table).to_table(columns=['__position__'],
+                                               filter=pq.filters_to_expression(plan.filters))['__position__']
+        positions = positions.to_numpy()
+        # A range index is stored as its bounds; other files have none, and their records are numbered from 0.
+        stored = next(iter(indexColumns), {'start': 0, 'step': 1})
+        data.index = stored['start'] + stored['step'] * positions
+    return data.rename_axis(QueryEngine.IndexColumn) if data.index.nlevels == 1 else data
+
+
+def StreamFile(path, loadQuery=None, columns=None, chunkSize=100000, reduce=None, index=None):
+    """
+    Reads a CSV/TSV file in chunks, applying `loadQuery` to each chunk and only keeping the surviving rows, so that
+    the whole file is never held in memory at once. The index of the rows is their position in the file, as when the
+    file is read in one go. When `loadQuery` does not select the `index` column, the resulting rows are numbered in
+    order across chunks instead, as `ReadFile` does.
+
+    Parameters
+    ----------
+    path: str
+        Path to a CSV/TSV file, optionally compressed.
+    loadQuery: str
+        An optional SQL query on the `data` table. It is executed on each chunk separately, so it must not aggregate,
+        sort, or limit the records. Select the `index` column (e.g. with `*`) to keep the positions of the rows.
+    columns: list of str
+        An optional subset of the columns resulting from `loadQuery` to return. Others are not read when possible.
+    chunkSize: int
+        Number of rows read at a time. Default is 100000.
+    reduce: callable
+        An optional function applied to the rows kept so far, concatenated with those of each new chunk. It must
+        return a subset of its input, e.g. `lambda df: df.nsmallest(100, 'pvalue')` to keep a running top 100.
+    index: pd.Index
+        When set, only the rows with these index values are kept, e.g. the index of the rows returned by an earlier
+        call with the same `loadQuery`, to read other columns of them.
+
+    Returns
+    -------
+    pd.DataFrame
+        The loaded data.
+    """
+    extension, compression = SplitExtension(path)
+    assert extension in ('.csv', '.tsv'), f'Streaming is not supported for "{extension}" files.'
+    try:
+        plan = LoadPlan.Parse(loadQuery, Schema(path)) if loadQuery is not None else None
+    except ImportError:
+        plan = LoadPlan()
+    if columns is None:
+        usecols = None if plan is None or plan.wildcard else plan.referenced
+    else:
+        usecols = list(dict.fromkeys([*columns, *(plan.referenced if plan is not None else [])]))
+    engine = QueryEngine() if loadQuery is not None else None
+    kept, parts, numbered = None, [], 0
+    try:
+        for chunk in ReadingMethods[extension](path, usecols=usecols, chunksize=chunkSize):
+            if engine is not None:
+                engine.Register('data', chunk)
+                chunk = engine.Query(loadQuery)
+                if QueryEngine.IndexColumn in chunk.columns:
+                    chunk = chunk.set_index(QueryEngine.IndexColumn)
+                else:  # Like `ReadFile`, fall back to numbering the resulting rows, which `index` then refers to.
+                    chunk.index = pd.RangeIndex(numbered, numbered + len(chunk))
+                    numbered += len(chunk)
+            if index is not None:
+                chunk = chunk.loc[chunk.index.isin(index)]
+            if columns is not None:
+                chunk = chunk[list(columns)]
+            if reduce is not None:
+                kept = reduce(chunk if kept is None else pd.concat([kept, chunk]))
+            else:
+                parts.append(chunk)
+    finally:
+        if engine is not None:
+            engine.Close()
+    if kept is not None:
+        return kept
+    if parts:
+        return pd.concat(parts)
+    data = ReadingMethods[extension](path, usecols=usecols, nrows=0)
+    return data if columns is None else data[list(columns)]
+
+
+def IsDatabaseURL(source):
+    """
+    Returns
+    -------
+    bool: Whether `source` is the URL for a supported SQL database.
+    """
+    scheme = urllib.parse.urlparse(source).scheme.replace('jdbc:', '')
+    return scheme.split('+', 1)[0] in SupportedDialects  # Also accept explicit drivers, e.g. `postgresql+psycopg2`.
+
+
+def Engine(url):
+    """
+    Returns the SQLAlchemy engine for a database URL. Engines (and their connection pools) are created once and shared
+    by all plots in the process.
+
+    Parameters
+    ----------
+    url: str
+        The URL for a SQL database.
+
+    Returns
+    -------
+    sqlalchemy.engine.Engine
+    """
+    with _enginesLock:
+        if url not in _engines:
+            from sqlalchemy import create_engine
+            _engines[url] = create_engine(url, pool_pre_ping=True)
+        return _engines[url]
+
+
+def DisposeEngines():
+    """
+    Closes all pooled connections and forgets the shared engines, e.g. before forking worker processes.
+    """
+    with _enginesLock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def ReadDatabase(url, loadQuery, chunkSize=None):
+    """
+    Executes `loadQuery` on a database, using the shared engine for `url`.
+
+    Parameters
+    ----------
+    url: str
+        The URL for a SQL database.
+    loadQuery: str
+        The query whose result is loaded.
+    chunkSize: int
+        When set, the result is fetched through a server-side cursor (where the driver supports it), this many rows at
+        a time, and each chunk is stored with compact dtypes: integers are downcast, and text columns with repeated
+        values become categorical. Floats are kept as they are, since p-values would not survive `float32`. The
+        chunks are then joined column by column, each column being released from them once copied, so that memory
+        peaks at the size of the result plus one column.
+
+    Returns
+    -------
+    pd.DataFrame
+        The loaded data.
+    """
+    with Engine(url).connect() as connection:
+        if chunkSize is None:
+            return pd.read_sql(loadQuery, connection)
+        connection = connection.execution_options(stream_results=True, max_row_buffer=chunkSize)
+        parts, categorical = [], None
+        for chunk in pd.read_sql(loadQuery, connection, chunksize=chunkSize):
+            if categorical is None:  # Decided on the first chunk, so that all chunks agree.
+                categorical = [column for column in chunk.columns if _IsText(chunk[column].dtype) and
+                               chunk[column].nunique() <= len(chunk) // 2]
+            parts.append(_Compacted(chunk, categorical))
+    if not parts:
+        return pd.read_sql(loadQuery, Engine(url))
+    columns = dict()
+    for column in parts[0].columns.tolist():
+        pieces = [part.pop(column) for part in parts]
+        if column in categorical:
+            # Categories are joined as objects, as those of chunks where the column is all NULL have another dtype.
+            categories = np.concatenate([piece.cat.categories.to_numpy(dtype=object) for piece in pieces])
+            dtype = pd.CategoricalDtype(pd.unique(categories))
+            pieces = [piece.astype(dtype) for piece in pieces]
+        columns[column] = pd.concat(pieces, ignore_index=True)
+    return pd.DataFrame(columns, copy=False)
+
+
+def _IsText(dtype):
+    return pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+
+
+def _Compacted(chunk, categorical):
+    for column in chunk.columns:
+        if column in categorical:
+            chunk[column] = chunk[column].astype('category')
+        elif pd.api.types.is_integer_dtype(chunk[column].dtype):
+            chunk[column] = pd.to_numeric(chunk[column], downcast='integer')
+    return chunk
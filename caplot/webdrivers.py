@@ -0,0 +1,167 @@
+import atexit
+import queue
+import threading
+from contextlib import contextmanager
+
+_shared = None
+_sharedLock = threading.Lock()
+
+
+class WebDriverPool:
+    """
+    The `WebDriverPool` class keeps headless browsers alive across static exports, so that they are started once
+    rather than for every image. Exports running in parallel threads each take a browser of their own, starting new
+    ones up to `size`, then waiting for one to be returned.
+
+    Pools are context managers, which close their browsers on exit:
+
+    >>> with WebDriverPool(size=4) as pool:
+    ...     plot.SaveAs('manhattan.png', webdrivers=pool)
+
+    Plots use the pool returned by `SharedPool` by default.
+
+    Parameters
+    ----------
+    size: int
+        The most browsers running at once. Default is 1.
+    kind: str
+        Either `"chromium"` or `"firefox"`. Defaults to whichever Bokeh finds first.
+    """
+
+    PollInterval = 0.5  # Seconds between checks for room in the pool, while all browsers are busy.
+
+    def __init__(self, size=1, kind=None):
+        assert size >= 1, 'A pool needs at least one browser.'
+        self._size = size
+        self.kind = kind
+        self._idle = queue.LifoQueue()
+        self._drivers = set()
+        self._starting = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.Close()
+
+    @property
+    def size(self):
+        """
+        int: The most browsers running at once. Lowering it stops idle browsers beyond the new size.
+        """
+        return self._size
+
+    @size.setter
+    def size(self, value):
+        assert value >= 1, 'A pool needs at least one browser.'
+        self._size = value
+        while len(self._drivers) > value:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break  # Busy browsers are stopped when returned.
+            self._Quit(driver)
+
+    def __len__(self):
+        return len(self._drivers)
+
+    @contextmanager
+    def Driver(self):
+        """
+        Context manager that lends a browser from the pool, starting one if none is idle and the pool is not full.
+        A browser whose use raised an exception is stopped rather than returned, as its state is unknown.
+
+        Yields
+        ------
+        selenium.webdriver.remote.webdriver.WebDriver
+        """
+        driver = self._Acquire()
+        try:
+            yield driver
+        except BaseException:
+            self._Quit(driver)
+            raise
+        if self._closed or len(self._drivers) > self._size:
+            self._Quit(driver)
+        else:
+            self._idle.put(driver)
+
+    def _Acquire(self):
+        while True:
+            assert not self._closed, 'The pool is closed.'
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                start = len(self._drivers) + self._starting < self._size
+                self._starting += start
+            if start:
+                break
+            try:  # Browsers that fail are not returned, so the pool may have room again later.
+                return self._idle.get(timeout=self.PollInterval)
+            except queue.Empty:
+                pass
+        driver = None
+        try:
+            driver = self._Start()
+        finally:
+            with self._lock:
+                self._starting -= 1
+                if driver is not None:
+                    self._drivers.add(driver)
+        return driver
+
+    def _Start(self):
+        from bokeh.io.webdriver import webdriver_control
+        return webdriver_control.create(self.kind)
+
+    def _Quit(self, driver):
+        with self._lock:
+            self._drivers.discard(driver)
+        self._Stop(driver)
+
+    @staticmethod
+    def _Stop(driver):
+        from bokeh.io.webdriver import webdriver_control
+        try:
+            webdriver_control.terminate(driver)
+        except KeyError:  # Not started through Bokeh.
+            driver.quit()
+
+    def Close(self):
+        """
+        Stops the idle browsers, and any other browser once it is returned.
+        """
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._Quit(driver)
+
+
+def SharedPool(size=None):
+    """
+    Returns the pool static exports use by default, creating it on first use. It is closed when Python exits.
+
+    Parameters
+    ----------
+    size: int
+        When set, the most browsers the shared pool runs at once. Default is 1.
+
+    Returns
+    -------
+    WebDriverPool
+    """
+    global _shared
+    with _sharedLock:
+        if _shared is None or _shared._closed:
+            _shared = WebDriverPool()
+            atexit.register(_shared.Close)
+    if size is not None:
+        _shared.size = size
+    return _shared
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import caplot
+from caplot.aggregation import PixelBins, ThinnedRows, ViewportRows
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    x, y = rng.random(200000) * 1000, rng.exponential(1.5, 200000)
+    x[:100], y[100:200] = np.nan, np.nan
+    return x, y
+
+
+@pytest.mark.parametrize('threshold', [None, 5, 8])
+def test_thinned(points, threshold):
+    x, y = points
+    width, height, xRange, yRange = 200, 100, (0, 1000), (0, 10)
+    kept = ThinnedRows(x, y, xRange, yRange, width, height, threshold)
+    assert (np.diff(kept) > 0).all() and not np.isnan(x[kept]).any() and not np.isnan(y[kept]).any()
+    valid = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    significant = valid[y[valid] >= threshold] if threshold is not None else kept[:0]
+    assert np.isin(significant, kept).all()  # Points above the threshold are all kept.
+    # One point per pixel otherwise, for each pixel any point falls into.
+    thinned = np.setdiff1d(kept, significant)
+    assert len(thinned) <= width * height
+    valid = np.setdiff1d(valid, significant)
+    occupied = set(zip(*PixelBins(x[valid], y[valid], xRange, yRange, width, height)))
+    assert set(zip(*PixelBins(x[thinned], y[thinned], xRange, yRange, width, height))) == occupied
+    assert len(thinned) == len(occupied)
+
+
+def test_viewport(points):
+    x, y = points
+    inside = (x >= 100) & (x <= 110) & (y >= 0) & (y <= 2)
+    rows = ViewportRows(x, y, (100, 110), (0, 2), 200, 100, limit=inside.sum())
+    assert rows.tolist() == np.flatnonzero(inside).tolist()  # Within the limit, all the points in view.
+    rows = ViewportRows(x, y, (0, 1000), (0, 10), 200, 100, limit=1000, threshold=8)
+    significant = np.flatnonzero((x >= 0) & (x <= 1000) & (y >= 8) & (y <= 10))
+    assert np.isin(significant, rows).all() and len(rows) <= 200 * 100 + len(significant)
+    assert ((x[rows] >= 0) & (x[rows] <= 1000) & (y[rows] <= 10)).all()
+
+
+def test_manhattan():
+    rng = np.random.default_rng(1)
+    data = pd.DataFrame({'contig': rng.choice([str(number) for number in range(1, 23)], 100000),
+                         'position': rng.integers(1, 10 ** 8, 100000), 'pvalue': 10 ** -rng.exponential(1, 100000)})
+    plot = caplot.Manhattan(data, contig='contig', position='position', pvalue='pvalue', width=400, height=300,
+                            thinThreshold=6)
+    drawn = np.concatenate([renderer.data_source.data['__pvalue__'] for renderer in plot.Generate().renderers])
+    significant = np.sort(-np.log10(data['pvalue'].to_numpy()))
+    significant = significant[significant >= 6]
+    np.testing.assert_allclose(np.sort(drawn[drawn >= 6]), significant)
+    assert len(significant) and len(drawn) <= 400 * 300 + len(significant) and len(drawn) < len(data)
@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from caplot.annotation import AnnotationCache, Annotations, VEPClient
+
+requests = pytest.importorskip('requests')
+
+
+class Service(ThreadingHTTPServer):
+    """
+    A stand-in for the VEP REST API on localhost, which records the IDs of each request. The IDs in `failing` get
+    their batch rejected, and `statuses` are sent, in order, before any record.
+    """
+
+    def __init__(self):
+        super(Service, self).__init__(('localhost', 0), _Handler)
+        self.url = f'http://localhost:{self.server_address[1]}/vep'
+        self.lock = threading.Lock()
+        self.requests = []
+        self.statuses = []
+        self.failing = set()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        ids = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['ids']
+        with self.server.lock:
+            self.server.requests.append(ids)
+            status = self.server.statuses.pop(0) if self.server.statuses else None
+        if status is None and self.server.failing.intersection(ids):
+            status = 400
+        if status is not None:
+            self.send_response(status)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps([{'id': id, 'most_severe_consequence': 'missense_variant', 'colocated': [{'id': id}]}
+                           for id in ids if not id.startswith('unknown')]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def service():
+    server = Service()
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_batches(service):
+    ids = [f'rs{number}' for number in range(10)]
+    with VEPClient(service.url, batchSize=3, workers=2) as client:
+        records = client.Annotate([*ids, 'rs0'])
+    assert sorted(len(batch) for batch in service.requests) == [1, 3, 3, 3]
+    assert sorted(id for batch in service.requests for id in batch) == sorted(ids)
+    assert [record['id'] for record in records] == ids
+
+
+def test_retry_after(service):
+    service.statuses = [429, 503]
+    start = time.perf_counter()
+    with VEPClient(service.url, backoff=60) as client:  # `Retry-After` is honoured over the backoff.
+        records = client.Annotate(['rs1', 'rs2'])
+    assert time.perf_counter() - start < 30
+    assert service.requests == [['rs1', 'rs2']] * 3 and [record['id'] for record in records] == ['rs1', 'rs2']
+
+
+def test_retries_exhausted(service):
+    service.statuses = [429] * 3
+    with VEPClient(service.url, retries=2, backoff=0) as client:
+        with pytest.raises(requests.HTTPError):
+            client.Annotate(['rs1'])
+    assert len(service.requests) == 3
+
+
+def test_cache(service, tmp_path):
+    ids = [*(f'rs{number}' for number in range(7)), 'unknown1']
+    first = Annotations(ids, service.url, 'GRCh37', batchSize=3, cache=AnnotationCache(str(tmp_path)))
+    assert len(service.requests) == 3 and [record['id'] for record in first] == ids[:-1]
+    assert first[0]['colocated'] == "[{'id': 'rs0'}]"  # Flattened for tooltips.
+    # As in a later session, IDs the service returned nothing for included.
+    service.requests = []
+    second = Annotations(ids, service.url, 'GRCh37', batchSize=3, cache=AnnotationCache(str(tmp_path)))
+    assert service.requests == [] and second == first
+    # Records are kept per genome.
+    Annotations(ids[:2], service.url, 'GRCh38', cache=AnnotationCache(str(tmp_path)))
+    assert service.requests == [ids[:2]]
+
+
+def test_failed_batch(service, tmp_path):
+    cache = AnnotationCache(str(tmp_path))
+    ids = [f'rs{number}' for number in range(10)]
+    service.failing = {'rs5'}
+    with pytest.raises(requests.HTTPError):
+        Annotations(ids, service.url, 'GRCh37', batchSize=2, workers=2, cache=cache)
+    # The batches received before the failure are not requested again.
+    service.requests, service.failing = [], set()
+    assert len(Annotations(ids, service.url, 'GRCh37', batchSize=2, workers=2, cache=cache)) == 10
+    assert service.requests == [['rs4', 'rs5']]
@@ -0,0 +1,95 @@
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import caplot
+from caplot import container
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def manhattan():
+    data = pd.DataFrame({'contig': ['1', '2', '3', 'X'], 'position': [10, 20, 30, 40],
+                         'pvalue': [1e-8, 0.5, 1e-3, 0.1]})
+    return caplot.Manhattan(data, contig='contig', position='position', pvalue='pvalue', top=np.int64(2),
+                            yRange=(np.float64(0), np.float64(10)))
+
+
+def test_numpy_values(manhattan, tmp_path):
+    path = str(tmp_path / 'plot.caplot')
+    manhattan.SaveAs(path)
+    plot = caplot.read(path)
+    assert plot.top == 2 and list(plot.yRange) == [0, 10]
+    plot.Generate()
+
+
+def test_unencodable(manhattan, tmp_path):
+    manhattan.width = {800}
+    with pytest.raises(RuntimeError, match='"width"'):
+        manhattan.SaveAs(str(tmp_path / 'plot.caplot'))
+
+
+def test_missing_attributes(manhattan, tmp_path):
+    import pyarrow.feather as feather
+    path = str(tmp_path / 'plot.caplot')
+    manhattan.SaveAs(path)
+    table = feather.read_table(path)
+    config = json.loads(table.schema.metadata[container.MetadataKey])
+    del config['state']['thinThreshold'], config['state']['top']  # As if written before these were added.
+    feather.write_feather(table.replace_schema_metadata({container.MetadataKey: json.dumps(config).encode()}), path)
+    plot = caplot.read(path)
+    assert plot.thinThreshold is None and plot.top is None
+    plot.Generate()
+
+
+@pytest.fixture
+def referenced(tmp_path):
+    """
+    A Manhattan plot of a CSV file, saved without its data, and the paths to the file and the container.
+    """
+    source, path = str(tmp_path / 'data.csv'), str(tmp_path / 'plot.caplot')
+    pd.DataFrame({'contig': ['1', '2', '3', 'X', '5'], 'position': [10, 20, 30, 40, 50],
+                  'pvalue': [1e-8, 0.5, 1e-3, 0.1, 1e-7]}).to_csv(source, index=False)
+    plot = caplot.Manhattan(source, contig='contig', position='position', pvalue='pvalue',
+                            filter='SELECT * FROM data WHERE position > 10',
+                            highlight='SELECT * FROM data WHERE pvalue < 1e-5')
+    plot.SaveAs(path, embedData=False)
+    return plot, source, path
+
+
+def test_reference(referenced):
+    plot, source, path = referenced
+    os.utime(source, ns=(0, 0))  # Copies of a file do not keep its modification time.
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        read = caplot.read(path)
+    assert read._data is None and read.lean  # The masks saved are used, without loading the source.
+    assert read._filterMask.tolist() == plot._filterMask.tolist()
+    assert read._highlightMask.tolist() == plot._highlightMask.tolist()
+    read.Generate()
+    assert read.source['pvalue'].tolist() == plot.source['pvalue'].tolist()
+
+
+def test_reference_changed(referenced):
+    plot, source, path = referenced
+    pd.DataFrame({'contig': ['1', '2'], 'position': [5, 20], 'pvalue': [0.5, 1e-9]}).to_csv(source, index=False)
+    with pytest.warns(UserWarning, match='has changed'):
+        read = caplot.read(path)
+    # The filter and highlight queries run again on the new contents.
+    assert read._filterMask.tolist() == [False, True] and read._highlightMask.tolist() == [False, True]
+    read.Generate()
+
+
+def test_reference_missing(referenced):
+    plot, source, path = referenced
+    os.remove(source)
+    with pytest.raises(RuntimeError, match='can not be found'):
+        caplot.read(path)
+    with pytest.raises(RuntimeError, match='file or a database'):
+        caplot.Manhattan(plot.source.copy(), contig='contig', position='position', pvalue='pvalue').SaveAs(
+            path, embedData=False)
@@ -0,0 +1,37 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from caplot.sources import ReadDatabase
+
+pytest.importorskip('sqlalchemy')
+
+
+@pytest.fixture
+def database(tmp_path):
+    """
+    A table of 10 rows, whose text columns are categorical in the first chunk of 6 rows, and all NULL in the last
+    chunk for `t`.
+    """
+    path = tmp_path / 'data.db'
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE data (t TEXT, n INTEGER, m TEXT)')
+    rows = [('a' if i % 2 else 'b', i, None if i % 3 == 0 else 'x') for i in range(6)]
+    rows.extend((None, i, 'y') for i in range(6, 10))
+    connection.executemany('INSERT INTO data VALUES (?, ?, ?)', rows)
+    connection.commit()
+    connection.close()
+    return f'sqlite:///{path}'
+
+
+@pytest.mark.parametrize('chunkSize', [3, 6, 20])
+def test_chunks(database, chunkSize):
+    expected = ReadDatabase(database, 'SELECT * FROM data')
+    data = ReadDatabase(database, 'SELECT * FROM data', chunkSize=chunkSize)
+    assert list(data.columns) == ['t', 'n', 'm'] and data.index.tolist() == list(range(10))
+    if chunkSize >= 6:  # The values of smaller first chunks are not repeated enough.
+        assert isinstance(data['t'].dtype, pd.CategoricalDtype) and isinstance(data['m'].dtype, pd.CategoricalDtype)
+    for column in data.columns:
+        assert data[column].isna().tolist() == expected[column].isna().tolist()
+        assert data[column].dropna().tolist() == expected[column].dropna().tolist()
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+import caplot
+from caplot import interactiveplot
+from caplot.webdrivers import WebDriverPool
+
+
+class Pool(WebDriverPool):
+    """
+    A pool of placeholder browsers, which the stubbed exports below accept.
+    """
+
+    def _Start(self):
+        return object()
+
+    @staticmethod
+    def _Stop(driver):
+        pass
+
+
+@pytest.fixture
+def plot():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({'contig': rng.integers(1, 23, 300).astype(str), 'position': rng.integers(1, 10 ** 8, 300),
+                         'pvalue': rng.random(300)})
+    return caplot.Manhattan(data, contig='contig', position='position', pvalue='pvalue', width=400, height=300)
+
+
+@pytest.fixture
+def calls(monkeypatch, plot):
+    """
+    The output backend of each generated plot, and the canvas type of each native rendering.
+    """
+    calls = {'Generate': [], '_Render': [], 'screenshots': 0}
+    generate, render = type(plot).Generate, type(plot)._Render
+
+    def Generate(self, *args, **kwargs):
+        calls['Generate'].append(kwargs.get('outputBackend', 'canvas'))
+        return generate(self, *args, **kwargs)
+
+    def _Render(self, canvasType):
+        calls['_Render'].append(canvasType)
+        return render(self, canvasType)
+
+    def Screenshot(plot, driver=None):
+        calls['screenshots'] += 1
+        return Image.new('RGBA', (plot.width, plot.height))
+
+    def ExportSvg(plot, filename=None, webdriver=None):
+        with open(filename, 'w') as file:
+            file.write('<svg xmlns="http://www.w3.org/2000/svg"/>')
+
+    monkeypatch.setattr(type(plot), 'Generate', Generate)
+    monkeypatch.setattr(type(plot), '_Render', _Render)
+    monkeypatch.setattr(interactiveplot, 'get_screenshot_as_png', Screenshot)
+    monkeypatch.setattr(interactiveplot, 'export_svg', ExportSvg)
+    return calls
+
+
+def test_bokeh(plot, calls, tmp_path):
+    prefix = str(tmp_path / 'plot')
+    with Pool() as pool:
+        plot._SaveAs(prefix, ['.png', '.jpeg', '.svg', '.html', '.caplot'], True, pool, 'bokeh')
+    # The images and the page share the canvas plot, taken in a single screenshot.
+    assert sorted(calls['Generate']) == ['canvas', 'svg'] and calls['screenshots'] == 1 and not calls['_Render']
+    for extension in ('.png', '.jpeg', '.svg', '.html', '.caplot'):
+        assert (tmp_path / f'plot{extension}').stat().st_size
+    assert Image.open(prefix + '.jpeg').size == (400, 300)
+
+
+
+def test_native(plot, calls, tmp_path):
+    prefix = str(tmp_path / 'plot')
+    with Pool() as pool:
+        plot._SaveAs(prefix, ['.png', '.jpeg', '.svg', '.html', '.caplot'], True, pool, 'native')
+        assert len(pool) == 0  # No browser was needed.
+    assert calls['Generate'] == ['canvas'] and calls['screenshots'] == 0
+    assert calls['_Render'] == [caplot.rendering.RasterCanvas, caplot.rendering.SvgCanvas]
+    for extension in ('.png', '.jpeg', '.svg', '.html', '.caplot'):
+        assert (tmp_path / f'plot{extension}').stat().st_size
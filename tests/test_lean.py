@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import caplot
+from caplot import interactiveplot
+
+
+@pytest.fixture
+def csv(tmp_path):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({'contig': rng.integers(1, 23, 200).astype(str), 'position': rng.integers(1, 10 ** 7, 200),
+                         'pvalue': rng.random(200), 'maf': rng.random(200), 'note': rng.choice(['a', 'b'], 200),
+                         'other': rng.random(200)})
+    path = tmp_path / 'data.csv'
+    data.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """
+    The columns requested by each read of a file.
+    """
+    reads, read = [], interactiveplot.ReadFile
+
+    def ReadFile(path, loadQuery=None, columns=None, **kwargs):
+        reads.append(columns)
+        return read(path, loadQuery, columns, **kwargs)
+
+    monkeypatch.setattr(interactiveplot, 'ReadFile', ReadFile)
+    return reads
+
+
+def test_manhattan(csv, reads):
+    plot = caplot.Manhattan(csv, contig='contig', position='position', pvalue='pvalue', hovers={'Note': 'note'},
+                            highlight='SELECT * FROM data WHERE maf < 0.1', lean=True)
+    plot.Generate()
+    assert len(reads) == 1 and set(reads[0]) == {'contig', 'position', 'pvalue', 'note', 'maf'}
+
+
+def test_pca(csv, reads):
+    plot = caplot.PCA(csv, subplots=['maf', 'pvalue'], coloringColumn='note',
+                      filter='SELECT * FROM data WHERE maf < 0.9', lean=True)
+    plot.Generate()
+    assert len(reads) == 1 and set(reads[0]) == {'maf', 'pvalue', 'note'}
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from caplot.queryengine import LoadPlan, QueryEngine
+from caplot.sources import ReadFile, Schema
+
+pytest.importorskip('pyarrow')
+
+Queries = [
+    "SELECT * FROM data WHERE s IN ('x', 'z')",
+    "SELECT * FROM data WHERE s NOT IN ('x')",
+    "SELECT * FROM data WHERE a NOT IN (1, 2)",
+    "SELECT * FROM data WHERE f NOT IN (0.5)",
+    "SELECT * FROM data WHERE b NOT IN (1)",
+    "SELECT * FROM data WHERE s != 'x'",
+    "SELECT * FROM data WHERE f <> 0.5",
+    "SELECT * FROM data WHERE a = 3",
+    "SELECT * FROM data WHERE a > 2",
+    "SELECT * FROM data WHERE 2 < a AND a <= 5",
+    "SELECT * FROM data WHERE f >= 0.25 AND f < 1",
+    "SELECT * FROM data WHERE b = 1",
+    'SELECT "index", a FROM data WHERE a > 2',
+    'SELECT a, s FROM data WHERE a > 2',
+    'SELECT * FROM data',
+]
+
+
+@pytest.fixture(params=['range', 'stored', 'none'])
+def parquet(request, tmp_path):
+    """
+    A Parquet file with missing values in every column, whose index is either a range, stored as a column, or absent.
+    """
+    pa, pq = pytest.importorskip('pyarrow'), pytest.importorskip('pyarrow.parquet')
+    data = pd.DataFrame({
+        'a': pd.array([1, 2, None, 3, 4, 5, None, 6], dtype='Int64'),
+        'f': [0.25, np.nan, 0.5, 1.0, 0.75, np.nan, 0.5, 2.0],
+        's': ['x', 'y', None, 'z', 'x', 'w', 'z', None],
+        'b': pd.array([True, False, None, True, True, False, None, False], dtype='boolean'),
+    })
+    path = tmp_path / 'data.parquet'
+    if request.param == 'range':
+        data.to_parquet(path)
+    elif request.param == 'stored':
+        data.set_axis(np.arange(8) * 10 + 7).to_parquet(path)
+    else:
+        pq.write_table(pa.Table.from_pandas(data, preserve_index=False).replace_schema_metadata(None), path)
+    return str(path)
+
+
+def Expected(path, loadQuery):
+    engine = QueryEngine({'data': pd.read_parquet(path)})
+    try:
+        data = engine.Query(loadQuery)
+    finally:
+        engine.Close()
+    return data.set_index(QueryEngine.IndexColumn) if QueryEngine.IndexColumn in data.columns else data
+
+
+def Values(column):
+    """
+    The values that are not missing, regardless of the dtype SQLite returns them with (e.g. floats for nullable
+    integers, and 0/1 for booleans).
+    """
+    column = column.dropna()
+    try:
+        return column.astype(float).tolist()
+    except (TypeError, ValueError):
+        return column.astype(str).tolist()
+
+
+@pytest.mark.parametrize('loadQuery', Queries)
+def test_translated(parquet, loadQuery):
+    assert LoadPlan.Parse(loadQuery, Schema(parquet)).filters is not None
+    expected, actual = Expected(parquet, loadQuery), ReadFile(parquet, loadQuery)
+    np.testing.assert_array_equal(actual.index.to_numpy(), expected.index.to_numpy())
+    assert actual.index.name == expected.index.name
+    assert list(actual.columns) == list(expected.columns)
+    for column in actual.columns:
+        assert actual[column].isna().tolist() == expected[column].isna().tolist()
+        assert Values(actual[column]) == Values(expected[column])
+
+
+def test_untranslated():
+    schema = {'a': 'numeric', 's': 'string'}
+    for loadQuery in ("SELECT * FROM data WHERE a IS NULL", "SELECT * FROM data WHERE a > 1 OR s = 'x'",
+                      "SELECT * FROM data WHERE s = 1", "SELECT a, count(*) FROM data GROUP BY a",
+                      "SELECT * FROM data WHERE a % 2 = 0"):
+        assert LoadPlan.Parse(loadQuery, schema).filters is None
+
+
+def test_referenced():
+    schema = {'a': 'numeric', 's': 'string'}
+    assert LoadPlan.Parse("SELECT * FROM data WHERE a % 2 = 0", schema).referenced == ['a']
+    assert LoadPlan.Parse("SELECT * FROM data WHERE a = ?", schema).referenced == ['a', 's']  # Not tokenized.
+
+
+def test_missing_dropped():
+    plan = LoadPlan.Parse("SELECT * FROM data WHERE s NOT IN ('x') AND a != 1", {'a': 'numeric', 's': 'string'})
+    assert plan.filters == [('s', 'not in', ['x']), ('s', '>=', ''), ('a', '!=', 1), ('a', '>=', float('-inf'))]
@@ -0,0 +1,67 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import caplot
+from caplot.refgenome import Genome
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    contigs = [str(number) for number in range(1, 23)] + ['X']
+    pvalues = rng.integers(1, 20, 500) / 20  # Many ties.
+    pvalues[rng.choice(500, 25, replace=False)] = np.nan
+    return pd.DataFrame({
+        'contig': rng.choice(contigs, 500), 'position': rng.integers(1, 10 ** 7, 500),
+        'other': rng.choice([*contigs, 'Un'], 500), 'moved': rng.integers(1, 10 ** 7, 500), 'pvalue': pvalues,
+    })
+
+
+def Expected(data, contig, position, genome):
+    """
+    The codes and locations of the records, computed from scratch.
+    """
+    reference = Genome(genome)
+    lookup = {name: index for index, name in enumerate(reference.contigs)}
+    lookup.update({f'chr{name}': index for name, index in list(lookup.items())})
+    lookup.update({name[3:]: index for name, index in list(lookup.items()) if name.startswith('chr')})
+    codes = np.array([lookup.get(name, -1) for name in data[contig]])
+    locations = np.array([reference.offsets[code] + value if code >= 0 else np.nan
+                          for code, value in zip(codes, data[position])])
+    return codes, locations
+
+
+def test_coordinates(data):
+    plot = caplot.Manhattan(data, contig='contig', position='position', pvalue='pvalue')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # Records on the "Un" contig are reported.
+        for change in ({}, {'contig': 'other'}, {'position': 'moved'}, {'genome': 'GRCh38'},
+                       {'source': data.assign(moved=data['moved'] + 1)}, {'contig': 'contig'}):
+            for name, value in change.items():
+                setattr(plot, name, value)
+            codes, locations = plot._Coordinates()
+            expected = Expected(plot._data, plot.contig, plot.position, plot.genome)
+            np.testing.assert_array_equal(codes, expected[0])
+            np.testing.assert_array_equal(locations, expected[1])
+            assert plot._Coordinates()[1] is locations  # Cached until one of them changes.
+
+
+@pytest.mark.parametrize('mlog10', [False, True])
+@pytest.mark.parametrize('top', [1, 37, 100, 475, 1000])
+def test_top(data, mlog10, top):
+    for query in (None, 'SELECT * FROM data WHERE position > 5000000'):
+        plot = caplot.Manhattan(data, filter=query, contig='contig', position='position', pvalue='pvalue',
+                                mlog10=mlog10, top=top)
+        selected, codes, locations = plot._Selection([plot.pvalue])
+        candidates = data if query is None else data[data['position'] > 5000000]
+        candidates = np.sort(candidates['pvalue'].dropna().to_numpy())
+        expected = candidates[::-1][:top] if mlog10 else candidates[:top]
+        assert len(selected) == min(top, len(candidates))
+        np.testing.assert_array_equal(np.sort(selected['pvalue'].to_numpy()), np.sort(expected))
+        assert selected.index.is_monotonic_increasing  # In their original order.
+        assert len(codes) == len(locations) == len(selected)
+        plot.top = top // 2 + 1  # The cached selection is made again.
+        assert len(plot._Selection([plot.pvalue])[0]) == min(top // 2 + 1, len(candidates))
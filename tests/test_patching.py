@@ -0,0 +1,105 @@
+import bokeh.io
+import numpy as np
+import pandas as pd
+import pytest
+from bokeh.document import Document
+from bokeh.models import Plot
+from bokeh.plotting import figure
+
+import caplot
+from caplot.patching import Graft
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'contig': rng.integers(1, 23, 300).astype(str), 'position': rng.integers(1, 10 ** 8, 300),
+                         'pvalue': rng.random(300), 'maf': rng.random(300), 'note': rng.choice(['a', 'b'], 300)})
+
+
+def Displayed(plot):
+    """
+    Adds `plot` to a document, as when displayed.
+
+    Returns
+    -------
+    list of tuple: The name of the model class and of the property of each change of the document, as they occur.
+    """
+    events = []
+    document = Document()
+    document.add_root(plot)
+    document.on_change(lambda event: events.append((type(event.model).__name__, event.attr)))
+    return events
+
+
+def Figure(first, second, color):
+    plot = figure(width=300, height=200)
+    plot.scatter('x', 'y', source=dict(x=[1, 2, 3], y=first), color=color)
+    plot.scatter('x', 'y', source=dict(x=[1, 2, 3], y=second), color='#000000')
+    return plot
+
+
+def test_sources():
+    displayed = Figure([1, 2, 3], [4.0, np.nan, 6.0], '#ff0000')
+    events = Displayed(displayed)
+    assert Graft(displayed, Figure([1, 2, 3], [4.0, np.nan, 6.0], '#ff0000')) and events == []
+    # Only the source that changed is sent again.
+    assert Graft(displayed, Figure([1, 2, 4], [4.0, np.nan, 6.0], '#0000ff'))
+    colors = {('Scatter', f'{kind}_color') for kind in ('fill', 'line', 'hatch')}
+    assert set(events) == {('ColumnDataSource', 'data'), *colors}
+    assert events.count(('ColumnDataSource', 'data')) == 1
+    first, second = displayed.renderers
+    assert first.data_source.data['y'] == [1, 2, 4] and first.glyph.fill_color == '#0000ff'
+    assert second.data_source.data['y'][0] == 4.0
+
+
+def test_manhattan(data):
+    plot = caplot.Manhattan(data, contig='contig', position='position', pvalue='pvalue',
+                            highlight='SELECT * FROM data WHERE pvalue < 0.1')
+    displayed = plot.Generate()
+    sources = [renderer.data_source for renderer in displayed.renderers]
+    events = Displayed(displayed)
+    assert Graft(displayed, plot.Generate()) and events == []
+    plot.highlight = 'SELECT * FROM data WHERE pvalue < 0.2'
+    assert Graft(displayed, plot.Generate())
+    assert events == [('ColumnDataSource', 'data')] * 2
+    assert [renderer.data_source for renderer in displayed.renderers] == sources  # Models are kept.
+    assert sum(len(source.data['__pvalue__']) for source in sources) == len(data)
+    assert max(len(source.data['__pvalue__']) for source in sources) == len(data) - (data['pvalue'] < 0.2).sum()
+
+
+def test_layout(data):
+    plot = caplot.PCA(data, subplots=['maf', 'pvalue'], coloringColumn='note')
+    displayed = plot.Generate()
+    events = Displayed(displayed)
+    plot.subplots = ['maf', 'pvalue', 'position']
+    assert not Graft(displayed, plot.Generate()) and events == []
+    assert len(list(displayed.select({'type': Plot}))) == 2  # Left untouched.
+
+
+def test_update_shown(data, monkeypatch):
+    handles, generated = [], []
+    monkeypatch.setattr(bokeh.io, 'push_notebook', lambda handle=None: handles.append(handle))
+    plot = caplot.Manhattan(data, contig='contig', position='position', pvalue='pvalue',
+                            highlight='SELECT * FROM data WHERE pvalue < 0.1')
+    assert not plot._UpdateShown({'minorAlpha'})  # Nothing displayed.
+    plot._shown = (plot.Generate(), 'handle')
+    generate = type(plot).Generate
+
+    def Generate(self, *args, **kwargs):
+        generated.append(True)
+        return generate(self, *args, **kwargs)
+
+    monkeypatch.setattr(type(plot), 'Generate', Generate)
+    displayed = plot._shown[0]
+    events = Displayed(displayed)
+    # Style properties are applied to the glyphs, without generating the plot again.
+    plot.minorAlpha = 0.25
+    assert plot._UpdateShown({'minorAlpha'}) and handles == ['handle'] and generated == []
+    minor = [renderer.glyph for renderer in displayed.renderers if 'minor' in renderer.glyph.tags]
+    assert minor and all(glyph.fill_alpha == 0.25 for glyph in minor)
+    assert {attr for _, attr in events} == {'fill_alpha', 'line_alpha', 'hatch_alpha'}
+    events.clear()
+    plot.highlight = 'SELECT * FROM data WHERE pvalue < 0.2'
+    assert plot._UpdateShown({'highlight'}) and handles == ['handle'] * 2 and generated == [True]
+    assert events == [('ColumnDataSource', 'data')] * 2
@@ -0,0 +1,17 @@
+from caplot.queryengine import QueryCache
+
+
+def test_whitespace_outside_literals():
+    assert QueryCache.Normalized('SELECT *  FROM data\n WHERE a<=1 ;') == \
+        QueryCache.Normalized('SELECT * FROM data WHERE a <= 1')
+    assert QueryCache.Normalized("SELECT * FROM data WHERE s = 'a  b'") != \
+        QueryCache.Normalized("SELECT * FROM data WHERE s = 'a b'")
+    assert QueryCache.Normalized('SELECT "a  b" FROM data') != QueryCache.Normalized('SELECT "a b" FROM data')
+
+
+def test_literals_not_shared():
+    cache, results = QueryCache(), iter(['first', 'second'])
+    assert cache.Get("SELECT * FROM data WHERE s = 'a  b'", 1, lambda: next(results)) == 'first'
+    assert cache.Get("SELECT * FROM data WHERE s = 'a b'", 1, lambda: next(results)) == 'second'
+    assert cache.Get("SELECT *\nFROM data WHERE s = 'a b';", 1, lambda: next(results)) == 'second'
+    assert (cache.hits, cache.misses) == (1, 2)
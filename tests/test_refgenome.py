@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from caplot.refgenome import Genome, ReferenceGenome
+
+# Offsets and ticks of the autosomes, as listed by the former `refgen.yaml`.
+Former = {
+    'GRCh37': {
+        'offsets': [
+            0, 249250621, 492449994, 690472424, 881626700, 1062541960, 1233657027, 1392795690, 1539159712,
+            1680373143, 1815907890, 1950914406, 2084766301, 2199936179, 2307285719, 2409817111, 2500171864,
+            2581367074, 2659444322, 2718573305, 2781598825, 2829728720,
+        ],
+        'ticks': [
+            124625310, 370850307, 591461209, 786049562, 972084330, 1148099493, 1313226358, 1465977701, 1609766427,
+            1748140516, 1883411148, 2017840353, 2142351240, 2253610949, 2358551415, 2454994487, 2540769469,
+            2620405698, 2689008813, 2750086065, 2805663772, 2855381003,
+        ],
+    },
+    'GRCh38': {
+        'offsets': [
+            0, 248956422, 491149951, 689445510, 879660065, 1061198324, 1232004303, 1391350276, 1536488912,
+            1674883629, 1808681051, 1943767673, 2077042982, 2191407310, 2298451028, 2400442217, 2490780562,
+            2574038003, 2654411288, 2713028904, 2777473071, 2824183054,
+        ],
+        'ticks': [
+            124478211, 370053186, 590297730, 784552787, 970429194, 1146601313, 1311677289, 1463919594, 1605686270,
+            1741782340, 1876224362, 2010405327, 2134225146, 2244929169, 2349446622, 2445611389, 2532409282,
+            2614224645, 2683720096, 2745250987, 2800828062, 2849592288,
+        ],
+    },
+}
+
+
+@pytest.mark.parametrize('name', ['GRCh37', 'GRCh38'])
+def test_builtins(name):
+    genome = Genome(name)
+    prefix = 'chr' if name == 'GRCh38' else ''
+    assert genome.contigs[:22] == [f'{prefix}{number}' for number in range(1, 23)]
+    assert genome.offsets[:22].tolist() == Former[name]['offsets']
+    assert genome.ticks[:22].tolist() == Former[name]['ticks']
+    # The sex chromosomes and the mitochondrial genome follow the autosomes.
+    assert genome.contigs[22:] == [f'{prefix}X', f'{prefix}Y', f'{prefix}M' if prefix else 'MT']
+    assert genome.offsets[22] == genome.offsets[21] + genome.contigLengths[21]
+    assert genome['cumulativeLengths'][f'{prefix}22'] == Former[name]['offsets'][-1]
+
+
+def test_codes():
+    codes, unknown = Genome('GRCh38').Codes(np.array(['1', 'chr2', 'X', 'chrMT', 'M', 'Un', None], dtype=object))
+    assert codes.tolist() == [0, 1, 22, 24, 24, -1, -1] and unknown == ['Un']
+
+
+def test_fai(tmp_path):
+    path = tmp_path / 'GRCm39.fa.fai'
+    path.write_text('chr1\t195154279\t6\t60\t61\n'
+                    'chr2\t181755017\t198406857\t60\t61\n'
+                    'chrX\t169476592\t383192434\t60\t61\n'
+                    'chrUn_GL456239\t40056\t555488060\t60\t61\n'
+                    'chrM\t16299\t555528803\t60\t61\n')
+    genome = ReferenceGenome.FromFai(str(path))
+    assert genome.name == 'GRCm39' and genome.contigs == ['chr1', 'chr2', 'chrX', 'chrM']
+    assert genome.offsets.tolist() == [0, 195154279, 376909296, 546385888]
+    assert genome.ticks.tolist() == [97577139, 286031787, 461647592, 546394037]
+    assert ReferenceGenome.FromFai(str(path), 'mm', contigs=['chrX', 'chr1']).contigs == ['chrX', 'chr1']
+    assert len(ReferenceGenome.FromFai(str(path), contigs=r'^scaffold').contigs) == 5  # Nothing matched.
@@ -0,0 +1,89 @@
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+import caplot
+from caplot.rendering import Frame, NiceTicks, RasterCanvas, SvgCanvas
+
+Namespace = '{http://www.w3.org/2000/svg}'
+
+
+def Circles(path):
+    """
+    The centers of the circles of an SVG file, by fill color and opacity.
+    """
+    circles = dict()
+    for group in ElementTree.parse(path).getroot().iter(f'{Namespace}g'):
+        circles.setdefault((group.get('fill'), group.get('fill-opacity')), []).extend(
+            (float(circle.get('cx')), float(circle.get('cy'))) for circle in group.iter(f'{Namespace}circle'))
+    return circles
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'contig': rng.integers(1, 23, 300).astype(str), 'position': rng.integers(1, 10 ** 8, 300),
+                         'pvalue': rng.random(300), 'maf': rng.random(300), 'note': rng.choice(['a', 'b'], 300)})
+
+
+def test_ticks():
+    assert NiceTicks(0, 10).tolist() == [0, 2, 4, 6, 8, 10]
+    assert NiceTicks(0.13, 0.91).tolist() == [0.2, 0.4, 0.6, 0.8]
+    assert NiceTicks(3, 3).tolist() == [3]
+
+
+def test_points(tmp_path):
+    canvas = SvgCanvas(170, 155)
+    frame = Frame(canvas, 0, 0, 170, 155, (0, 10), (0, 10))
+    x = np.array([0, 10, 5, 5.01, 5, 11, np.nan, 2])
+    y = np.array([0, 10, 5, 5.01, 5, 5, 1, 2])
+    codes = np.array([0, 0, 0, 0, 1, 0, 0, -1])
+    frame.Points(x, y, codes, ['#ff0000', '#0000ff'], 4, 0.5)
+    canvas.Save(str(tmp_path / 'points.svg'))
+    circles = Circles(str(tmp_path / 'points.svg'))
+    # Out of range, missing or without a color are left out, and the red points in the middle overlap.
+    assert len(circles['#ff0000', '0.5']) == 3 and len(circles['#0000ff', '0.5']) == 1
+    px, py = frame.Pixels([0, 10, 5], [0, 10, 5])
+    assert (px.tolist(), py.tolist()) == ([60, 160, 110], [110, 10, 60])
+    np.testing.assert_allclose(sorted(circles['#ff0000', '0.5']), sorted([(60, 110), (160, 10), (110.1, 59.9)]))
+
+
+def test_raster(tmp_path):
+    canvas = RasterCanvas(50, 40)
+    canvas.Circles(np.array([10, 10, 45]), np.array([10, 10, 45]), 6, '#ff0000', 0.5)
+    canvas.Line(0, 30, 49, 30, color='#000000')
+    canvas.Save(str(tmp_path / 'raster.png'))
+    image = Image.open(str(tmp_path / 'raster.png'))
+    assert image.size == (50, 40)
+    assert image.getpixel((10, 10)) == (255, 64, 64)  # Two circles at half opacity.
+    assert image.getpixel((10, 14)) == (255, 255, 255) and image.getpixel((25, 30)) == (0, 0, 0)
+    assert image.getpixel((49, 39)) == (255, 255, 255)  # Circles past the edges are left out.
+
+
+def test_manhattan(data, tmp_path):
+    plot = caplot.Manhattan(data, contig='contig', position='position', pvalue='pvalue', width=400, height=300,
+                            highlight='SELECT * FROM data WHERE pvalue < 0.1')
+    plot.SaveAs(str(tmp_path / 'plot.png'), renderer='native')
+    plot.SaveAs(str(tmp_path / 'plot.svg'), renderer='native')
+    image = np.asarray(Image.open(str(tmp_path / 'plot.png')))
+    assert image.shape == (300, 400, 3) and (image != 255).any(axis=2).sum() > 1000
+    root = ElementTree.parse(str(tmp_path / 'plot.svg')).getroot()
+    assert (root.get('width'), root.get('height')) == ('400', '300')
+    # Overlapping points aside, every record is drawn, in alternating colors per contig, highlighted ones opaque.
+    circles = Circles(str(tmp_path / 'plot.svg'))
+    assert sorted(circles) == [('#1f77b4', '0.5'), ('#1f77b4', '1'), ('#ff7f0e', '0.5'), ('#ff7f0e', '1')]
+    assert len(circles['#1f77b4', '1']) + len(circles['#ff7f0e', '1']) == (data['pvalue'] < 0.1).sum()
+    assert 0.95 * len(data) <= sum(len(centers) for centers in circles.values()) <= len(data)
+
+
+def test_pca(data, tmp_path):
+    plot = caplot.PCA(data, subplots=['maf', 'pvalue'], coloringColumn='note')
+    plot.SaveAs(str(tmp_path / 'plot.png'), renderer='native')
+    plot.SaveAs(str(tmp_path / 'plot.svg'), renderer='native')
+    image = Image.open(str(tmp_path / 'plot.png'))
+    assert image.size[0] >= plot.subplotWidth and image.size[1] >= plot.subplotHeight
+    circles = Circles(str(tmp_path / 'plot.svg'))
+    assert len(circles) == 2 and sum(len(centers) for centers in circles.values()) == len(data)
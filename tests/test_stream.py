@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from caplot.sources import ReadFile, StreamFile
+
+Queries = [
+    'SELECT * FROM data WHERE a % 3 = 0',
+    'SELECT a, b, c FROM data WHERE a % 3 = 0',
+]
+
+
+@pytest.fixture
+def csv(tmp_path):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({'a': np.arange(1000), 'b': rng.random(1000), 'c': rng.integers(0, 100, 1000)})
+    path = tmp_path / 'data.csv'
+    data.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize('loadQuery', Queries)
+def test_reread(csv, loadQuery):
+    expected = ReadFile(csv, loadQuery)
+    if 'index' in expected.columns:
+        expected = expected.set_index('index')
+    streamed = StreamFile(csv, loadQuery, columns=['a', 'b'], chunkSize=64)
+    pd.testing.assert_frame_equal(streamed, expected[['a', 'b']], check_index_type=False)
+    # As in `lean` mode, the other columns of the rows loaded earlier are read again.
+    top = StreamFile(csv, loadQuery, columns=['a', 'b'], chunkSize=64, reduce=lambda df: df.nsmallest(20, 'b'))
+    reread = StreamFile(csv, loadQuery, columns=['c'], chunkSize=64, index=top.index)
+    assert len(top) == 20 and reread.index.tolist() == sorted(top.index)
+    assert reread['c'].tolist() == expected.loc[reread.index, 'c'].tolist()